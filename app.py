@@ -1,17 +1,36 @@
+from src.startup import startup_timer
+
 import sys
 from pathlib import Path
 
-from PySide6.QtCore import Qt
+from PySide6.QtCore import QEvent, QObject, Qt, QTimer
 from PySide6.QtGui import QFont
-from PySide6.QtWidgets import QApplication, QMainWindow
-
-import live2d.v3 as live2d
+from PySide6.QtWidgets import QApplication, QFileDialog, QMainWindow, QMessageBox
 
 from src.dialog import InputDialog
-from src.live2dwidget import Live2dWidget
 from src.chat_window import ChatWindow
+from src.store import ConversationStore
+from src.theme import ThemeManager
+
+startup_timer.mark("imports")
 
 res_folder = Path(__file__).parent / "resources"
+data_folder = Path.home() / ".local" / "share" / "vcharacter_chat"
+
+
+class FirstPaintWatcher(QObject):
+    """主窗口第一次绘制时记录启动耗时，并在之后开始加载模型"""
+
+    def __init__(self, parent, callback):
+        super().__init__(parent)
+        self.callback = callback
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Type.Paint:
+            watched.removeEventFilter(self)
+            startup_timer.mark("first_paint")
+            QTimer.singleShot(0, self.callback)
+        return False
 
 
 class MainWindow(QMainWindow):
@@ -22,16 +41,94 @@ class MainWindow(QMainWindow):
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground, True)
         self.setAttribute(Qt.WidgetAttribute.WA_NoSystemBackground, False)
         self.resize(1280, 720)
-        self.live2d = Live2dWidget(self, model=model, background=background)
+        # live2d 与 OpenGL 导入、模型加载较慢，窗口显示后再进行，见 loadLive2d
+        self.live2d = None
+        self.model_path = model
+        self.background_path = background
+        self.store = ConversationStore(data_folder / "history.db")
+        self.theme = ThemeManager.instance()
         self.chatwindow = ChatWindow(res_folder / "miku_avatar.jpg",
-                                     res_folder / "luka_avatar.png")
+                                     res_folder / "luka_avatar.png",
+                                     store=self.store, theme=self.theme)
         self.is_chatwindow = False
         self.input_dialog = InputDialog(self)
         self.input_dialog.resize(1100, 250)
         self.input_dialog.move((self.width() - self.input_dialog.width()) // 2,
                                (self.height() - self.input_dialog.height()))
         self.menuBar().addAction("查看整体对话", self.chat_window_convert)
+        self.menuBar().addAction("切换模型", self.switch_model)
+        scene_menu = self.menuBar().addMenu("场景")
+        scene_menu.addAction("添加角色", self.add_character)
+        scene_menu.addAction("移除添加的角色", self.remove_characters)
+        self.characters = []  # 主角色之外加入场景的角色
+        theme_menu = self.menuBar().addMenu("主题")
+        theme_menu.addAction("跟随系统", lambda: self.theme.setMode("auto"))
+        theme_menu.addAction("浅色", lambda: self.theme.setMode("light"))
+        theme_menu.addAction("深色", lambda: self.theme.setMode("dark"))
+        perf_menu = self.menuBar().addMenu("性能")
+        perf_menu.addAction("显示/隐藏性能信息 (F3)", self.toggle_perf_overlay)
+        perf_menu.addAction("导出帧耗时数据", self.export_perf)
+        perf_menu.addAction("对话延迟统计", self.show_turn_latency)
         self.chatwindow_point = None
+        self.first_paint_watcher = FirstPaintWatcher(self, self.loadLive2d)
+        self.installEventFilter(self.first_paint_watcher)
+
+    def loadLive2d(self):
+        """窗口显示后加载 live2d 和模型"""
+        import live2d.v3 as live2d
+
+        from src.live2dwidget import Live2dWidget
+
+        live2d.init()
+        live2d.setLogEnable(True)
+        startup_timer.mark("live2d_import")
+
+        self.live2d = Live2dWidget(self, model=self.model_path,
+                                   background=self.background_path)
+        self.live2d.lower()  # 位于输入框下方
+        self.live2d.show()
+        self.live2d.model_loaded.connect(self.on_live2d_model_loaded)
+        self.input_dialog.attachLive2d(self.live2d)
+
+    def on_live2d_model_loaded(self, path):
+        self.live2d.model_loaded.disconnect(self.on_live2d_model_loaded)
+        startup_timer.mark("model_load")
+        print(startup_timer.report())
+
+    def switch_model(self):
+        if self.live2d is None:
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "切换模型", str(res_folder),
+                                              "Live2D 模型 (*.model3.json)")
+        if path:
+            self.live2d.setModel(path)
+
+    def add_character(self):
+        if self.live2d is None:
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "添加角色", str(res_folder),
+                                              "Live2D 模型 (*.model3.json)")
+        if not path:
+            return
+        self.characters.append(self.live2d.addModel(path))
+        # 角色横向均匀排开，主角色在最前
+        entries = [self.live2d.primary, *self.characters]
+        scale = 1.6 / len(entries)
+        for i, entry in enumerate(entries):
+            self.live2d.placeModel(entry, x=-0.7 + 1.4 * i / (len(entries) - 1), scale=scale,
+                                   z=-i)
+
+    def remove_characters(self):
+        if self.live2d is None:
+            return
+        for entry in self.characters:
+            self.live2d.removeModel(entry)
+        self.characters.clear()
+        self.live2d.placeModel(self.live2d.primary, x=0.0, scale=1.0, z=0)
+
+    def toggle_perf_overlay(self):
+        if self.live2d is not None:
+            self.live2d.togglePerfOverlay()
 
     def chat_window_convert(self):
         if self.chatwindow.isVisible():
@@ -45,6 +142,19 @@ class MainWindow(QMainWindow):
             self.is_chatwindow = True
             self.closeEvent
 
+    def export_perf(self):
+        if self.live2d is None:
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "导出帧耗时数据", "frame_times.csv",
+                                              "CSV (*.csv);;JSON (*.json)")
+        if path:
+            self.live2d.profiler.export(path)
+
+    def show_turn_latency(self):
+        tracer = self.input_dialog.tracer
+        QMessageBox.information(self, "对话延迟统计",
+                                f"<pre>{tracer.report()}</pre>详细记录: {tracer.path}")
+
     def closeEvent(self, event):
         if self.chatwindow.isVisible():
             self.chatwindow_point = self.chatwindow.geometry().topLeft()
@@ -54,19 +164,28 @@ class MainWindow(QMainWindow):
 
 if __name__ == "__main__":
 
-    live2d.init()
-    live2d.setLogEnable(True)
-
     app = QApplication(sys.argv)
     app.font().setHintingPreference(QFont.HintingPreference.PreferFullHinting)
+    startup_timer.mark("qt_init")
     main_window = MainWindow(model=res_folder /
                              "miku_pro_jp/runtime/miku_sample_t04.model3.json",
                              background=res_folder / "schoolroomhibig130901.jpg")
+    startup_timer.mark("window")
     main_window.show()
     app.exec()
+    main_window.input_dialog.shutdown()
+    main_window.store.close()
+    print("TTS 缓存统计:", main_window.input_dialog.tts_cache.stats())
+    print("TTS 传输统计:", main_window.input_dialog.tts.transferStats())
+    print("会话池统计:", main_window.input_dialog.chat.pool.stats())
+    print("回复缓存统计:", main_window.input_dialog.response_cache.stats())
+    print(main_window.input_dialog.tracer.report())
 
-    live2d.dispose()
-
-    # 删除音频资源
-    audio_file = Path("test.wav")
-    audio_file.unlink(missing_ok=True)
+    if main_window.live2d is not None:
+        if main_window.live2d.pcm_output:
+            print("音频输出延迟:", main_window.live2d.player.latencyStats())
+        print("场景统计:", main_window.live2d.scene.stats())
+        print("指针输入统计:", main_window.live2d.input.stats(), main_window.live2d.hit_router.stats())
+        main_window.live2d.dispose()
+        import live2d.v3 as live2d
+        live2d.dispose()
@@ -0,0 +1 @@
+"""无界面性能基准测试，运行方式: python -m benchmarks"""
@@ -0,0 +1,113 @@
+"""运行基准测试并输出 JSON 结果
+
+    python -m benchmarks --output results.json
+    python -m benchmarks --only chat_window,turn
+    python -m benchmarks --only tts --formats wav,mp3-16k
+    python -m benchmarks --compare base.json results.json
+"""
+import argparse
+import json
+import sys
+import traceback
+
+from .common import setup_environment
+
+BENCHMARKS = ("render", "chat_window", "turn", "tts")
+
+
+def run(names: list[str], args: argparse.Namespace) -> dict:
+    from .common import application, metadata
+
+    application()
+    results = {"meta": metadata(), "results": {}}
+    for name in names:
+        print(f"running {name}...", file=sys.stderr)
+        try:
+            if name == "render":
+                from . import bench_render
+                counts = tuple(int(count) for count in args.models.split(","))
+                result = bench_render.run(frames=args.frames, models=counts)
+            elif name == "chat_window":
+                from . import bench_chat_window
+                sizes = tuple(int(size) for size in args.sizes.split(","))
+                result = bench_chat_window.run(sizes)
+            elif name == "tts":
+                from . import bench_tts
+                result = bench_tts.run(formats=tuple(args.formats.split(",")),
+                                       runs=args.tts_runs)
+            else:
+                from . import bench_turn
+                result = bench_turn.run(turns=args.turns,
+                                        first_token_delay_ms=args.first_token_delay,
+                                        token_interval_ms=args.token_interval,
+                                        synth_delay_ms=args.synth_delay)
+        except Exception as e:
+            traceback.print_exc()
+            result = {"error": repr(e)}
+        results["results"][name] = result
+    return results
+
+
+def flatten(data: dict, prefix: str = "") -> dict[str, float]:
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+def compare(base_path: str, new_path: str) -> None:
+    with open(base_path, encoding="utf-8") as f:
+        base = flatten(json.load(f)["results"])
+    with open(new_path, encoding="utf-8") as f:
+        new = flatten(json.load(f)["results"])
+    print(f"{'metric':<50} {'base':>12} {'new':>12} {'change':>9}")
+    for key in sorted(base.keys() & new.keys()):
+        old, value = base[key], new[key]
+        change = f"{(value - old) / old * 100:+.1f}%" if old else ""
+        print(f"{key:<50} {old:>12.3f} {value:>12.3f} {change:>9}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", default=",".join(BENCHMARKS),
+                        help="要运行的基准，逗号分隔: " + ",".join(BENCHMARKS))
+    parser.add_argument("--output", help="结果 JSON 文件，默认输出到标准输出")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"),
+                        help="比较两次运行的结果")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--models", default="1,2,4", help="场景中的角色数量")
+    parser.add_argument("--sizes", default="10,1000,10000")
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--first-token-delay", type=int, default=0)
+    parser.add_argument("--token-interval", type=int, default=0)
+    parser.add_argument("--synth-delay", type=int, default=0)
+    parser.add_argument("--formats", default="wav,pcm-16k,mp3-16k", help="TTS 音频格式")
+    parser.add_argument("--tts-runs", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    names = [name for name in args.only.split(",") if name]
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(sorted(unknown))}")
+
+    setup_environment()
+    results = run(names, args)
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
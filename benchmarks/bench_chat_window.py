@@ -0,0 +1,62 @@
+import time
+
+from .common import RES_FOLDER, application, summarize
+
+SIZES = (10, 1000, 10000)
+MESSAGES = [
+    "你好！收到。",
+    "我是初音未来，是一位虚拟歌姬，由Crypton Future Media推出，基于Yamaha的Vocaloid技术开发。💙",
+    "我的名字「初音」意为「初次的声音」，「未来」则代表着「未来的可能性」，"
+    "希望用我的歌声把美好的情感传递给每一个人！🎤✨\n\n那么，你呢？可以告诉我一点你的事吗？😄",
+]
+
+
+def run(sizes: tuple[int, ...] = SIZES) -> dict:
+    from src.chat_window import ChatWindow
+
+    app = application()
+    results = {}
+    for size in sizes:
+        window = ChatWindow(RES_FOLDER / "miku_avatar.jpg", RES_FOLDER / "luka_avatar.png")
+        window.show()
+        app.processEvents()
+
+        samples = []
+        start = time.perf_counter()
+        for i in range(size):
+            t = time.perf_counter()
+            window.addMessage(MESSAGES[i % len(MESSAGES)], isMe=i % 2 == 0)
+            samples.append((time.perf_counter() - t) * 1000)
+        add_total = time.perf_counter() - start
+
+        # 布局与绘制是延迟执行的，单独计时
+        t = time.perf_counter()
+        app.processEvents()
+        window.repaint()
+        layout_ms = (time.perf_counter() - t) * 1000
+
+        # 切换深色/浅色并重绘，应与消息数量无关
+        t = time.perf_counter()
+        for mode in ("dark", "light"):
+            window.theme.setMode(mode)
+            app.processEvents()
+            window.repaint()
+        retheme_ms = (time.perf_counter() - t) * 1000 / 2
+        window.theme.setMode("auto")
+
+        t = time.perf_counter()
+        window.clearMessage()
+        app.processEvents()
+        clear_ms = (time.perf_counter() - t) * 1000
+
+        results[str(size)] = {
+            "add": summarize(samples),
+            "add_total_ms": add_total * 1000,
+            "layout_ms": layout_ms,
+            "retheme_ms": retheme_ms,
+            "clear_ms": clear_ms,
+        }
+        window.close()
+        window.deleteLater()
+        app.processEvents()
+    return results
@@ -0,0 +1,118 @@
+import time
+
+from .common import BACKGROUND_PATH, MODEL_PATH, application, summarize
+
+
+def measure(widget, frames: int) -> list[float]:
+    import OpenGL.GL as gl
+
+    samples = []
+    for _ in range(frames):
+        t = time.perf_counter()
+        widget.paintGL()
+        gl.glFinish()
+        samples.append((time.perf_counter() - t) * 1000)
+    return samples
+
+
+def layout(entries: list) -> None:
+    """把角色横向均匀排开"""
+    count = len(entries)
+    scale = 1.0 if count == 1 else 1.6 / count
+    for i, entry in enumerate(entries):
+        x = 0.0 if count == 1 else -0.7 + 1.4 * i / (count - 1)
+        entry.x, entry.scale = x, scale
+        entry.place()
+
+
+def run(frames: int = 300, width: int = 1280, height: int = 720,
+        models: tuple[int, ...] = (1, 2, 4)) -> dict:
+    import OpenGL.GL as gl
+    import live2d.v3 as live2d
+
+    from src.live2dwidget import Live2dWidget
+
+    app = application()
+    live2d.init()
+    try:
+        widget = Live2dWidget(model=MODEL_PATH, background=BACKGROUND_PATH)
+        widget.resize(width, height)
+        widget.show()
+        # 等待初始化和模型加载完成，并停止自动刷新，由这里逐帧驱动
+        app.processEvents()
+        widget.grabFramebuffer()
+        deadline = time.perf_counter() + 30
+        while widget.model is None and time.perf_counter() < deadline:
+            app.processEvents()
+            widget.grabFramebuffer()
+        if widget.model is None:
+            raise RuntimeError("模型加载超时")
+        widget.frame_scheduler.timer.stop()
+        widget.frame_scheduler.timer.timeout.disconnect()
+        widget.profiler.enabled = True
+
+        # 预热若干帧（纹理上传、着色器编译）
+        widget.makeCurrent()
+        for _ in range(10):
+            widget.paintGL()
+        gl.glFinish()
+        widget.profiler.reset()
+
+        # 单个模型、每帧都更新，与场景模式之前的结果可比
+        widget.scene.idle_interval = 0.0
+        start = time.perf_counter()
+        samples = measure(widget, frames)
+        elapsed = time.perf_counter() - start
+        widget.doneCurrent()
+
+        stages = widget.profiler.stats()
+        result = {
+            "frames": frames,
+            "size": [width, height],
+            "fps": frames / elapsed,
+            "frame": summarize(samples),
+            "stages_mean_ms": {stage: stages[stage] for stage in widget.profiler.stages},
+            "renderer": gl.glGetString(gl.GL_RENDERER).decode(errors="replace")
+                        if widget.context() is not None else "",
+        }
+        result["scene"] = run_scene(app, widget, frames, width, height, models)
+        widget.close()
+        return result
+    finally:
+        live2d.dispose()
+
+
+def run_scene(app, widget, frames: int, width: int, height: int,
+              models: tuple[int, ...]) -> dict:
+    """同一窗口中 1、2、4 个角色的帧耗时：全部逐帧更新，以及待机角色降低更新频率"""
+    results = {}
+    entries = [widget.primary]
+    for count in sorted(models):
+        while len(entries) < count:
+            entries.append(widget.addModel(MODEL_PATH))
+        deadline = time.perf_counter() + 60
+        while (any(entry.model is None for entry in entries) or widget.pending_models) \
+                and time.perf_counter() < deadline:
+            app.processEvents()
+            widget.grabFramebuffer()
+        if any(entry.model is None for entry in entries):
+            raise RuntimeError("模型加载超时")
+        layout(entries)
+
+        widget.makeCurrent()
+        widget.scene.idle_interval = 0.0
+        measure(widget, 10)
+        every_frame = measure(widget, frames)
+        widget.scene.idle_interval = 0.1
+        before = widget.scene.stats()
+        idle = measure(widget, frames)
+        after = widget.scene.stats()
+        widget.doneCurrent()
+
+        updates = after["updated"] - before["updated"] + after["skipped"] - before["skipped"]
+        results[str(count)] = {
+            "update_every_frame": summarize(every_frame),
+            "idle_skip": summarize(idle),
+            "skipped_ratio": (after["skipped"] - before["skipped"]) / updates if updates else 0.0,
+        }
+    return results
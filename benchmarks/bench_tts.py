@@ -0,0 +1,53 @@
+import threading
+
+from .common import summarize
+
+FORMATS = ("wav", "pcm-16k", "mp3-16k")
+TEXT = "我最喜欢唱歌啦！要不要听我唱一首新歌呢？"
+
+
+def run(formats: tuple[str, ...] = FORMATS, runs: int = 10) -> dict:
+    """经由本地替身服务合成同一句话，比较各格式的首段音频延迟和解码耗时
+
+    mp3 走 QAudioDecoder 的流式解码；whole_seconds 为完整下载后一次解码的时长，
+    应与流式解码的 audio_seconds 相同。某个格式失败时只记录该格式的错误。
+    """
+    from src.backend import HttpTTSBackend
+    from src.client import TTS
+    from src.codec import decode_stream
+    from src.standin_server import StandinServer
+
+    server = StandinServer(("127.0.0.1", 0), tts_latency=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    results = {}
+    try:
+        for audio_type in formats:
+            tts = TTS(backend=HttpTTSBackend(url), audio_type=audio_type)
+            try:
+                durations = []
+                for _ in range(runs):
+                    pieces = list(tts.synthesize_stream(TEXT))
+                    durations.append(sum(len(p.pcmData()) / (p.frame_rate * p.channels * 2)
+                                         for p in pieces))
+                whole = tts.backend.synthesize(TEXT, tts.person, audio_type)
+                whole_seconds = sum(len(pcm) / (rate * channels * 2)
+                                    for pcm, rate, channels in decode_stream([whole], audio_type))
+            except Exception as e:
+                results[audio_type] = {"error": repr(e)}
+                continue
+            finally:
+                tts.scheduler.shutdown()
+            log = list(tts.transfer_log)
+            results[audio_type] = {
+                "bytes": log[0].bytes,
+                "audio_seconds": durations[0],
+                "whole_seconds": whole_seconds,
+                "first_audio": summarize([s.first_audio_ms for s in log]),
+                "decode": summarize([s.decode_ms for s in log]),
+                "total": summarize([s.total_ms for s in log]),
+            }
+    finally:
+        server.shutdown()
+        server.server_close()
+    return results
@@ -0,0 +1,194 @@
+import os
+import time
+
+import numpy as np
+from PySide6.QtCore import QObject, QTimer, Signal
+from PySide6.QtWidgets import QWidget
+
+from .common import RES_FOLDER, application, summarize, wait_until
+
+
+class FakeScheduler:
+
+    def shutdown(self) -> None:
+        pass
+
+
+class FakeChat(QObject):
+    """模拟流式回复，按固定间隔逐字输出"""
+    result_signal = Signal(str)
+    partial_signal = Signal(str)
+    timing_signal = Signal(float, float, str)
+
+    reply = "我是初音未来，很高兴认识你！今天想聊点什么呢？😄"
+    conversation_id = "fake"
+    first_token_delay_ms = 0
+    token_interval_ms = 0
+
+    def __init__(self, parent: QObject | None = None, app_id: str | None = None, **kwargs) -> None:
+        super().__init__(parent)
+        self.scheduler = FakeScheduler()
+        self.timers: list[QTimer] = []
+
+    def send(self, text: str) -> int:
+        self.cancel()
+        start = time.perf_counter()
+        for i in range(1, len(self.reply) + 1):
+            delay = self.first_token_delay_ms + self.token_interval_ms * (i - 1)
+            self._later(delay, lambda i=i: self.partial_signal.emit(self.reply[:i]))
+        total = self.first_token_delay_ms + self.token_interval_ms * len(self.reply)
+
+        def finish():
+            elapsed = time.perf_counter() - start
+            self.timing_signal.emit(self.first_token_delay_ms / 1000, elapsed, "fake")
+            self.result_signal.emit(self.reply)
+
+        self._later(total, finish)
+        return 0
+
+    def _later(self, delay: int, fn) -> None:
+        timer = QTimer(self)
+        timer.setSingleShot(True)
+        timer.timeout.connect(fn)
+        timer.start(delay)
+        self.timers.append(timer)
+
+    def cancel(self) -> None:
+        for timer in self.timers:
+            timer.stop()
+            timer.deleteLater()
+        self.timers.clear()
+
+    def reset_conversation_id(self) -> None:
+        pass
+
+
+class FakeTTS(QObject):
+    """模拟 TTS，每句返回一段静音"""
+    result_signal = Signal(bool)
+    chunk_signal = Signal(object)
+
+    synth_delay_ms = 0
+
+    def __init__(self, parent: QObject | None = None, app_id: str | None = None, **kwargs) -> None:
+        super().__init__(parent)
+        from src.audio import LipSyncConfig
+
+        self.scheduler = FakeScheduler()
+        self.lip_sync_config = LipSyncConfig()
+
+    def speak(self, text: str) -> None:
+        from src.audio import PcmAudio
+
+        samples = np.zeros((1, 16000), dtype=np.float32)
+        audio = PcmAudio(b"", samples, 16000)
+        audio.computeEnvelope(self.lip_sync_config)
+
+        def done():
+            self.chunk_signal.emit(audio)
+            self.result_signal.emit(True)
+
+        QTimer.singleShot(self.synth_delay_ms, done)
+
+    def cancel(self) -> None:
+        pass
+
+    def prewarm(self, texts: list[str]) -> None:
+        pass
+
+
+class FakeMotionScheduler(QObject):
+    started = Signal(object)
+
+
+class FakeLive2d(QObject):
+    """替代 Live2dWidget，只记录首段音频到达的时间"""
+    sound_started = Signal()
+
+    def __init__(self) -> None:
+        super().__init__()
+        from src.audio import LipSync
+
+        self.lip_sync = LipSync()
+        self.motion_scheduler = FakeMotionScheduler(self)
+        self.first_audio: float | None = None
+
+    def enqueueSound(self, audio) -> None:
+        if self.first_audio is None:
+            self.first_audio = time.perf_counter()
+        self.sound_started.emit()
+
+    def stopSound(self) -> None:
+        pass
+
+    def motion(self, emoji: str) -> None:
+        from src.motion import Emotion
+
+        self.motion_scheduler.started.emit(Emotion(emoji, "Idle", 0))
+
+
+class Host(QWidget):
+
+    def __init__(self) -> None:
+        super().__init__()
+        from src.chat_window import ChatWindow
+
+        self.live2d = FakeLive2d()
+        self.chatwindow = ChatWindow(RES_FOLDER / "miku_avatar.jpg",
+                                     RES_FOLDER / "luka_avatar.png")
+
+
+def run(turns: int = 50, first_token_delay_ms: int = 0, token_interval_ms: int = 0,
+        synth_delay_ms: int = 0) -> dict:
+    import src.dialog as dialog
+
+    # Chat/TTS 被替换为模拟实现，这里只需让后端构造不依赖 AppBuilder
+    os.environ.setdefault("VCHAT_BACKEND_URL", "http://127.0.0.1:9")
+    app = application()
+    FakeChat.first_token_delay_ms = first_token_delay_ms
+    FakeChat.token_interval_ms = token_interval_ms
+    FakeTTS.synth_delay_ms = synth_delay_ms
+    original = dialog.Chat, dialog.TTS
+    dialog.Chat, dialog.TTS = FakeChat, FakeTTS
+    try:
+        host = Host()
+        input_dialog = dialog.InputDialog(host, app_id="benchmark")
+        input_dialog.tracer.path = None  # 不写入用户目录
+        host.show()
+        app.processEvents()
+
+        marks: dict[str, float] = {}
+        input_dialog.chat.partial_signal.connect(
+            lambda _: marks.setdefault("partial", time.perf_counter()))
+        input_dialog.chat.result_signal.connect(
+            lambda _: marks.setdefault("complete", time.perf_counter()))
+
+        first_partial, complete, first_audio = [], [], []
+        for _ in range(turns):
+            host.live2d.first_audio = None
+            marks.clear()
+            input_dialog.input_field.setPlainText("你好")
+            start = time.perf_counter()
+            input_dialog.send_message()
+            if not wait_until(lambda: host.live2d.first_audio is not None):
+                raise TimeoutError("turn did not finish")
+            first_partial.append((marks["partial"] - start) * 1000)
+            complete.append((marks["complete"] - start) * 1000)
+            first_audio.append((host.live2d.first_audio - start) * 1000)
+            input_dialog.continue_conversation()
+
+        host.close()
+        return {
+            "turns": turns,
+            "mock": {
+                "first_token_delay_ms": first_token_delay_ms,
+                "token_interval_ms": token_interval_ms,
+                "synth_delay_ms": synth_delay_ms,
+            },
+            "first_partial": summarize(first_partial),
+            "reply_complete": summarize(complete),
+            "first_audio": summarize(first_audio),
+            "trace": input_dialog.tracer.summary(),
+        }
+    finally:
+        dialog.Chat, dialog.TTS = original
@@ -0,0 +1,75 @@
+import os
+import platform
+import subprocess
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).parent.parent
+RES_FOLDER = ROOT / "resources"
+MODEL_PATH = RES_FOLDER / "miku_pro_jp/runtime/miku_sample_t04.model3.json"
+BACKGROUND_PATH = RES_FOLDER / "schoolroomhibig130901.jpg"
+
+
+def setup_environment() -> None:
+    """使用 offscreen 平台和软件 OpenGL，需要在导入 Qt 之前调用"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    os.environ.setdefault("QT_OPENGL", "software")
+    os.environ.setdefault("LIBGL_ALWAYS_SOFTWARE", "1")
+
+
+def application():
+    from PySide6.QtCore import QCoreApplication, Qt
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication.instance()
+    if app is None:
+        QCoreApplication.setAttribute(Qt.ApplicationAttribute.AA_UseSoftwareOpenGL)
+        app = QApplication([])
+    return app
+
+
+def summarize(samples_ms: list[float] | np.ndarray) -> dict[str, float]:
+    data = np.asarray(samples_ms, dtype=np.float64)
+    if data.size == 0:
+        return {"n": 0}
+    return {
+        "n": int(data.size),
+        "mean_ms": float(data.mean()),
+        "p50_ms": float(np.percentile(data, 50)),
+        "p90_ms": float(np.percentile(data, 90)),
+        "p99_ms": float(np.percentile(data, 99)),
+        "min_ms": float(data.min()),
+        "max_ms": float(data.max()),
+    }
+
+
+def wait_until(predicate, timeout: float = 10.0) -> bool:
+    """处理 Qt 事件直到条件满足"""
+    app = application()
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            return False
+        app.processEvents()
+        time.sleep(0.0005)
+    return True
+
+
+def metadata() -> dict[str, str]:
+    from PySide6 import __version__ as pyside_version
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = ""
+    return {
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "pyside": pyside_version,
+        "platform": platform.platform(),
+        "qpa": os.environ.get("QT_QPA_PLATFORM", ""),
+    }
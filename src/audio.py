@@ -0,0 +1,163 @@
+import io
+import wave
+from dataclasses import dataclass
+
+import numpy as np
+
+
+def to_int16(frames: bytes, sample_width: int) -> bytes:
+    """把 wav 的整数 PCM 转为 16 位，8 位为无符号，24/32 位只保留高 16 位"""
+    if sample_width == 2:
+        return frames
+    raw = np.frombuffer(frames, dtype=np.uint8)
+    if sample_width == 1:
+        samples = (raw.astype(np.int16) - 128) << 8
+    elif sample_width == 3:
+        samples = raw[:raw.size - raw.size % 3].reshape(-1, 3)[:, 1:].copy().view("<i2")
+    elif sample_width == 4:
+        samples = np.frombuffer(frames, dtype="<i4") >> 16
+    else:
+        raise ValueError(f"不支持的 wav 采样位数: {sample_width * 8}")
+    return samples.astype("<i2").tobytes()
+
+
+@dataclass(frozen=True)
+class LipSyncConfig:
+    """口型同步参数，调整后只影响包络的预计算，不增加每帧开销"""
+    window_ms: float = 20.0  # 每个包络点对应的时长
+    smoothing_ms: float = 60.0  # 平滑窗口，越大嘴型变化越柔和
+    threshold: float = 0.02  # 低于该 RMS 视为静音
+    gamma: float = 1.0  # 响应曲线，小于 1 时小音量也会明显张嘴
+    gain: float = 2.5  # 控制嘴巴张合幅度
+    max_value: float = 2.5
+
+
+@dataclass
+class LipSyncEnvelope:
+    """整段音频的嘴型包络，按播放位置直接查表"""
+    values: np.ndarray
+    window_ms: float
+    config: LipSyncConfig
+
+    @classmethod
+    def compute(cls, samples: np.ndarray, frame_rate: int,
+                config: LipSyncConfig) -> "LipSyncEnvelope":
+        mono = samples.mean(axis=0) if samples.ndim > 1 else samples
+        hop = max(int(frame_rate * config.window_ms / 1000), 1)
+        count = -(-mono.size // hop)
+        padded = np.zeros(count * hop, dtype=np.float32)
+        padded[:mono.size] = mono
+        rms = np.sqrt(np.mean(np.square(padded.reshape(count, hop)), axis=1))
+
+        width = int(round(config.smoothing_ms / config.window_ms))
+        if width > 1 and rms.size:
+            rms = np.convolve(rms, np.full(width, 1 / width, dtype=np.float32), mode="same")
+
+        level = np.clip((rms - config.threshold) / (1 - config.threshold), 0, 1)
+        values = np.minimum(np.power(level, config.gamma) * config.gain, config.max_value)
+        return cls(values.astype(np.float32), hop * 1000 / frame_rate, config)
+
+    def value_at(self, position_ms: float) -> float:
+        index = int(position_ms / self.window_ms)
+        if index < 0 or index >= self.values.size:
+            return 0.0
+        return float(self.values[index])
+
+
+@dataclass
+class PcmAudio:
+    """内存中的音频，解码一次后同时供播放器和口型同步使用"""
+    data: bytes  # wav 数据，交给 QMediaPlayer 播放；流式解码得到的片段为空，见 wavData
+    samples: np.ndarray  # 归一化后的 PCM，形状为 (声道数, 帧数)
+    frame_rate: int
+    envelope: LipSyncEnvelope | None = None
+    pcm: bytes = b""  # 16 位交错 PCM，交给 PcmPlayer 直接播放
+
+    @classmethod
+    def from_wav(cls, data: bytes, lip_sync: LipSyncConfig | None = None) -> "PcmAudio":
+        """解码 wav，给出 lip_sync 时同时预计算嘴型包络；非 16 位的采样先转为 16 位"""
+        with wave.open(io.BytesIO(data), "rb") as wav_file:
+            channels = wav_file.getnchannels()
+            frame_rate = wav_file.getframerate()
+            frames = to_int16(wav_file.readframes(wav_file.getnframes()),
+                              wav_file.getsampwidth())
+        samples = np.frombuffer(frames, dtype=np.int16).astype(np.float32)
+        peak = np.max(np.abs(samples)) if samples.size else 0
+        if peak > 0:
+            samples /= peak
+        audio = cls(data, samples.reshape(-1, channels).T, frame_rate, pcm=frames)
+        if lip_sync is not None:
+            audio.computeEnvelope(lip_sync)
+        return audio
+
+    @classmethod
+    def from_pcm(cls, pcm: bytes, frame_rate: int, channels: int = 1,
+                 lip_sync: LipSyncConfig | None = None,
+                 peak: float | None = None) -> "PcmAudio":
+        """由 16 位交错 PCM 构造，用于流式解码的片段
+
+        peak 为归一化用的峰值，流式解码时传入目前为止的最大值，使各段与整段解码的嘴型一致。
+        """
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+        samples /= peak if peak else 32768
+        audio = cls(b"", samples.reshape(-1, channels).T, frame_rate, pcm=pcm)
+        if lip_sync is not None:
+            audio.computeEnvelope(lip_sync)
+        return audio
+
+    @staticmethod
+    def peakOf(pcm: bytes) -> int:
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        return int(np.max(np.abs(samples.astype(np.int32)))) if samples.size else 0
+
+    def wavData(self) -> bytes:
+        """wav 数据，没有时由 PCM 生成"""
+        if not self.data:
+            buffer = io.BytesIO()
+            with wave.open(buffer, "wb") as wav_file:
+                wav_file.setnchannels(self.channels)
+                wav_file.setsampwidth(2)
+                wav_file.setframerate(self.frame_rate)
+                wav_file.writeframes(self.pcmData())
+            self.data = buffer.getvalue()
+        return self.data
+
+    def computeEnvelope(self, config: LipSyncConfig) -> LipSyncEnvelope:
+        self.envelope = LipSyncEnvelope.compute(self.samples, self.frame_rate, config)
+        return self.envelope
+
+    @property
+    def num_frames(self) -> int:
+        return self.samples.shape[1]
+
+    @property
+    def channels(self) -> int:
+        return self.samples.shape[0]
+
+    def pcmData(self) -> bytes:
+        """16 位交错 PCM，没有原始数据时由归一化的采样转换"""
+        if not self.pcm and self.samples.size:
+            self.pcm = (np.clip(self.samples.T, -1, 1) * 32767).astype(np.int16).tobytes()
+        return self.pcm
+
+
+class LipSync:
+    """根据播放位置读取预计算的嘴型包络"""
+
+    def __init__(self, config: LipSyncConfig | None = None) -> None:
+        self.config = config if config is not None else LipSyncConfig()
+        self.audio: PcmAudio | None = None
+
+    def start(self, audio: PcmAudio) -> None:
+        # 正常情况下包络已在 TTS 线程中算好，参数变化时才在这里重算
+        if audio.envelope is None or audio.envelope.config != self.config:
+            audio.computeEnvelope(self.config)
+        self.audio = audio
+
+    def stop(self) -> None:
+        self.audio = None
+
+    def value_at(self, position_ms: float) -> float:
+        if self.audio is None or self.audio.envelope is None:
+            return 0.0
+        return self.audio.envelope.value_at(position_ms)
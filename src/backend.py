@@ -0,0 +1,284 @@
+import http.client
+import json
+import os
+import queue
+import threading
+from abc import ABC, abstractmethod
+from typing import Iterator
+from urllib.parse import urlsplit
+
+DEFAULT_TTS_APP_ID = "f465fd78-aa59-4011-af81-2192a46038f2"
+
+
+class ChatBackend(ABC):
+    """对话服务接口"""
+
+    @abstractmethod
+    def create_conversation(self) -> str:
+        ...
+
+    @abstractmethod
+    def stream(self, conversation_id: str, text: str) -> Iterator[str]:
+        """流式返回回复，每次产出新增的文本片段"""
+        ...
+
+    def run(self, conversation_id: str, text: str) -> str:
+        return "".join(self.stream(conversation_id, text))
+
+    def fingerprint(self) -> str:
+        """标识角色设定与服务，回复缓存只在相同指纹下复用"""
+        return type(self).__name__
+
+
+class TTSBackend(ABC):
+    """语音合成服务接口"""
+
+    @abstractmethod
+    def synthesize(self, text: str, person: int, audio_type: str) -> bytes:
+        ...
+
+    def synthesize_stream(self, text: str, person: int, audio_type: str) -> Iterator[bytes]:
+        """边下载边产出音频数据，默认整段返回"""
+        yield self.synthesize(text, person, audio_type)
+
+
+class LazyClient:
+    """第一次使用时才创建客户端
+
+    导入 appbuilder 需要 1 秒左右，放到第一个使用它的工作线程中进行，不阻塞窗口显示。
+    """
+
+    def __init__(self, create) -> None:
+        self.create = create
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self.create()
+        return self._client
+
+
+def with_default_timeout(session, timeout: float) -> None:
+    """为 requests 会话补上默认超时
+
+    appbuilder 的对话接口总是传 timeout=None，服务端挂起时工作线程会一直阻塞，
+    调度器的超时只能放弃结果，不能释放线程。
+    """
+    request = session.request
+
+    def request_with_timeout(*args, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = timeout
+        return request(*args, **kwargs)
+
+    session.request = request_with_timeout
+
+
+class AppBuilderChatBackend(ChatBackend):
+
+    def __init__(self, app_id: str, timeout: float = 30.0) -> None:
+        self.app_id = app_id
+        self.timeout = timeout  # 连接及两次读取之间的最长等待，秒
+        self._client = LazyClient(self._create_client)
+
+    def _create_client(self):
+        import appbuilder
+
+        client = appbuilder.AppBuilderClient(self.app_id)
+        with_default_timeout(client.http_client.session, self.timeout)
+        return client
+
+    @property
+    def client(self):
+        return self._client.get()
+
+    def fingerprint(self) -> str:
+        return f"appbuilder:{self.app_id}"
+
+    def create_conversation(self) -> str:
+        return self.client.create_conversation()
+
+    def stream(self, conversation_id: str, text: str) -> Iterator[str]:
+        ret = self.client.run(conversation_id, text, stream=True)
+        for content in ret.content:
+            if content.answer:
+                yield content.answer
+
+    def run(self, conversation_id: str, text: str) -> str:
+        ret = self.client.run(conversation_id, text)
+        assert ret.content is not None
+        return ret.content.answer
+
+
+class AppBuilderTTSBackend(TTSBackend):
+
+    def __init__(self, app_id: str, timeout: float = 20.0) -> None:
+        self.app_id = app_id
+        self.timeout = timeout
+        self._client = LazyClient(self._create_client)
+
+    def _create_client(self):
+        import appbuilder
+
+        return appbuilder.TTS(self.app_id)
+
+    @property
+    def client(self):
+        return self._client.get()
+
+    def synthesize(self, text: str, person: int, audio_type: str) -> bytes:
+        from appbuilder.core.message import Message
+
+        ret = self.client.run(Message({"text": text}), person=person, audio_type=audio_type,
+                              timeout=float(self.timeout))
+        assert ret.content is not None
+        return ret.content["audio_binary"]
+
+
+class ConnectionPool:
+    """复用 keep-alive 连接的 HTTP 连接池，线程安全"""
+
+    def __init__(self, url: str, size: int = 8, timeout: float = 30.0) -> None:
+        parts = urlsplit(url)
+        self.scheme = parts.scheme or "http"
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.idle: queue.LifoQueue[http.client.HTTPConnection] = queue.LifoQueue(maxsize=size)
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method: str, path: str,
+                body: dict | None = None) -> tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        """发送请求，调用方读完响应后需要调用 release 归还连接"""
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        # 空闲连接可能已被服务端关闭，失败时换新连接重试一次
+        for attempt in range(2):
+            try:
+                connection = self.idle.get_nowait()
+                reused = True
+            except queue.Empty:
+                connection = self._connect()
+                reused = False
+            try:
+                connection.request(method, self.base_path + path, body=data, headers=headers)
+                response = connection.getresponse()
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            if response.status >= 400:
+                message = response.read().decode("utf-8", "replace")
+                self.release(connection, response)
+                raise RuntimeError(f"HTTP {response.status}: {message}")
+            return connection, response
+        raise RuntimeError("unreachable")
+
+    def release(self, connection: http.client.HTTPConnection,
+                response: http.client.HTTPResponse) -> None:
+        if response.will_close or not response.isclosed():
+            connection.close()
+            return
+        try:
+            self.idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class HttpChatBackend(ChatBackend):
+    """通过 HTTP 访问对话服务（如 standin_server），回复按行流式返回 JSON"""
+
+    def __init__(self, url: str, pool: ConnectionPool | None = None) -> None:
+        self.url = url
+        self.pool = pool if pool is not None else ConnectionPool(url)
+
+    def fingerprint(self) -> str:
+        return f"http:{self.url}"
+
+    def create_conversation(self) -> str:
+        connection, response = self.pool.request("POST", "/v1/conversations", {})
+        try:
+            data = json.loads(response.read())
+        finally:
+            self.pool.release(connection, response)
+        return data["conversation_id"]
+
+    def stream(self, conversation_id: str, text: str) -> Iterator[str]:
+        connection, response = self.pool.request("POST", "/v1/chat", {
+            "conversation_id": conversation_id,
+            "query": text,
+            "stream": True,
+        })
+        try:
+            while line := response.readline():
+                if line.strip():
+                    yield json.loads(line)["answer"]
+        finally:
+            # 中途取消或解析失败时连接上还有未读数据，release 会关闭它
+            self.pool.release(connection, response)
+
+
+class HttpTTSBackend(TTSBackend):
+
+    def __init__(self, url: str, pool: ConnectionPool | None = None) -> None:
+        self.pool = pool if pool is not None else ConnectionPool(url)
+
+    def synthesize(self, text: str, person: int, audio_type: str) -> bytes:
+        connection, response = self.pool.request("POST", "/v1/tts", {
+            "text": text,
+            "person": person,
+            "audio_type": audio_type,
+        })
+        try:
+            return response.read()
+        finally:
+            self.pool.release(connection, response)
+
+    def synthesize_stream(self, text: str, person: int, audio_type: str,
+                          chunk_size: int = 16 * 1024) -> Iterator[bytes]:
+        connection, response = self.pool.request("POST", "/v1/tts", {
+            "text": text,
+            "person": person,
+            "audio_type": audio_type,
+        })
+        try:
+            while chunk := response.read(chunk_size):
+                yield chunk
+        finally:
+            # 中途取消时连接上还有未读数据，release 会关闭它
+            self.pool.release(connection, response)
+
+
+def backends_from_env(app_id: str | None = None) -> tuple[ChatBackend, TTSBackend]:
+    """根据环境变量选择后端
+
+    设置 VCHAT_BACKEND_URL 时使用 HTTP 后端（如本地 standin_server），
+    否则使用 AppBuilder，app id 来自 APPBUILDER_APP_ID 和 APPBUILDER_TTS_APP_ID。
+    """
+    url = os.environ.get("VCHAT_BACKEND_URL")
+    if url:
+        pool = ConnectionPool(url)
+        return HttpChatBackend(url, pool), HttpTTSBackend(url, pool)
+
+    if app_id is None:
+        app_id = os.environ.get("APPBUILDER_APP_ID")
+    if app_id is None:
+        raise ValueError("Cannot get app id")
+    tts_app_id = os.environ.get("APPBUILDER_TTS_APP_ID", DEFAULT_TTS_APP_ID)
+    return AppBuilderChatBackend(app_id), AppBuilderTTSBackend(tts_app_id)
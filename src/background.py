@@ -0,0 +1,182 @@
+import ctypes
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import OpenGL.GL as gl
+from OpenGL.GL import shaders
+from PySide6.QtCore import QSize, Qt
+from PySide6.QtGui import QImage
+
+VERTEX_SHADER = """
+#version 120
+attribute vec2 position;
+attribute vec2 texcoord;
+varying vec2 v_texcoord;
+void main() {
+    v_texcoord = texcoord;
+    gl_Position = vec4(position, 0.0, 1.0);
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 120
+uniform sampler2D image;
+varying vec2 v_texcoord;
+void main() {
+    gl_FragColor = texture2D(image, v_texcoord);
+}
+"""
+
+# 覆盖整个视口的四边形：x, y, u, v（QImage 第一行在顶部）
+QUAD = np.array([
+    -1.0, 1.0, 0.0, 0.0,
+    -1.0, -1.0, 0.0, 1.0,
+    1.0, 1.0, 1.0, 0.0,
+    1.0, -1.0, 1.0, 1.0,
+], dtype=np.float32)
+
+
+def scale_image(source: QImage | os.PathLike | str, size: QSize) -> tuple[QImage, QImage]:
+    """读取并缩放到目标尺寸（铺满并居中裁剪），转换为 RGBA 以便直接上传"""
+    image = source if isinstance(source, QImage) else QImage(str(source))
+    if image.isNull() or size.isEmpty():
+        return image, image
+    scaled = image.scaled(size, Qt.AspectRatioMode.KeepAspectRatioByExpanding,
+                          Qt.TransformationMode.SmoothTransformation)
+    x = (scaled.width() - size.width()) // 2
+    y = (scaled.height() - size.height()) // 2
+    scaled = scaled.copy(x, y, size.width(), size.height())
+    return image, scaled.convertToFormat(QImage.Format.Format_RGBA8888)
+
+
+class BackgroundLayer:
+    """常驻显存的背景
+
+    图片只在更换或窗口尺寸变化时缩放并上传一次纹理，之后每帧只绘制一个四边形。
+    读取和缩放在后台线程完成，GL 线程在下一帧上传，切换背景不会卡顿。
+    """
+
+    def __init__(self) -> None:
+        self.source: QImage | os.PathLike | str | None = None
+        self.size = QSize()
+        self.texture = 0
+        self.program = 0
+        self.vbo = 0
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.pending: Future | None = None
+        self.has_image = False
+
+    def initialize(self) -> None:
+        """需要在 GL 上下文中调用"""
+        self.program = shaders.compileProgram(
+            shaders.compileShader(VERTEX_SHADER, gl.GL_VERTEX_SHADER),
+            shaders.compileShader(FRAGMENT_SHADER, gl.GL_FRAGMENT_SHADER))
+        self.position_loc = gl.glGetAttribLocation(self.program, "position")
+        self.texcoord_loc = gl.glGetAttribLocation(self.program, "texcoord")
+        self.image_loc = gl.glGetUniformLocation(self.program, "image")
+
+        self.vbo = gl.glGenBuffers(1)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo)
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, QUAD.nbytes, QUAD, gl.GL_STATIC_DRAW)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+
+        self.texture = gl.glGenTextures(1)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self.texture)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+
+    def setImage(self, source: QImage | os.PathLike | str | None) -> None:
+        """更换背景，可在任意时刻调用"""
+        self.source = source
+        self._rescale()
+
+    def resize(self, width: int, height: int) -> None:
+        """窗口尺寸（设备像素）变化时重新缩放"""
+        size = QSize(width, height)
+        if size != self.size:
+            self.size = size
+            self._rescale()
+
+    def _rescale(self) -> None:
+        if self.source is None:
+            self.pending = None
+            return
+        if self.size.isEmpty():
+            return
+        self.pending = self.pool.submit(scale_image, self.source, self.size)
+
+    def _upload(self) -> None:
+        pending = self.pending
+        if pending is None or not pending.done():
+            return
+        self.pending = None
+        source, image = pending.result()
+        # 之后的缩放直接复用已解码的原图
+        if not isinstance(self.source, QImage):
+            self.source = source
+        if image.isNull():
+            return
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self.texture)
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 4)
+        gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_RGBA, image.width(), image.height(), 0,
+                        gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, bytes(image.constBits()))
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+        self.has_image = True
+
+    def draw(self) -> None:
+        """绘制背景，需要在 model.Draw() 之前调用"""
+        if not self.program:
+            return
+        if self.source is None:
+            self.has_image = False
+        self._upload()
+        if not self.has_image:
+            return
+
+        blend = gl.glIsEnabled(gl.GL_BLEND)
+        gl.glDisable(gl.GL_BLEND)
+        gl.glUseProgram(self.program)
+        gl.glActiveTexture(gl.GL_TEXTURE0)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self.texture)
+        gl.glUniform1i(self.image_loc, 0)
+
+        stride = 4 * QUAD.itemsize
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo)
+        gl.glEnableVertexAttribArray(self.position_loc)
+        gl.glVertexAttribPointer(self.position_loc, 2, gl.GL_FLOAT, gl.GL_FALSE, stride,
+                                 ctypes.c_void_p(0))
+        gl.glEnableVertexAttribArray(self.texcoord_loc)
+        gl.glVertexAttribPointer(self.texcoord_loc, 2, gl.GL_FLOAT, gl.GL_FALSE, stride,
+                                 ctypes.c_void_p(2 * QUAD.itemsize))
+        gl.glDrawArrays(gl.GL_TRIANGLE_STRIP, 0, 4)
+
+        # 恢复状态，避免影响 Live2D 的渲染
+        gl.glDisableVertexAttribArray(self.position_loc)
+        gl.glDisableVertexAttribArray(self.texcoord_loc)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+        gl.glUseProgram(0)
+        if blend:
+            gl.glEnable(gl.GL_BLEND)
+
+    def release(self) -> None:
+        """释放显存资源，需要在 GL 上下文中调用；之后可以重新 initialize"""
+        if self.texture:
+            gl.glDeleteTextures(1, [self.texture])
+        if self.vbo:
+            gl.glDeleteBuffers(1, [self.vbo])
+        if self.program:
+            gl.glDeleteProgram(self.program)
+        self.texture = self.vbo = self.program = 0
+        # 纹理已删除，下次 resize 时重新缩放上传
+        self.has_image = False
+        self.size = QSize()
+
+    def dispose(self) -> None:
+        """退出时释放显存资源和缩放线程，需要在 GL 上下文中调用"""
+        self.release()
+        self.pool.shutdown(wait=False)
@@ -1,19 +1,214 @@
-from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QScrollArea, QLabel,
-                               QTextBrowser, QFrame)
-from PySide6.QtGui import QPixmap, QPainter, QBrush, QFontMetrics, QTextOption
-from PySide6.QtCore import Qt
-import darkdetect
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListView, QStyledItemDelegate,
+                               QStyleOptionViewItem, QAbstractItemView, QFrame, QLabel,
+                               QLineEdit, QPushButton)
+from PySide6.QtGui import (QPixmap, QPainter, QBrush, QFont, QKeySequence, QPen, QShortcut,
+                           QTextLayout, QTextOption)
+from PySide6.QtCore import (Qt, QAbstractListModel, QModelIndex, QPersistentModelIndex,
+                            QPointF, QRectF, QSize, QTimer)
+
+from .scheduler import RequestScheduler
+from .store import ConversationStore, StoredMessage
+from .theme import LIGHT, Theme, ThemeManager
+
+
+@dataclass(eq=False)
+class ChatMessage:
+    text: str
+    is_me: bool
+    id: int | None = None  # 对话记录中的 ID，没有对话记录时为 None
+
+
+class ChatModel(QAbstractListModel):
+    """聊天记录模型，只保存数据，不创建任何控件"""
+
+    MessageRole = Qt.ItemDataRole.UserRole + 1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.messages: list[ChatMessage] = []
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.messages)
+
+    def data(self, index: QModelIndex | QPersistentModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        message = self.messages[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return message.text
+        if role == self.MessageRole:
+            return message
+        return None
+
+    def append(self, message: ChatMessage):
+        row = len(self.messages)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.messages.append(message)
+        self.endInsertRows()
+
+    def extend(self, messages: list[ChatMessage]):
+        if not messages:
+            return
+        row = len(self.messages)
+        self.beginInsertRows(QModelIndex(), row, row + len(messages) - 1)
+        self.messages.extend(messages)
+        self.endInsertRows()
+
+    def prepend(self, messages: list[ChatMessage]):
+        if not messages:
+            return
+        self.beginInsertRows(QModelIndex(), 0, len(messages) - 1)
+        self.messages[:0] = messages
+        self.endInsertRows()
+
+    def updateLast(self, text: str) -> ChatMessage | None:
+        if not self.messages:
+            return None
+        message = self.messages[-1]
+        message.text = text
+        index = self.index(len(self.messages) - 1)
+        self.dataChanged.emit(index, index)
+        return message
+
+    def clear(self):
+        self.beginResetModel()
+        self.messages.clear()
+        self.endResetModel()
+
+
+class BubbleDelegate(QStyledItemDelegate):
+    """绘制聊天气泡，文本排版结果按 (消息, 宽度) 缓存，只为可见行排版"""
+
+    AVATAR_SIZE = 40
+    MARGIN = 9  # 行外边距
+    SPACING = 5  # 头像与气泡间距
+    PADDING_H = 10
+    PADDING_V = 5
+    RADIUS = 10
+    LAYOUT_CACHE_SIZE = 256
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.avatars: dict[bool, QPixmap] = {}
+        self.theme = LIGHT
+        self.highlighted: ChatMessage | None = None  # 当前搜索结果
+        self.font = QFont()
+        self.font.setPixelSize(14)
+        self.text_option = QTextOption()
+        self.text_option.setWrapMode(QTextOption.WrapMode.WrapAtWordBoundaryOrAnywhere)
+        # (消息, 文本宽度) -> (排版, 实际文本宽度, 文本高度)
+        self.layouts: OrderedDict[tuple[ChatMessage, int], tuple[QTextLayout, float, float]] = OrderedDict()
+        # 消息 -> (行宽, 行高)，只存数字，不受可见范围限制
+        self.heights: dict[ChatMessage, tuple[int, int]] = {}
+
+    def maxTextWidth(self, row_width: int) -> int:
+        # 与原先控件实现一致：气泡最大宽度为窗口宽度减 100
+        return max(row_width - 100 - 2 * self.PADDING_H, 20)
+
+    def textLayout(self, message: ChatMessage, text_width: int) -> tuple[QTextLayout, float, float]:
+        key = (message, text_width)
+        cached = self.layouts.get(key)
+        if cached is not None:
+            self.layouts.move_to_end(key)
+            return cached
+
+        layout = QTextLayout(message.text.replace("\n", "\u2028"), self.font)
+        layout.setTextOption(self.text_option)
+        layout.setCacheEnabled(True)
+        layout.beginLayout()
+        height = 0.0
+        natural_width = 0.0
+        while True:
+            line = layout.createLine()
+            if not line.isValid():
+                break
+            line.setLineWidth(text_width)
+            line.setPosition(QPointF(0, height))
+            height += line.height()
+            natural_width = max(natural_width, line.naturalTextWidth())
+        layout.endLayout()
+
+        cached = (layout, natural_width, height)
+        self.layouts[key] = cached
+        if len(self.layouts) > self.LAYOUT_CACHE_SIZE:
+            self.layouts.popitem(last=False)
+        return cached
+
+    def forget(self, message: ChatMessage):
+        """消息内容改变后丢弃其缓存"""
+        self.heights.pop(message, None)
+        for key in [key for key in self.layouts if key[0] is message]:
+            del self.layouts[key]
+
+    def clearCache(self):
+        self.layouts.clear()
+        self.heights.clear()
+
+    def sizeHint(self, option: QStyleOptionViewItem, index: QModelIndex | QPersistentModelIndex) -> QSize:
+        message: ChatMessage = index.data(ChatModel.MessageRole)
+        # QListView 传入的 option.rect 可能为空，以视口宽度为准
+        view = option.widget
+        row_width = view.viewport().width() if isinstance(view, QAbstractItemView) else option.rect.width()
+        cached = self.heights.get(message)
+        if cached is None or cached[0] != row_width:
+            _, _, text_height = self.textLayout(message, self.maxTextWidth(row_width))
+            bubble_height = int(text_height) + 2 * self.PADDING_V
+            cached = (row_width, max(bubble_height, self.AVATAR_SIZE) + 2 * self.MARGIN)
+            self.heights[message] = cached
+        return QSize(row_width, cached[1])
+
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem, index: QModelIndex | QPersistentModelIndex):
+        message: ChatMessage = index.data(ChatModel.MessageRole)
+        rect = option.rect
+        layout, natural_width, text_height = self.textLayout(
+            message, self.maxTextWidth(rect.width()))
+
+        bubble_width = natural_width + 2 * self.PADDING_H
+        bubble_height = text_height + 2 * self.PADDING_V
+        top = rect.top() + self.MARGIN
+        if message.is_me:
+            avatar_x = rect.right() - self.MARGIN - self.AVATAR_SIZE
+            bubble_x = avatar_x - self.SPACING - bubble_width
+        else:
+            avatar_x = rect.left() + self.MARGIN
+            bubble_x = avatar_x + self.AVATAR_SIZE + self.SPACING
+
+        if message.is_me:
+            background, foreground = self.theme.bubble_me, self.theme.bubble_me_text
+        else:
+            background, foreground = self.theme.bubble_other, self.theme.bubble_other_text
+
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        avatar = self.avatars.get(message.is_me)
+        if avatar is not None:
+            painter.drawPixmap(avatar_x, top, avatar)
+        if message is self.highlighted:
+            painter.setPen(QPen(self.theme.highlight, 2))
+        else:
+            painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(background)
+        painter.drawRoundedRect(QRectF(bubble_x, top, bubble_width, bubble_height),
+                                self.RADIUS, self.RADIUS)
+        painter.setPen(foreground)
+        layout.draw(painter, QPointF(bubble_x + self.PADDING_H, top + self.PADDING_V))
+        painter.restore()
 
 
 class ChatWindow(QWidget):
 
-    def __init__(self, avatar1, avatar2):
+    PAGE_SIZE = 50
+    SEARCH_PAGE_SIZE = 200
+
+    def __init__(self, avatar1, avatar2, store: ConversationStore | None = None,
+                 theme: ThemeManager | None = None):
         super().__init__()
         self.setWindowTitle("聊天界面")
         self.resize(400, 600)
 
-        # 检测深色模式
-        self.is_dark_mode = darkdetect.isDark()
         self.avatar1 = avatar1
         self.avatar2 = avatar2
 
@@ -21,115 +216,320 @@ class ChatWindow(QWidget):
         main_layout = QVBoxLayout(self)
         main_layout.setContentsMargins(0, 0, 0, 0)
 
-        # 滚动区域
-        self.scroll_area = QScrollArea(self)
-        self.scroll_area.setWidgetResizable(True)
-        main_layout.addWidget(self.scroll_area)
+        # 搜索栏：Ctrl+F 聚焦，回车跳到更早的一条结果
+        search_layout = QHBoxLayout()
+        search_layout.setContentsMargins(8, 8, 8, 0)
+        self.search_field = QLineEdit(self)
+        self.search_field.setPlaceholderText("搜索聊天记录")
+        self.search_field.setClearButtonEnabled(True)
+        self.search_field.returnPressed.connect(self.searchOlder)
+        self.search_field.textChanged.connect(self.resetSearch)
+        search_layout.addWidget(self.search_field)
+        self.search_status = QLabel(self)
+        search_layout.addWidget(self.search_status)
+        older_button = QPushButton("上一个", self)
+        older_button.clicked.connect(self.searchOlder)
+        search_layout.addWidget(older_button)
+        newer_button = QPushButton("下一个", self)
+        newer_button.clicked.connect(self.searchNewer)
+        search_layout.addWidget(newer_button)
+        main_layout.addLayout(search_layout)
+        QShortcut(QKeySequence.StandardKey.Find, self, self.search_field.setFocus)
+        self.search_results: list[StoredMessage | ChatMessage] | None = None
+        self.search_index = 0
+        self.search_more = False  # 是否还有更早的结果未取回
+        # 查询在后台线程中进行，结果按页取回
+        self.search_scheduler = RequestScheduler(self, max_workers=1, timeout=None, retries=0)
+        self.search_request: int | None = None
 
-        # 聊天内容区域
-        self.chat_content = QWidget()
-        self.chat_layout = QVBoxLayout(self.chat_content)
-        self.chat_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        self.chat_layout.addStretch()
-        self.chat_layout.setSpacing(0)
-        self.scroll_area.setWidget(self.chat_content)
+        # 聊天内容区域：模型/视图，只绘制可见的消息
+        self.model = ChatModel(self)
+        self.delegate = BubbleDelegate(self)
+        self.delegate.avatars = {
+            False: self.createRoundedAvatar(QPixmap(self.avatar1), BubbleDelegate.AVATAR_SIZE),
+            True: self.createRoundedAvatar(QPixmap(self.avatar2), BubbleDelegate.AVATAR_SIZE),
+        }
+        self.view = QListView(self)
+        self.view.setModel(self.model)
+        self.view.setItemDelegate(self.delegate)
+        self.view.setFrameShape(QFrame.Shape.NoFrame)
+        self.view.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.view.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.view.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.view.setResizeMode(QListView.ResizeMode.Adjust)
+        self.view.setLayoutMode(QListView.LayoutMode.Batched)
+        self.view.setBatchSize(200)
+        self.view.setUniformItemSizes(False)
+        main_layout.addWidget(self.view)
 
         self.setLayout(main_layout)
 
-        # 设置样式
-        self.updateStyles()
-
-    def updateStyles(self):
-        """根据深色模式更新样式"""
-        if self.is_dark_mode:
-            self.setStyleSheet("""
-                QWidget {
-                    background-color: #121212;
-                }
-                QTextBrowser {
-                    color: #FFFFFF;
-                }
-            """)
+        # 配色由全局主题决定，系统切换深色模式时自动更新
+        self.setAutoFillBackground(True)
+        self.theme = theme if theme is not None else ThemeManager.instance()
+        self.theme.changed.connect(self.updateStyles)
+        self.updateStyles(self.theme.theme)
+
+        # 历史记录：启动时只加载最新一页，向上滚动时再加载更早的；
+        # 跳转到较早的搜索结果时只加载它前后各一页，向下滚动时再加载更新的
+        self.store = store
+        self.oldest_id: int | None = None
+        self.newest_id: int | None = None
+        self.has_more = store is not None
+        self.has_newer = False
+        self.history_floor: int | None = None  # 清空后不再显示该 ID 及之前的记录
+        self.fetching = False
+        self.view.verticalScrollBar().valueChanged.connect(self.maybeFetchOlder)
+        self.view.verticalScrollBar().valueChanged.connect(self.maybeFetchNewer)
+        if store is not None:
+            self.loadLatest()
+
+    def visibleHistory(self, page: list[StoredMessage]) -> list[StoredMessage]:
+        if self.history_floor is None:
+            return page
+        return [m for m in page if m.id > self.history_floor]
+
+    def loadLatest(self):
+        assert self.store is not None
+        page = self.store.latest(self.PAGE_SIZE)
+        visible = self.visibleHistory(page)
+        self.has_more = len(visible) == self.PAGE_SIZE
+        self.has_newer = False
+        if visible:
+            self.oldest_id, self.newest_id = visible[0].id, visible[-1].id
+            self.model.prepend([ChatMessage(m.text, m.is_me, m.id) for m in visible])
+            self.scrollToBottom()
+
+    def loadAround(self, message_id: int) -> int | None:
+        """以 message_id 为中心重新加载前后各一页，返回它所在的行"""
+        assert self.store is not None
+        older = self.visibleHistory(self.store.before(message_id + 1, self.PAGE_SIZE))
+        if not older or older[-1].id != message_id:
+            return None
+        newer = self.store.after(message_id, self.PAGE_SIZE)
+        self.has_more = len(older) == self.PAGE_SIZE
+        self.has_newer = len(newer) == self.PAGE_SIZE
+        page = older + newer
+        self.oldest_id, self.newest_id = page[0].id, page[-1].id
+        self.fetching = True
+        try:
+            self.model.clear()
+            self.delegate.clearCache()
+            self.model.extend([ChatMessage(m.text, m.is_me, m.id) for m in page])
+            self.layoutNow()
+        finally:
+            self.fetching = False
+        return len(older) - 1
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        QTimer.singleShot(0, self.maybeFetchOlder)
+
+    def maybeFetchOlder(self, *args):
+        """滚动到顶部附近时加载更早的一页"""
+        if (self.fetching or not self.has_more or not self.isVisible() or
+                self.store is None or self.oldest_id is None):
+            return
+        scroll_bar = self.view.verticalScrollBar()
+        if scroll_bar.value() > self.view.viewport().height():
+            return
+        page = self.store.before(self.oldest_id, self.PAGE_SIZE)
+        visible = self.visibleHistory(page)
+        self.has_more = len(visible) == self.PAGE_SIZE
+        page = visible
+        if not page:
+            return
+        self.oldest_id = page[0].id
+
+        # 插入后保持当前可见内容不动
+        self.fetching = True
+        try:
+            old_max = scroll_bar.maximum()
+            old_value = scroll_bar.value()
+            self.model.prepend([ChatMessage(m.text, m.is_me, m.id) for m in page])
+            self.layoutNow()
+            scroll_bar.setValue(old_value + scroll_bar.maximum() - old_max)
+        finally:
+            self.fetching = False
+        # 内容仍不足一屏时继续加载
+        QTimer.singleShot(0, self.maybeFetchOlder)
+
+    def maybeFetchNewer(self, *args):
+        """跳转到较早的记录后，滚动到底部附近时加载更新的一页"""
+        if (self.fetching or not self.has_newer or not self.isVisible() or
+                self.store is None or self.newest_id is None):
+            return
+        scroll_bar = self.view.verticalScrollBar()
+        if scroll_bar.maximum() - scroll_bar.value() > self.view.viewport().height():
+            return
+        page = self.store.after(self.newest_id, self.PAGE_SIZE)
+        self.has_newer = len(page) == self.PAGE_SIZE
+        if not page:
+            return
+        self.newest_id = page[-1].id
+        self.fetching = True
+        try:
+            self.model.extend([ChatMessage(m.text, m.is_me, m.id) for m in page])
+            self.layoutNow()
+        finally:
+            self.fetching = False
+        QTimer.singleShot(0, self.maybeFetchNewer)
+
+    def jumpToLatest(self):
+        """重新加载最新一页，用于在查看较早记录时收到新消息"""
+        self.model.clear()
+        self.delegate.clearCache()
+        self.oldest_id = self.newest_id = None
+        self.loadLatest()
+
+    def layoutNow(self):
+        """分批布局时滚动范围不会立即更新，插入旧消息后需要一次完成布局"""
+        self.view.setLayoutMode(QListView.LayoutMode.SinglePass)
+        self.view.doItemsLayout()
+        self.view.setLayoutMode(QListView.LayoutMode.Batched)
+
+    def resetSearch(self, *args):
+        if self.search_request is not None:
+            self.search_scheduler.cancel(self.search_request)
+            self.search_request = None
+        self.search_results = None
+        self.search_more = False
+        self.search_status.clear()
+        if self.delegate.highlighted is not None:
+            self.delegate.highlighted = None
+            self.view.viewport().update()
+
+    def runSearch(self, step: int):
+        """有对话记录时在后台查全文索引，否则在已显示的消息中查找；得到结果后移动 step 条"""
+        query = self.search_field.text()
+        if self.store is None:
+            terms = query.split()
+            self.search_results = [m for m in self.model.messages
+                                   if terms and all(t in m.text for t in terms)]
+            self.search_index = len(self.search_results)
+            self.showSearchResult(self.search_index + step)
+            return
+        self.fetchSearchPage(query, None, step)
+
+    def fetchSearchPage(self, query: str, before_id: int | None, step: int):
+        """取回 before_id 之前的一页结果，多取一条用于判断是否还有更早的"""
+        store = self.store
+        self.search_status.setText("搜索中…")
+        self.search_request = self.search_scheduler.submit(
+            lambda request: store.search(query, self.SEARCH_PAGE_SIZE + 1, before_id),
+            on_done=lambda page: self.on_search_page(page, step),
+            on_error=self.on_search_error)
+
+    def on_search_page(self, page: list[StoredMessage], step: int):
+        self.search_request = None
+        self.search_more = len(page) > self.SEARCH_PAGE_SIZE
+        if self.search_more:
+            page = page[1:]
+        visible = self.visibleHistory(page)
+        if len(visible) < len(page):
+            # 更早的结果已随清空隐藏
+            page, self.search_more = visible, False
+        if self.search_results is None:
+            self.search_results = page
+            self.search_index = len(page)
         else:
-            self.setStyleSheet("""
-                QWidget {
-                    background-color: #FFFFFF;
-                }
-                QTextBrowser {
-                    color: #000000;
-                }
-            """)
-
-    def addMessage(self, message: str, isMe: bool):
-        """添加消息"""
-        # 消息容器
-        message_widget = QWidget()
-        message_layout = QHBoxLayout(message_widget)
-        message_layout.setSpacing(5)
-        message_layout.setAlignment((
-            Qt.AlignmentFlag.AlignRight if isMe else Qt.AlignmentFlag.AlignLeft)
-                                    | Qt.AlignmentFlag.AlignTop)
-
-        # 头像
-        avatar_label = QLabel()
-        avatar_pixmap = self.createRoundedAvatar(QPixmap(self.avatar2 if isMe else self.avatar1), 40)
-        avatar_label.setPixmap(avatar_pixmap)
-        avatar_label.setFixedSize(40, 40)
-
-        # 消息内容
-        message_browser = QTextBrowser()
-        message_browser.setText(message)
-        message_browser.setWordWrapMode(QTextOption.WrapMode.WordWrap)  # 启用自动换行
-        message_browser.setVerticalScrollBarPolicy(
-            Qt.ScrollBarPolicy.ScrollBarAlwaysOff)  # 隐藏垂直滚动条
-        message_browser.setHorizontalScrollBarPolicy(
-            Qt.ScrollBarPolicy.ScrollBarAlwaysOff)  # 隐藏水平滚动条
-        max_width = self.width() - 100  # 动态计算最大宽度
-        message_browser.setMaximumWidth(max_width)
-        background_color = "#2C2C2C" if self.is_dark_mode else "#F5F5F5"
-        message_browser.setStyleSheet(f"""
-            background-color: {'#1E88E5' if isMe else background_color};
-            color: {'#000000' if not isMe and not self.is_dark_mode else '#FFFFFF'};
-            border-radius: 10px;
-            padding: 5px 10px;
-            font-size: 14px;
-        """)
-        message_browser.setReadOnly(True)  # 设置只读
-        message_browser.setFrameShape(QFrame.Shape.NoFrame)  # 移除边框
-
-        # 动态调整宽度和高度
-        max_width = self.width() - 100  # 动态计算最大宽度
-        message_browser.setMaximumWidth(max_width)
-        message_browser.document().setTextWidth(max_width)
-
-        # 动态调整高度
-        content_height = message_browser.document().size().height()
-        message_browser.setFixedHeight(int(content_height * 1.35))
-
-        # 如果内容不足一行，动态调整宽度
-        content_width = message_browser.document().idealWidth()
-        message_browser.setFixedWidth(min(int(content_width * 1.5), max_width))
-
-        # 布局
-        if isMe:
-            message_layout.addWidget(message_browser,
-                                     alignment=Qt.AlignmentFlag.AlignRight)
-            message_layout.addWidget(avatar_label, alignment=Qt.AlignmentFlag.AlignTop)
+            self.search_results = page + self.search_results
+            self.search_index += len(page)
+        self.showSearchResult(self.search_index + step)
+
+    def on_search_error(self, error: Exception):
+        self.search_request = None
+        self.search_status.setText("搜索失败")
+        print(f"搜索失败: {error}")
+
+    def searchOlder(self):
+        self.searchStep(-1)
+
+    def searchNewer(self):
+        self.searchStep(1)
+
+    def searchStep(self, step: int):
+        if self.search_request is not None:
+            # 上一次查询还没有完成
+            return
+        if self.search_results is None:
+            self.runSearch(step)
+        elif step < 0 and self.search_index == 0 and self.search_more:
+            self.fetchSearchPage(self.search_field.text(), self.search_results[0].id, step)
         else:
-            message_layout.addWidget(avatar_label, alignment=Qt.AlignmentFlag.AlignTop)
-            message_layout.addWidget(message_browser,
-                                     alignment=Qt.AlignmentFlag.AlignLeft)
+            self.showSearchResult(self.search_index + step)
+
+    def showSearchResult(self, index: int):
+        if not self.search_results:
+            self.search_status.setText("无结果")
+            return
+        self.search_index = min(max(index, 0), len(self.search_results) - 1)
+        # 从最新的结果开始计数，还有更早的结果时总数后加 +
+        total = len(self.search_results)
+        self.search_status.setText(f"{total - self.search_index}/{total}"
+                                   f"{'+' if self.search_more else ''}")
+        row = self.rowForResult(self.search_results[self.search_index])
+        if row is None:
+            self.search_status.setText(self.search_status.text() + " 已清除")
+            return
+        model_index = self.model.index(row)
+        self.delegate.highlighted = self.model.messages[row]
+        self.view.scrollTo(model_index, QAbstractItemView.ScrollHint.PositionAtCenter)
+        self.view.viewport().update()
+
+    def rowForResult(self, result: StoredMessage | ChatMessage) -> int | None:
+        messages = self.model.messages
+        if isinstance(result, ChatMessage):
+            return messages.index(result) if result in messages else None
+        for row, message in enumerate(messages):
+            if message.id == result.id:
+                return row
+        if self.store is None:
+            return None
+        # 结果还没加载 (或已被清空)，只加载它前后各一页
+        return self.loadAround(result.id)
+
+    def updateStyles(self, theme: Theme):
+        """控件颜色来自应用调色板，这里只需让气泡按新配色重绘"""
+        self.delegate.theme = theme
+        self.view.viewport().update()
+
+    def addMessage(self, message: str, isMe: bool, message_id: int | None = None):
+        """添加消息，message_id 为对话记录中的 ID"""
+        if self.has_newer:
+            # 正在查看较早的记录，先回到最新
+            self.jumpToLatest()
+        messages = self.model.messages
+        if message_id is None or not messages or messages[-1].id != message_id:
+            self.model.append(ChatMessage(message, isMe, message_id))
+        if message_id is not None:
+            self.newest_id = message_id
+        self.scrollToBottom()
+
+    def updateLastMessage(self, message: str, message_id: int | None = None):
+        """更新最后一条消息（用于流式输出），写入对话记录后给出 message_id"""
+        if not self.model.messages:
+            return
+        self.delegate.forget(self.model.messages[-1])
+        last = self.model.updateLast(message)
+        if message_id is not None:
+            last.id = self.newest_id = message_id
+        self.delegate.sizeHintChanged.emit(self.model.index(self.model.rowCount() - 1))
+        self.scrollToBottom()
 
-        self.chat_layout.addWidget(message_widget)
-        self.scroll_area.verticalScrollBar().setValue(
-            self.scroll_area.verticalScrollBar().maximum())
+    def scrollToBottom(self):
+        self.view.scrollToBottom()
 
     def clearMessage(self):
-        """清空消息"""
-        for i in reversed(range(self.chat_layout.count())):
-            widget_to_remove = self.chat_layout.itemAt(i).widget()
-            if widget_to_remove:
-                widget_to_remove.deleteLater()
+        """清空消息（对话记录仍保留在数据库中）"""
+        self.resetSearch()
+        self.model.clear()
+        self.delegate.clearCache()
+        self.oldest_id = self.newest_id = None
+        self.has_more = self.has_newer = self.fetching = False
+        if self.store is not None:
+            self.history_floor = self.store.last_id()
 
     def createRoundedAvatar(self, pixmap: QPixmap, size: int) -> QPixmap:
         """裁剪头像为圆形"""
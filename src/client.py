@@ -1,60 +1,365 @@
-from PySide6.QtCore import QObject, QThread, Signal
-import appbuilder
-from appbuilder.core.message import Message
-from pathlib import Path
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Iterator
 
+from PySide6.QtCore import QObject, Signal
 
-class Chat(QThread):
+from .backend import AppBuilderChatBackend, AppBuilderTTSBackend, ChatBackend, TTSBackend
+from .conversation_pool import ConversationPool
+from .response_cache import ResponseCache
+from .scheduler import Request, RequestCancelled, RequestScheduler
+from .audio import LipSyncConfig, PcmAudio
+from .codec import TimedChunks, TransferStats, decode_stream
+from .text import split_sentences
+from .tts_cache import TTSCache
+
+ERROR_REPLY = "抱歉，好像出现了什么问题，你可不可以等一下。"
+
+
+class Chat(QObject):
     result_signal = Signal(str)
+    partial_signal = Signal(str)  # 流式输出时，已生成的完整文本
+    timing_signal = Signal(float, float, str)  # 首字延迟, 总生成时间 (秒), 实际使用的会话 ID
 
     def __init__(self,
                  parent: QObject | None = None,
-                 app_id: str | None = None) -> None:
+                 app_id: str | None = None,
+                 stream: bool = True,
+                 scheduler: RequestScheduler | None = None,
+                 timeout: float = 60.0,
+                 backend: ChatBackend | None = None,
+                 pool_size: int = 2,
+                 conversation_max_age: float | None = 30 * 60,
+                 response_cache: ResponseCache | None = None) -> None:
         super().__init__(parent)
-        if app_id is None:
-            raise ValueError("Cannot find app_id")
-        self.client = appbuilder.AppBuilderClient(app_id)
-        self.conversation_id = self.client.create_conversation()
-        self.text = ""
+        if backend is None:
+            if app_id is None:
+                raise ValueError("Cannot find app_id")
+            backend = AppBuilderChatBackend(app_id)
+        self.backend = backend
+        self.stream = stream
+        self.timeout = timeout
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler(self)
+        self.request_id: int | None = None
+        # 常见的问候、问答直接用缓存的回复，只用于新会话的第一轮，见 ResponseCache
+        self.response_cache = response_cache
+        self.turn = 0  # 当前会话中已发送的消息数
+        # 会话在后台创建，避免阻塞启动；创建完成前发送的消息会在工作线程中等待
+        self.conversation_id: str | None = None
+        self._conversation_lock = threading.Lock()
+        # 预先创建的会话，重置对话时直接换用；单独的调度器，不占用发送消息的线程
+        self.pool = ConversationPool(self.backend.create_conversation,
+                                     RequestScheduler(self, max_workers=1),
+                                     size=pool_size, max_age=conversation_max_age)
+        self.reset_conversation_id()
 
     def reset_conversation_id(self):
-        self.conversation_id = self.client.create_conversation()
+        self.turn = 0
+        self.conversation_id = self.pool.take()
+        if self.conversation_id is None:
+            self.scheduler.submit(lambda request: self._ensure_conversation(),
+                                  on_error=lambda e: print(f"创建会话失败: {e}"),
+                                  timeout=self.timeout)
 
-    def setText(self, text: str):
-        self.text = text
+    def _ensure_conversation(self) -> str:
+        conversation_id = self.conversation_id
+        if conversation_id is not None:
+            return conversation_id
+        # 网络请求不持有锁，以免主线程的 reset_conversation_id 被阻塞
+        created = self.backend.create_conversation()
+        with self._conversation_lock:
+            if self.conversation_id is None:
+                self.conversation_id = created
+            return self.conversation_id
 
-    def run(self):
+    def send(self, text: str) -> int:
+        """发送消息，之前未完成的请求会被取消"""
+        self.cancel()
+        self.turn += 1
+        if self.response_cache is not None:
+            fingerprint = self.backend.fingerprint()
+            answer = self.response_cache.get(text, fingerprint, self.turn)
+            if answer is not None:
+                # 仍经由调度器返回，保证与正常请求一样是异步的、可以取消
+                self.request_id = self.scheduler.submit(self._cached, answer,
+                                                        on_done=self._on_done,
+                                                        on_error=self._on_error,
+                                                        timeout=self.timeout, retries=0)
+                return self.request_id
+            on_done = partial(self._on_answer, text, fingerprint, self.turn)
+        else:
+            on_done = self._on_done
+        self.request_id = self.scheduler.submit(self._run,
+                                                text,
+                                                on_done=on_done,
+                                                on_error=self._on_error,
+                                                on_progress=self.partial_signal.emit,
+                                                timeout=self.timeout)
+        return self.request_id
+
+    def cancel(self) -> None:
+        if self.request_id is not None:
+            self.scheduler.cancel(self.request_id)
+            self.request_id = None
+
+    def _cached(self, request: Request, answer: str) -> tuple[str, float, float, str]:
+        """缓存的回复不经过后端，只确定它属于哪个会话；会话创建失败时不影响回复"""
         try:
-            ret = self.client.run(self.conversation_id, self.text)
-            assert ret.content is not None
-            self.result_signal.emit(ret.content.answer)
-        except:
-            self.result_signal.emit(f"抱歉，好像出现了什么问题，你可不可以等一下。")
+            conversation_id = self._ensure_conversation()
+        except Exception as e:
+            print(f"创建会话失败: {e}")
+            conversation_id = ""
+        return answer, 0.0, 0.0, conversation_id
+
+    def _run(self, request: Request, text: str) -> tuple[str, float, float, str]:
+        # 发送时会话可能还在创建，这里确定的会话 ID 随结果一起返回，
+        # 之后 conversation_id 可能已被重置
+        conversation_id = self._ensure_conversation()
+        request.check()
+        # 消息发出后不再重试：重试会把同一条消息再发一次，流式输出也会重复
+        request.retries = 0
+        start = time.perf_counter()
+        first_token = None
+        if self.stream:
+            answer = ""
+            for piece in self.backend.stream(conversation_id, text):
+                request.check()
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                answer += piece
+                request.report(answer)
+        else:
+            answer = self.backend.run(conversation_id, text)
+        total = time.perf_counter() - start
+        return answer, total if first_token is None else first_token, total, conversation_id
 
+    def _on_done(self, result: tuple[str, float, float, str]) -> None:
+        answer, first_token, total, conversation_id = result
+        self.request_id = None
+        self.timing_signal.emit(first_token, total, conversation_id)
+        self.result_signal.emit(answer)
 
-class TTS(QThread):
-    result_signal = Signal(bool)
+    def _on_answer(self, text: str, fingerprint: str, turn: int,
+                   result: tuple[str, float, float, str]) -> None:
+        self.response_cache.put(text, fingerprint, turn, result[0])
+        self._on_done(result)
+
+    def _on_error(self, error: Exception) -> None:
+        self.request_id = None
+        self.result_signal.emit(ERROR_REPLY)
+
+
+@dataclass
+class Utterance:
+    """一次朗读请求，各分句并发合成、按顺序发出"""
+    chunks: list[str]
+    request_ids: list[int] = field(default_factory=list)
+    pieces: dict[int, list[PcmAudio]] = field(default_factory=dict)  # 已解码、尚未发出的片段
+    done: set[int] = field(default_factory=set)  # 已结束（成功或失败）的分句
+    next_index: int = 0
+    success: bool = True
+
+
+class TTS(QObject):
+    result_signal = Signal(bool)  # 所有分句是否都合成成功
+    chunk_signal = Signal(object)  # 按顺序发出 PcmAudio，流式解码时一个分句分为多段
 
     def __init__(self,
                  parent: QObject | None = None,
                  app_id: str | None = None,
-                 save_path: str = "test.wav") -> None:
+                 max_workers: int = 3,
+                 cache: TTSCache | None = None,
+                 scheduler: RequestScheduler | None = None,
+                 timeout: float = 20.0,
+                 backend: TTSBackend | None = None,
+                 audio_type: str = "wav",
+                 min_piece_ms: float = 200.0) -> None:
         super().__init__(parent)
-        if app_id is None:
-            raise ValueError("Cannot find app_id")
-        self.client = appbuilder.TTS(app_id)
-        self.save_path = save_path
+        if backend is None:
+            if app_id is None:
+                raise ValueError("Cannot find app_id")
+            backend = AppBuilderTTSBackend(app_id)
+        self.backend = backend
+        self.cache = cache
+        self.person = 4144 # 度禧禧
+        # wav 需要整段下载后解析；pcm-16k、mp3-16k 等格式边下载边解码，首段即可播放
+        self.audio_type = audio_type
+        self.min_piece_ms = min_piece_ms  # 流式解码时每段至少这么长才发出
+        self.transfer_log: deque[TransferStats] = deque(maxlen=200)
+        self.lip_sync_config = LipSyncConfig()  # 合成后在工作线程中预计算嘴型包络
+        self.timeout = timeout
+        # 调度器的线程数即同时合成的分句数上限
+        self.scheduler = (scheduler if scheduler is not None else
+                          RequestScheduler(self, max_workers=max_workers))
+        self.utterance: Utterance | None = None
+
+    def speak(self, text: str) -> None:
+        """朗读文本，之前未完成的朗读会被取消"""
+        self.cancel()
+        utterance = Utterance(split_sentences(text))
+        self.utterance = utterance
+        if not utterance.chunks:
+            self.utterance = None
+            self.result_signal.emit(False)
+            return
+        for index, chunk in enumerate(utterance.chunks):
+            request_id = self.scheduler.submit(
+                self._synthesize,
+                chunk,
+                on_done=partial(self._on_chunk, utterance, index),
+                on_error=partial(self._on_chunk_error, utterance, index),
+                on_progress=partial(self._on_piece, utterance, index),
+                timeout=self.timeout)
+            utterance.request_ids.append(request_id)
 
-    def setText(self, text: str):
-        self.text = text
+    def cancel(self) -> None:
+        if self.utterance is not None:
+            for request_id in self.utterance.request_ids:
+                self.scheduler.cancel(request_id)
+            self.utterance = None
 
-    def run(self):
+    def _synthesize(self, request: Request, text: str) -> TransferStats:
+        stats = TransferStats(self.audio_type)
+        reported = False
         try:
-            ret = self.client.run(Message({"text": self.text}),
-                                  person=4144, # 度禧禧
-                                  audio_type="wav")
-            assert ret.content is not None
-            Path(self.save_path).write_bytes(ret.content["audio_binary"])
-            self.result_signal.emit(True)
-        except Exception as e:
-            self.result_signal.emit(False)
+            for audio in self.synthesize_stream(text, stats, request):
+                request.report(audio)
+                reported = True
+        except RequestCancelled:
+            raise
+        except Exception:
+            if reported:
+                # 已经开始播放的分句重试会重复播放
+                request.retries = 0
+            raise
+        return stats
+
+    def _on_piece(self, utterance: Utterance, index: int, audio: PcmAudio) -> None:
+        utterance.pieces.setdefault(index, []).append(audio)
+        self._flush(utterance)
+
+    def _on_chunk(self, utterance: Utterance, index: int, stats: TransferStats) -> None:
+        utterance.done.add(index)
+        self._flush(utterance)
+
+    def _on_chunk_error(self, utterance: Utterance, index: int,
+                        error: Exception) -> None:
+        utterance.done.add(index)
+        utterance.success = False
+        self._flush(utterance)
+
+    def _flush(self, utterance: Utterance) -> None:
+        # 第一句解出第一段即可开始播放，后续分句严格按顺序发出
+        while utterance is self.utterance:
+            index = utterance.next_index
+            for audio in utterance.pieces.pop(index, []):
+                self.chunk_signal.emit(audio)
+            if index not in utterance.done:
+                return
+            utterance.next_index += 1
+            if utterance.next_index == len(utterance.chunks):
+                self.utterance = None
+                self.result_signal.emit(utterance.success)
+
+    def synthesize_stream(self, text: str, stats: TransferStats | None = None,
+                          request: Request | None = None) -> Iterator[PcmAudio]:
+        """边下载边解码，按 min_piece_ms 合并解码结果后逐段产出"""
+        stats = stats if stats is not None else TransferStats(self.audio_type)
+        start = time.perf_counter()
+        pending = bytearray()
+        audio_format: tuple[int, int] | None = None  # (采样率, 声道数)
+        peak = 0
+
+        def piece() -> PcmAudio:
+            nonlocal peak
+            # 与整段解码一样按峰值归一化，这里只能用目前为止的峰值
+            peak = max(peak, PcmAudio.peakOf(pending))
+            audio = PcmAudio.from_pcm(bytes(pending), *audio_format, self.lip_sync_config,
+                                      peak=peak)
+            pending.clear()
+            if stats.first_audio_ms is None:
+                stats.first_audio_ms = (time.perf_counter() - start) * 1000
+            return audio
+
+        chunks = TimedChunks(self.fetch_stream(text, stats), stats)
+        for pcm, frame_rate, channels in decode_stream(chunks, self.audio_type):
+            if request is not None:
+                request.check()
+            if pending and audio_format != (frame_rate, channels):
+                yield piece()
+            audio_format = (frame_rate, channels)
+            pending += pcm
+            if len(pending) >= frame_rate * channels * 2 * self.min_piece_ms / 1000:
+                yield piece()
+        if pending:
+            yield piece()
+        stats.total_ms = (time.perf_counter() - start) * 1000
+        stats.decode_ms = stats.total_ms - stats.network_ms
+        self.transfer_log.append(stats)
+
+    def synthesize(self, text: str) -> PcmAudio:
+        pieces = list(self.synthesize_stream(text))
+        if not pieces:
+            raise RuntimeError("TTS 返回了空音频")
+        pcm = b"".join(p.pcmData() for p in pieces)
+        return PcmAudio.from_pcm(pcm, pieces[0].frame_rate, pieces[0].channels,
+                                 self.lip_sync_config, peak=PcmAudio.peakOf(pcm))
+
+    def fetch_stream(self, text: str, stats: TransferStats | None = None) -> Iterator[bytes]:
+        """获取音频数据，优先读取缓存；完整下载后写入缓存"""
+        if self.cache is not None:
+            data = self.cache.get(text, self.person, self.audio_type)
+            if data is not None:
+                if stats is not None:
+                    stats.cached = True
+                yield data
+                return
+        parts = []
+        for chunk in self.backend.synthesize_stream(text, self.person, self.audio_type):
+            parts.append(chunk)
+            yield chunk
+        if self.cache is not None:
+            self.cache.put(text, self.person, self.audio_type, b"".join(parts))
+
+    def fetch(self, text: str) -> bytes:
+        return b"".join(self.fetch_stream(text))
+
+    def transferStats(self) -> dict[str, float | int | str]:
+        """最近分句的平均传输量与耗时，用于比较音频格式"""
+        network = [s for s in self.transfer_log if not s.cached]
+        first_audio = [s.first_audio_ms for s in self.transfer_log if s.first_audio_ms is not None]
+
+        def mean(values) -> float:
+            values = list(values)
+            return sum(values) / len(values) if values else 0.0
+
+        return {
+            "audio_type": self.audio_type,
+            "sentences": len(self.transfer_log),
+            "cached": len(self.transfer_log) - len(network),
+            "mean_bytes": mean(s.bytes for s in network),
+            "mean_network_ms": mean(s.network_ms for s in network),
+            "mean_decode_ms": mean(s.decode_ms for s in self.transfer_log),
+            "mean_first_audio_ms": mean(first_audio),
+        }
+
+    def prewarm(self, texts: list[str]) -> None:
+        """在后台预先合成常用语句，写入缓存"""
+        if self.cache is None:
+            return
+        threading.Thread(target=self._prewarm, args=(texts,), daemon=True).start()
+
+    def _prewarm(self, texts: list[str]) -> None:
+        assert self.cache is not None
+        # 与播放时相同的分句方式，保证缓存键一致
+        for text in texts:
+            for chunk in split_sentences(text):
+                if (chunk, self.person, self.audio_type) in self.cache:
+                    continue
+                try:
+                    self.fetch(chunk)
+                except Exception as e:
+                    print(f"预热 TTS 缓存失败: {e}")
@@ -0,0 +1,239 @@
+import io
+import threading
+import time
+import wave
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+import numpy as np
+from PySide6.QtCore import QIODevice
+
+from .audio import to_int16
+
+# TTS 支持的音频格式：wav、pcm-8k/pcm-16k（16 位单声道裸 PCM）、mp3-16k/mp3-48k
+WAV = "wav"
+
+
+@dataclass
+class TransferStats:
+    """一个分句的传输与解码统计"""
+    audio_type: str
+    bytes: int = 0
+    cached: bool = False
+    network_ms: float = 0.0  # 等待网络数据的时间
+    decode_ms: float = 0.0  # 解码及嘴型包络计算
+    first_audio_ms: float | None = None  # 请求开始到解出第一段 PCM
+    total_ms: float = 0.0
+
+
+class TimedChunks:
+    """包装网络数据流，累计读取的字节数和等待时间"""
+
+    def __init__(self, chunks: Iterable[bytes], stats: TransferStats) -> None:
+        self.chunks = iter(chunks)
+        self.stats = stats
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            start = time.perf_counter()
+            try:
+                chunk = next(self.chunks)
+            except StopIteration:
+                return
+            finally:
+                self.stats.network_ms += (time.perf_counter() - start) * 1000
+            self.stats.bytes += len(chunk)
+            yield chunk
+
+
+def pcm_rate(audio_type: str) -> int:
+    """pcm-16k -> 16000"""
+    _, _, rate = audio_type.partition("-")
+    return int(rate.rstrip("k")) * 1000 if rate else 16000
+
+
+def decode_stream(chunks: Iterable[bytes], audio_type: str) -> Iterator[tuple[bytes, int, int]]:
+    """边接收边解码，产出 (16 位交错 PCM, 采样率, 声道数)"""
+    kind = audio_type.partition("-")[0]
+    if kind == "pcm":
+        yield from _split_pcm(chunks, pcm_rate(audio_type))
+    elif kind == WAV:
+        # wav 头中的长度字段要等全部数据到达，这里整段解析
+        with wave.open(io.BytesIO(b"".join(chunks)), "rb") as wav_file:
+            frames = to_int16(wav_file.readframes(wav_file.getnframes()), wav_file.getsampwidth())
+            yield frames, wav_file.getframerate(), wav_file.getnchannels()
+    else:
+        yield from _qt_decode(chunks)
+
+
+def _split_pcm(chunks: Iterable[bytes], frame_rate: int) -> Iterator[tuple[bytes, int, int]]:
+    rest = b""
+    for chunk in chunks:
+        data = rest + chunk
+        # 网络分块不一定落在采样边界上
+        usable = len(data) - len(data) % 2
+        rest = data[usable:]
+        if usable:
+            yield data[:usable], frame_rate, 1
+
+
+class StreamDevice(QIODevice):
+    """供 QAudioDecoder 读取的只读设备，数据陆续追加；close_input 之后读到末尾才算结束
+
+    保留已收到的全部数据并支持定位：FFmpeg 探测格式后会定位回开头，
+    顺序设备无法定位，探测时读过的数据就丢了。定义在模块级，多个工作线程
+    同时在函数内定义 QObject 子类会使 PySide 崩溃。
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.data = bytearray()
+        self.offset = 0
+        self.closed_input = False
+        self.aborted = False
+        self.condition = threading.Condition()
+
+    def append(self, data: bytes) -> None:
+        with self.condition:
+            self.data += data
+            self.condition.notify_all()
+        self.readyRead.emit()
+
+    def close_input(self) -> None:
+        with self.condition:
+            self.closed_input = True
+            self.condition.notify_all()
+        self.readyRead.emit()
+
+    def abort(self) -> None:
+        """停止解码时调用，解除读取端的等待"""
+        with self.condition:
+            self.aborted = True
+            self.condition.notify_all()
+
+    def isSequential(self) -> bool:
+        return False
+
+    def size(self) -> int:
+        # 下载完成前为目前收到的长度
+        with self.condition:
+            return len(self.data)
+
+    def seek(self, pos: int) -> bool:
+        with self.condition:
+            if pos < 0 or pos > len(self.data):
+                return False
+            self.offset = pos
+        return super().seek(pos)
+
+    def atEnd(self) -> bool:
+        with self.condition:
+            return self.aborted or (self.closed_input and self.offset >= len(self.data))
+
+    def bytesAvailable(self) -> int:
+        with self.condition:
+            return len(self.data) - self.offset
+
+    def readData(self, maxlen: int) -> bytes:
+        with self.condition:
+            # 解码器在自己的线程 (探测格式时在 start 的调用线程) 中读取，可以阻塞
+            self.condition.wait_for(lambda: self.offset < len(self.data)
+                                    or self.closed_input or self.aborted)
+            if self.aborted:
+                return b""
+            data = bytes(self.data[self.offset:self.offset + maxlen])
+            self.offset += len(data)
+            return data
+
+    def writeData(self, data: bytes) -> int:
+        return -1
+
+
+def _qt_decode(chunks: Iterable[bytes]) -> Iterator[tuple[bytes, int, int]]:
+    """用 QAudioDecoder 解码压缩格式，数据边到达边送入解码器
+
+    网络数据在单独的线程中读取；解码器读到尚未到达的位置时阻塞等待，而不是返回 0 字节，
+    否则 FFmpeg 会把 0 字节当作流结束或反复重试。调用线程运行局部事件循环接收解码结果。
+    """
+    from PySide6.QtCore import QEventLoop
+    from PySide6.QtMultimedia import QAudioDecoder
+
+    device = StreamDevice()
+    device.open(QIODevice.OpenModeFlag.ReadOnly | QIODevice.OpenModeFlag.Unbuffered)
+    # 只指定采样格式的 QAudioFormat 无效，会被忽略；按解码器输出的格式转换为 16 位
+    decoder = QAudioDecoder()
+    decoder.setSourceDevice(device)
+
+    decoded: deque[tuple[bytes, int, int]] = deque()
+    state = {"finished": False, "error": None, "fetch_error": None}
+
+    def on_buffer_ready() -> None:
+        buffer = decoder.read()
+        buffer_format = buffer.format()
+        decoded.append((_qt_int16(bytes(buffer.constData()), buffer_format.sampleFormat()),
+                        buffer_format.sampleRate(), buffer_format.channelCount()))
+
+    def on_finished() -> None:
+        state["finished"] = True
+
+    def on_error(error) -> None:
+        state["error"] = decoder.errorString() or str(error)
+        state["finished"] = True
+
+    decoder.bufferReady.connect(on_buffer_ready)
+    decoder.finished.connect(on_finished)
+    decoder.error.connect(on_error)
+
+    def fetch() -> None:
+        # 全部数据读完 (或网络出错) 后才标记输入结束
+        try:
+            for chunk in chunks:
+                if device.aborted:
+                    return
+                device.append(chunk)
+        except Exception as e:
+            state["fetch_error"] = e
+        finally:
+            device.close_input()
+
+    fetcher = threading.Thread(target=fetch, daemon=True)
+    fetcher.start()
+
+    loop = QEventLoop()
+    try:
+        decoder.start()
+        while not state["finished"] or decoded:
+            if not decoded:
+                loop.processEvents(QEventLoop.ProcessEventsFlag.WaitForMoreEvents, 50)
+            while decoded:
+                yield decoded.popleft()
+        if state["fetch_error"] is not None:
+            raise state["fetch_error"]
+        if state["error"] is not None:
+            raise RuntimeError(f"音频解码失败: {state['error']}")
+    finally:
+        device.abort()
+        # 提前结束时解码线程可能正在 readData 中等待：先让它读到结尾自行结束再 stop，
+        # 否则 stop 等待解码线程时持有 GIL，而 readData 要拿到 GIL 才能返回
+        deadline = time.monotonic() + 1.0
+        while not state["finished"] and time.monotonic() < deadline:
+            loop.processEvents(QEventLoop.ProcessEventsFlag.WaitForMoreEvents, 50)
+        decoder.stop()
+
+
+def _qt_int16(data: bytes, sample_format) -> bytes:
+    """把 QAudioBuffer 的数据转为 16 位 PCM"""
+    from PySide6.QtMultimedia import QAudioFormat
+
+    formats = QAudioFormat.SampleFormat
+    if sample_format == formats.Int16:
+        return data
+    if sample_format == formats.Float:
+        samples = np.frombuffer(data, dtype="<f4")
+        return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+    if sample_format == formats.Int32:
+        return (np.frombuffer(data, dtype="<i4") >> 16).astype("<i2").tobytes()
+    if sample_format == formats.UInt8:
+        return ((np.frombuffer(data, dtype=np.uint8).astype(np.int16) - 128) << 8).tobytes()
+    raise RuntimeError(f"不支持的解码输出格式: {sample_format}")
@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+from .scheduler import Request, RequestScheduler
+
+
+class ConversationPool:
+    """预先创建的会话 ID 池
+
+    重置对话时直接取出一个现成的会话 ID，不必等待一次网络往返；
+    取出后在后台补充。超过 max_age 秒的会话 ID 视为过期并丢弃。
+    scheduler 应与发送消息的调度器分开，以免补充排在用户的消息之前。
+    """
+
+    def __init__(self,
+                 create: Callable[[], str],
+                 scheduler: RequestScheduler,
+                 size: int = 2,
+                 max_age: float | None = 30 * 60,
+                 timeout: float | None = 30.0) -> None:
+        self.create = create
+        self.scheduler = scheduler
+        self.size = size
+        self.max_age = max_age
+        self.timeout = timeout
+        self._ready: deque[tuple[str, float]] = deque()  # (会话 ID, 创建时间)
+        self._lock = threading.Lock()
+        self._creating: set[int] = set()  # 正在后台创建的请求 ID
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.failures = 0
+
+    def take(self) -> str | None:
+        """取出一个会话 ID，池为空时返回 None 并计为一次未命中"""
+        now = time.monotonic()
+        with self._lock:
+            conversation_id = None
+            while self._ready:
+                candidate, created = self._ready.popleft()
+                if self._is_stale(created, now):
+                    self.expired += 1
+                    continue
+                conversation_id = candidate
+                break
+            if conversation_id is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        self.refill()
+        return conversation_id
+
+    def refill(self) -> None:
+        """补充到 size 个，已在创建中的也计算在内"""
+        now = time.monotonic()
+        with self._lock:
+            fresh = [item for item in self._ready if not self._is_stale(item[1], now)]
+            self.expired += len(self._ready) - len(fresh)
+            self._ready = deque(fresh)
+            missing = self.size - len(self._ready) - self._pending()
+        for _ in range(missing):
+            request_id = self.scheduler.submit(self._create,
+                                               on_done=self._on_created,
+                                               on_error=self._on_failed,
+                                               timeout=self.timeout)
+            with self._lock:
+                self._creating.add(request_id)
+
+    @property
+    def pending(self) -> int:
+        """正在后台创建的数量"""
+        with self._lock:
+            return self._pending()
+
+    def _pending(self) -> int:
+        # 完成、失败或被 cancel_all/shutdown 取消的请求都已不在调度器中
+        self._creating &= self.scheduler.pending.keys()
+        return len(self._creating)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._ready)
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "expired": self.expired,
+                "failures": self.failures,
+                "ready": len(self._ready),
+                "pending": self._pending(),
+            }
+
+    def _is_stale(self, created: float, now: float) -> bool:
+        return self.max_age is not None and now - created > self.max_age
+
+    def _create(self, request: Request) -> str:
+        return self.create()
+
+    def _on_created(self, conversation_id: str) -> None:
+        with self._lock:
+            if len(self._ready) < self.size:
+                self._ready.append((conversation_id, time.monotonic()))
+
+    def _on_failed(self, error: Exception) -> None:
+        with self._lock:
+            self.failures += 1
+        print(f"预创建会话失败: {error}")
@@ -1,10 +1,11 @@
 import os
 import random
+import time
 from pathlib import Path
-from typing import Callable
+from typing import TYPE_CHECKING, Callable
 
 from PySide6.QtCore import Qt
-from PySide6.QtGui import QKeyEvent
+from PySide6.QtGui import QColor, QKeyEvent
 from PySide6.QtWidgets import (
     QHBoxLayout,
     QLabel,
@@ -15,9 +16,26 @@ from PySide6.QtWidgets import (
     QWidget,
 )
 
-from .client import TTS, Chat
-from .live2dwidget import Live2dWidget
+from .backend import backends_from_env
+from .client import ERROR_REPLY, TTS, Chat
+from .audio import PcmAudio
 from .chat_window import ChatWindow
+from .motion import EmotionParser, load_emotions
+from .response_cache import ResponseCache
+from .startup import startup_timer
+from .store import ConversationStore
+from .theme import Theme, ThemeManager
+from .tracing import TurnTracer
+from .tts_cache import TTSCache
+
+if TYPE_CHECKING:
+    # live2d 与 OpenGL 导入较慢，窗口显示后才加载，见 attachLive2d
+    from .live2dwidget import Live2dWidget
+
+RESET_REPLIES = ["好吧，让我们聊点别的", "没事，让我们重新开始"]
+EMPTY_REPLY = "初音不太明白你的意思😕"
+# 含有这些词的输入答案随时间变化，不使用回复缓存
+TIME_SENSITIVE_WORDS = ("现在", "今天", "明天", "几点", "天气", "最近")
 
 
 class CustomPlainTextEdit(QPlainTextEdit):
@@ -51,27 +69,107 @@ class CustomPlainTextEdit(QPlainTextEdit):
                     self.send_message_signal()
 
 
+def rgba(color: QColor, alpha: int) -> str:
+    return f"rgba({color.red()}, {color.green()}, {color.blue()}, {alpha})"
+
+
+def dialog_style_sheet(theme: Theme) -> str:
+    """输入框悬浮在 Live2D 画面上，背景半透明"""
+    return f"""
+QWidget {{
+    border-radius: 20px;
+}}
+QLabel {{
+    color: {theme.text.name()};
+    font-size: 18px;
+    font-weight: bold;
+}}
+QPlainTextEdit {{
+    background-color: {rgba(theme.window, 160)};
+    border: 2px solid {rgba(theme.text, 50)};
+    border-radius: 10px;
+    padding: 5px;
+    font-family: 'Source Han Sans', sans-serif;
+    color: {theme.text.name()};
+    font-size: 16px;
+}}
+QPlainTextEdit:focus {{
+    border: 2px solid {rgba(theme.bubble_me, 200)};
+}}
+QPushButton {{
+    background-color: {rgba(theme.bubble_me, 200)};
+    border: none;
+    border-radius: 10px;
+    padding: 5px 15px;
+    color: {theme.bubble_me_text.name()};
+    font-size: 16px;
+}}
+QPushButton:hover {{
+    background-color: {theme.bubble_me.name()};
+}}
+"""
+
+
 class InputDialog(QWidget):
 
     def __init__(self, parent, app_id = None):
         super().__init__(parent)
         self.init_ui()
 
-        try:
-            if app_id is None:
-                app_id = os.environ["APPBUILDER_APP_ID"]
-        except:
-            raise ValueError("Cannot get app id")
-        self.chat = Chat(app_id=app_id)
-        self.chat.result_signal.connect(self.conversation_callback)
-        self.tts = TTS(app_id="f465fd78-aa59-4011-af81-2192a46038f2")
-        self.tts.result_signal.connect(self.tts_callback)
-
-        self.live2d: Live2dWidget = parent.live2d
+        # 后端由环境变量决定，见 backends_from_env；AppBuilder 客户端在工作线程中第一次使用时才创建
+        with startup_timer.span("backend_init"):
+            self.init_backends(app_id)
+        self.reply_started = False  # 当前回复是否已在聊天窗口中显示
+        self.last_timing: tuple[float, float] | None = None
+        self.reply_conversation_id: str | None = None  # 本轮回复实际使用的会话 ID
+        # 会话还在后台创建时发送的消息: (预先分配的 ID, 文本, 时间)，回复带回会话 ID 后写入
+        self.pending_message: tuple[int, str, float] | None = None
+        # 回复中的表情标记在流式输出时就触发动作
+        self.emotion_parser = EmotionParser(load_emotions().markers)
+        # 每轮对话各阶段的延迟，写入 Chrome trace 格式的文件
+        cache_folder = Path.home() / ".cache" / "vcharacter_chat"
+        self.tracer = TurnTracer(cache_folder / "traces" / "turns.trace.json")
+
+        self.live2d: "Live2dWidget | None" = None
+        if getattr(parent, "live2d", None) is not None:
+            self.attachLive2d(parent.live2d)
         self.chatwindow: ChatWindow = parent.chatwindow
-        
-        qss_file = Path(__file__).parent / "dialog.qss"
-        self.setStyleSheet(qss_file.read_text("UTF-8"))
+        self.store: ConversationStore | None = getattr(parent, "store", None)
+
+        self.theme: ThemeManager = getattr(parent, "theme", None) or ThemeManager.instance()
+        self.theme.changed.connect(self.updateStyles)
+        self.updateStyles(self.theme.theme)
+
+    def updateStyles(self, theme: Theme):
+        """样式表中的颜色取自当前主题，切换主题时重新生成"""
+        self.setStyleSheet(dialog_style_sheet(theme))
+
+    def init_backends(self, app_id):
+        chat_backend, tts_backend = backends_from_env(app_id)
+        cache_folder = Path.home() / ".cache" / "vcharacter_chat"
+        self.response_cache = ResponseCache(
+            cache_folder / "responses.json",
+            bypass=lambda text: any(word in text for word in TIME_SENSITIVE_WORDS))
+        self.chat = Chat(backend=chat_backend, response_cache=self.response_cache)
+        self.chat.result_signal.connect(self.conversation_callback)
+        self.chat.partial_signal.connect(self.conversation_partial_callback)
+        self.chat.timing_signal.connect(self.timing_callback)
+        self.tts_cache = TTSCache(cache_folder / "tts")
+        # 音频格式可用 VCHAT_TTS_FORMAT 指定，如 pcm-16k、mp3-16k，默认 wav
+        self.tts = TTS(backend=tts_backend, cache=self.tts_cache,
+                       audio_type=os.environ.get("VCHAT_TTS_FORMAT", "wav"))
+        # 缓存的回复也预先合成，命中时语音同样无需等待
+        self.tts.prewarm(RESET_REPLIES + [ERROR_REPLY, EMPTY_REPLY]
+                         + self.response_cache.answers())
+        self.tts.chunk_signal.connect(self.tts_callback)
+        self.tts.result_signal.connect(self.tts_done_callback)
+
+    def attachLive2d(self, live2d: "Live2dWidget"):
+        """模型加载完成后接入，之前的回复只显示文字"""
+        self.live2d = live2d
+        self.tts.lip_sync_config = live2d.lip_sync.config
+        live2d.sound_started.connect(lambda: self.tracer.mark("first_audio"))
+        live2d.motion_scheduler.started.connect(self.motion_started_callback)
 
     def init_ui(self):
         # 设置窗口无边框和透明背景
@@ -121,63 +219,155 @@ class InputDialog(QWidget):
         if player_message:
             self.input_field.setPlainText(f"少女思考中...\n{player_message}")
             self.input_field.setReadOnly(True)
-            self.chat.setText(player_message)
-            self.chat.start()
-
-            self.chatwindow.addMessage(player_message, isMe=True)
+            self.tracer.beginTurn()
+            self.chat.send(player_message)
+
+            message_id = None
+            if self.store is not None:
+                if self.chat.conversation_id is not None:
+                    message_id = self.store.append(self.chat.conversation_id, True,
+                                                   player_message)
+                else:
+                    message_id = self.store.reserve_id()
+                    self.pending_message = (message_id, player_message, time.time())
+            self.chatwindow.addMessage(player_message, isMe=True, message_id=message_id)
+            self.reply_started = False
+            self.last_timing = None
+            self.reply_conversation_id = None
+            self.emotion_parser.reset()
 
             self.action_button.setText("继续对话")
             self.is_player_turn = False
 
     def conversation_callback(self, ret: str):
         if ret == "":
-            ret = "初音不太明白你的意思😕"
+            ret = EMPTY_REPLY
         self.role_label.setText("Miku:")
         last = ret.strip()[-1]
-        self.tts.setText(ret)
-        self.tts.start()
-
-        if last in "🙂😄🤯😟😳💃😕":
+        # 非流式输出或命中回复缓存时，首字与完整回复同时到达
+        self.tracer.mark("first_token")
+        self.tracer.mark("reply")
+        self.tracer.mark("tts_start")
+        self.tts.speak(ret)
+        self.trigger_emotions(ret)
+        self.emotion_parser.reset()
+
+        markers = self.emotion_parser.markers
+        if last in markers:
             text = ret.strip()[:-1]
-            self.live2d.motion(last)
         elif last in "123":
-            if ret.strip()[-2] in "🙂😄🤯😟😳💃😕":
+            if ret.strip()[-2] in markers:
                 text = ret.strip()[:-2]
-                self.live2d.motion(ret.strip()[-2])
             else:
                 text = ret.strip()
         else:
             text = ret.strip()
 
-        self.chatwindow.addMessage(ret, isMe=False)
+        message_id = None
+        if self.store is not None:
+            # 出错时没有 timing_signal，会话可能已经创建好了
+            conversation_id = self.reply_conversation_id or self.chat.conversation_id or ""
+            self.storePendingMessage(conversation_id)
+            meta = None
+            if self.last_timing is not None:
+                meta = {"first_token": self.last_timing[0], "total": self.last_timing[1]}
+            message_id = self.store.append(conversation_id, False, ret, meta)
+        if self.reply_started:
+            self.chatwindow.updateLastMessage(ret, message_id)
+        else:
+            self.chatwindow.addMessage(ret, isMe=False, message_id=message_id)
+        self.reply_started = False
         self.input_field.setPlainText(text)
-
-    def tts_callback(self, ret):
-        if not ret:
-            return
-        self.live2d.playSound("test.wav")
+        self.last_timing = None
+        self.reply_conversation_id = None
+
+    def storePendingMessage(self, conversation_id: str):
+        """写入等待会话 ID 的消息"""
+        if self.pending_message is not None and self.store is not None:
+            message_id, text, created_at = self.pending_message
+            self.store.append(conversation_id, True, text,
+                              message_id=message_id, created_at=created_at)
+        self.pending_message = None
+
+    def conversation_partial_callback(self, ret: str):
+        """流式输出：边生成边显示回复"""
+        self.role_label.setText("Miku:")
+        self.tracer.mark("first_token")
+        if self.reply_started:
+            self.chatwindow.updateLastMessage(ret)
+        else:
+            self.chatwindow.addMessage(ret, isMe=False)
+            self.reply_started = True
+        self.input_field.setPlainText(ret)
+        self.trigger_emotions(ret)
+
+    def trigger_emotions(self, ret: str):
+        """回复中新出现的表情标记交给动作调度"""
+        for marker in self.emotion_parser.feed(ret):
+            if self.live2d is not None:
+                self.live2d.motion(marker)
+
+    def timing_callback(self, first_token: float, total: float, conversation_id: str):
+        self.last_timing = (first_token, total)
+        self.reply_conversation_id = conversation_id
+        self.storePendingMessage(conversation_id)
+        print(f"首字延迟: {first_token:.3f}s, 总生成时间: {total:.3f}s")
+
+    def tts_callback(self, audio: PcmAudio):
+        if self.live2d is not None:
+            self.live2d.enqueueSound(audio)
+
+    def tts_done_callback(self, success: bool):
+        self.tracer.mark("tts_done")
+
+    def motion_started_callback(self, emotion):
+        # 只统计回复中的表情触发的动作，不包括点击触发的
+        if emotion.marker in self.emotion_parser.markers:
+            self.tracer.mark("motion")
 
     def continue_conversation(self):
         """继续对话并切换回 Player"""
+        # 取消尚未完成的请求
+        self.chat.cancel()
+        self.tts.cancel()
+        self.storePendingMessage(self.chat.conversation_id or "")
+        self.emotion_parser.reset()
+        self.tracer.endTurn()
+
         # 清空输入框并解锁
         self.input_field.clear()
         self.input_field.setReadOnly(False)
-        if self.live2d.player.isPlaying():
-            self.live2d.player.stop()
+        if self.live2d is not None:
+            self.live2d.stopSound()
 
         # 切换角色为 Player
         self.role_label.setText("Player:")
         self.action_button.setText("发送")  # 改为发送按钮
         self.is_player_turn = True
 
+    def shutdown(self):
+        """退出前取消所有请求"""
+        self.storePendingMessage(self.chat.conversation_id or "")
+        self.chat.scheduler.shutdown()
+        self.chat.pool.scheduler.shutdown()
+        self.tts.scheduler.shutdown()
+        self.response_cache.flush()
+        self.tracer.close()
+
     def reset_conversation(self):
         """重置会话ID"""
         ret = QMessageBox.warning(self, "警告", "你确定要重置会话ID吗",
                                   QMessageBox.StandardButton.Yes,
                                   QMessageBox.StandardButton.No)
         if ret == QMessageBox.StandardButton.Yes:
+            self.chat.cancel()
+            self.tts.cancel()
+            self.storePendingMessage(self.chat.conversation_id or "")
+            self.tracer.endTurn()
+            if self.live2d is not None:
+                self.live2d.stopSound()
             self.chat.reset_conversation_id()
-            self.conversation_callback(random.choice(["好吧，让我们聊点别的", "没事，让我们重新开始"]))
+            self.conversation_callback(random.choice(RESET_REPLIES))
             self.input_field.clear()
             self.input_field.setReadOnly(False)
             self.chatwindow.clearMessage()
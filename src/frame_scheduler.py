@@ -0,0 +1,111 @@
+import time
+from enum import Enum
+from typing import Callable
+
+from PySide6.QtCore import QEvent, QObject, Qt, QTimer
+from PySide6.QtOpenGLWidgets import QOpenGLWidget
+
+
+class FrameMode(Enum):
+    ACTIVE = "active"  # 动作、口型同步、拖动时满帧率
+    IDLE = "idle"  # 只有呼吸、眨眼时低帧率
+    PAUSED = "paused"  # 窗口被遮挡或最小化时停止绘制
+
+
+class FrameScheduler(QObject):
+    """自适应帧调度
+
+    每帧结束后通过 is_active 判断模型是否在活动，据此在满帧率与待机帧率之间切换；
+    窗口不可见时完全暂停。开启 vsync 时，活动状态下由 frameSwapped 驱动下一帧。
+    """
+
+    def __init__(self,
+                 widget: QOpenGLWidget,
+                 is_active: Callable[[], bool],
+                 fps: float = 30,
+                 idle_fps: float = 10,
+                 vsync: bool = False) -> None:
+        super().__init__(widget)
+        self.widget = widget
+        self.is_active = is_active
+        self.fps = fps
+        self.idle_fps = idle_fps
+        self.vsync = vsync
+        self.mode = FrameMode.PAUSED
+        self.active_until = 0.0
+        self.watched_window: QObject | None = None
+
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self.widget.update)
+        self.widget.frameSwapped.connect(self.on_frame_swapped)
+
+    def start(self) -> None:
+        window = self.widget.window()
+        if window is not self.watched_window:
+            if self.watched_window is not None:
+                self.watched_window.removeEventFilter(self)
+            window.installEventFilter(self)
+            self.watched_window = window
+        self.refresh()
+
+    def setFps(self, fps: float, idle_fps: float | None = None) -> None:
+        self.fps = fps
+        if idle_fps is not None:
+            self.idle_fps = idle_fps
+        self.setMode(self.mode, force=True)
+
+    def setVsync(self, vsync: bool) -> None:
+        self.vsync = vsync
+        self.setMode(self.mode, force=True)
+
+    def poke(self, hold: float = 0.0) -> None:
+        """标记有活动发生，在 hold 秒内保持满帧率"""
+        self.active_until = max(self.active_until, time.monotonic() + hold)
+        if self.mode == FrameMode.IDLE:
+            self.setMode(FrameMode.ACTIVE)
+            self.widget.update()
+
+    def occluded(self) -> bool:
+        window = self.widget.window()
+        handle = window.windowHandle()
+        return (not self.widget.isVisible() or window.isMinimized() or
+                (handle is not None and not handle.isExposed()))
+
+    def refresh(self) -> None:
+        """根据当前状态重新选择模式"""
+        if self.occluded():
+            self.setMode(FrameMode.PAUSED)
+        elif time.monotonic() < self.active_until or self.is_active():
+            self.setMode(FrameMode.ACTIVE)
+        else:
+            self.setMode(FrameMode.IDLE)
+
+    def setMode(self, mode: FrameMode, force: bool = False) -> None:
+        if mode == self.mode and not force:
+            return
+        self.mode = mode
+        if mode == FrameMode.PAUSED:
+            self.timer.stop()
+            return
+        if mode == FrameMode.ACTIVE and self.vsync:
+            # 由 frameSwapped 驱动，帧率跟随显示器刷新率
+            self.timer.stop()
+            self.widget.update()
+            return
+        fps = self.fps if mode == FrameMode.ACTIVE else self.idle_fps
+        self.timer.start(int(1000 / fps))
+
+    def on_frame_swapped(self) -> None:
+        self.refresh()
+        if self.mode == FrameMode.ACTIVE and self.vsync:
+            self.widget.update()
+
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        if event.type() in (QEvent.Type.Show, QEvent.Type.Hide, QEvent.Type.Expose,
+                            QEvent.Type.WindowStateChange):
+            # 事件处理完后窗口状态才会更新
+            QTimer.singleShot(0, self.refresh)
+            if event.type() != QEvent.Type.Hide:
+                QTimer.singleShot(0, self.widget.update)
+        return False
@@ -0,0 +1,148 @@
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+from .motion import EMOTIONS_FILE, Emotion
+
+
+@dataclass(frozen=True)
+class HitArea:
+    name: str  # 与 model3.json 中 HitAreas 的 Name 对应，例如 "Head"
+    # 模型未声明该区域时使用，(左, 上, 右, 下)，按模型居中、缩放为 1 时的窗口归一化
+    rect: tuple[float, float, float, float]
+    emotion: Emotion  # 点击后播放的动作
+    cooldown: float = 2.0  # 秒，冷却期内重复点击同一区域不再触发
+
+    def contains(self, x: float, y: float) -> bool:
+        left, top, right, bottom = self.rect
+        return left <= x <= right and top <= y <= bottom
+
+
+def load_hit_areas(path: os.PathLike | str = EMOTIONS_FILE) -> list[HitArea]:
+    """读取点击区域到动作的映射，排在前面的区域优先"""
+    data = json.loads(Path(path).read_text("UTF-8"))
+    areas = []
+    for entry in data.get("hit_areas", []):
+        emotion = Emotion(entry["name"], entry["group"], int(entry.get("index", 0)),
+                          int(entry.get("priority", 2)), entry.get("duration"))
+        areas.append(HitArea(entry["name"], tuple(float(v) for v in entry["rect"]), emotion,
+                             float(entry.get("cooldown", 2.0))))
+    return areas
+
+
+def hit_area_names(model_json: os.PathLike | str) -> set[str]:
+    """model3.json 中声明的点击区域"""
+    setting = json.loads(Path(model_json).read_text("UTF-8"))
+    return {area["Name"] for area in setting.get("HitAreas", []) if area.get("Name")}
+
+
+def model_rect_point(fx: float, fy: float,
+                     placement: tuple[float, float, float]) -> tuple[float, float]:
+    """把按窗口归一化的点换算到模型居中、缩放为 1 时的位置，与 HitArea.rect 比较"""
+    offset_x, offset_y, scale = placement
+    if scale <= 0:
+        return -1.0, -1.0
+    # 归一化坐标 -> SetOffset 的坐标 (-1 ~ 1，y 向上)，去掉平移和缩放后再换回来
+    model_x = (fx * 2 - 1 - offset_x) / scale
+    model_y = (1 - fy * 2 - offset_y) / scale
+    return (model_x + 1) / 2, (1 - model_y) / 2
+
+
+class InputCoalescer:
+    """合并指针移动事件
+
+    高回报率鼠标每帧会产生多个移动事件，这里只记下最后一个位置，
+    由绘制时 take() 取出，每帧最多更新一次模型。
+    """
+
+    def __init__(self) -> None:
+        self.pending: tuple[int, int] | None = None
+        self.events = 0
+        self.applied = 0
+
+    def move(self, x: int, y: int) -> None:
+        self.pending = (x, y)
+        self.events += 1
+
+    def take(self) -> tuple[int, int] | None:
+        pending, self.pending = self.pending, None
+        if pending is not None:
+            self.applied += 1
+        return pending
+
+    def clear(self) -> None:
+        self.pending = None
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "events": self.events,
+            "applied": self.applied,
+            "coalesced_ratio": 1 - self.applied / self.events if self.events else 0.0,
+        }
+
+
+class HitAreaRouter:
+    """把点击映射到模型的点击区域及对应动作
+
+    模型声明了某个区域时用 Cubism 的 HitTest 按网格判断，
+    否则退回配置中的矩形；每个区域单独冷却。
+    """
+
+    def __init__(self,
+                 areas: list[HitArea],
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.all_areas = areas
+        self.areas = areas
+        self.clock = clock
+        self.model_areas: set[str] = set()
+        self.last_triggered: dict[str, float] = {}
+        self.clicks = 0
+        self.triggered = 0
+        self.cooled = 0
+
+    def setModel(self, model_areas: set[str], motion_groups: dict[str, int]) -> None:
+        """切换模型时调用，去掉模型中不存在的动作"""
+        self.model_areas = model_areas
+        self.areas = []
+        for area in self.all_areas:
+            if 0 <= area.emotion.index < motion_groups.get(area.emotion.group, 0):
+                self.areas.append(area)
+            else:
+                print(f"点击区域 {area.name} 对应的动作 {area.emotion.group}[{area.emotion.index}] "
+                      f"不存在，已忽略")
+        self.last_triggered.clear()
+
+    def hit(self, model, x: float, y: float, width: int, height: int,
+            placement: tuple[float, float, float] = (0.0, 0.0, 1.0)) -> HitArea | None:
+        """(x, y) 为窗口内的像素坐标，placement 为模型的 (x, y, scale)，与 SetOffset/SetScale 相同"""
+        if width <= 0 or height <= 0:
+            return None
+        rx, ry = model_rect_point(x / width, y / height, placement)
+        for area in self.areas:
+            if area.name in self.model_areas:
+                if model is not None and model.HitTest(area.name, x, y):
+                    return area
+            elif area.contains(rx, ry):
+                return area
+        return None
+
+    def click(self, model, x: float, y: float, width: int, height: int,
+              placement: tuple[float, float, float] = (0.0, 0.0, 1.0)) -> Emotion | None:
+        """返回应播放的动作；未点中区域或区域在冷却中返回 None"""
+        area = self.hit(model, x, y, width, height, placement)
+        if area is None:
+            return None
+        self.clicks += 1
+        now = self.clock()
+        if now - self.last_triggered.get(area.name, float("-inf")) < area.cooldown:
+            self.cooled += 1
+            return None
+        self.last_triggered[area.name] = now
+        self.triggered += 1
+        return area.emotion
+
+    def stats(self) -> dict[str, int]:
+        return {"clicks": self.clicks, "triggered": self.triggered, "cooled": self.cooled}
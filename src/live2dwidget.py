@@ -1,27 +1,44 @@
 import os
+import time
+from collections import deque
 
 import OpenGL.GL as gl
-from PySide6.QtCore import QPoint, Qt, QTimerEvent, QUrl
-from PySide6.QtGui import QGuiApplication, QImage, QPainter, QMouseEvent, QCursor
+from PySide6.QtCore import Qt, QUrl, Signal
+from PySide6.QtGui import QGuiApplication, QPainter, QMouseEvent, QCursor, QKeyEvent
 from PySide6.QtOpenGLWidgets import QOpenGLWidget
 from PySide6.QtWidgets import QWidget
 from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
 
 import live2d.v3 as live2d
-from live2d.utils.lipsync import WavHandler
 
-from .sound import SoundPlayer
+from .background import BackgroundLayer
+from .frame_scheduler import FrameScheduler
+from .interaction import HitAreaRouter, InputCoalescer, load_hit_areas
+from .model_cache import SPLIT_RENDERER, LoadedModel, ModelCache, load_model_assets, model_key
+from .motion import MotionScheduler, load_emotions, validate_emotions
+from .perf import FrameProfiler, PerfOverlay
+from .scene import Scene, SceneModel
+from .audio import LipSync, LipSyncConfig, PcmAudio
+from .scheduler import RequestScheduler
+from .sound import PcmPlayer, SoundPlayer
 
 def callback():
     print("motion end")
 
 
 class Live2dWidget(QOpenGLWidget):
+    model_loaded = Signal(str)  # 模型切换完成，参数为模型路径
+    sound_started = Signal()  # 一段语音开始发声
 
     def __init__(self,
                  parent: QWidget | None = None,
                  model: os.PathLike | str | None = None,
-                 background: os.PathLike | str | None = None) -> None:
+                 background: os.PathLike | str | None = None,
+                 fps: float = 30,
+                 idle_fps: float = 10,
+                 vsync: bool = False,
+                 model_cache: ModelCache | None = None,
+                 pcm_output: bool = True) -> None:
         super().__init__(parent)
         self.isInLA = False
         self.clickInLA = False
@@ -36,100 +53,368 @@ class Live2dWidget(QOpenGLWidget):
         self.read = True
         self.clickX = -1
         self.clickY = -1
-        self.model: live2d.LAppModel
         self.setObjectName("Live2d")
         self.systemScale = QGuiApplication.primaryScreen().devicePixelRatio()
 
+        # 模型文件在工作线程中读取和解析，OpenGL 资源在绘制时逐个创建
+        self.model: live2d.LAppModel | None = None
+        self.model_cache = model_cache if model_cache is not None else ModelCache()
+        self.asset_scheduler = RequestScheduler(self, max_workers=1, timeout=None, retries=0)
+        self.loading_path: str | None = None
+        # 等待创建 OpenGL 资源，第二项为 addModel 加入的角色，主角色为 None
+        self.pending_models: deque[tuple[LoadedModel, SceneModel | None]] = deque()
+
+        # 背景作为纹理常驻显存
+        self.background = BackgroundLayer()
         if background is not None:
             self.loadPicFile(background)
 
         # 初始化播放器
-        self.player = SoundPlayer()
-        self.player.playbackStateChanged.connect(self.on_mediapalyer_status_changed)
-
-        # 初始化 WavHandler
-        self.wav_handler = WavHandler()
-        self.lip_sync_factor = 2.5  # 控制嘴巴张合幅度
+        # 默认直接输出 PCM，分句之间无缝衔接；pcm_output=False 时使用 QMediaPlayer
+        self.pcm_output = pcm_output
+        if pcm_output:
+            self.player = PcmPlayer(self)
+            self.player.clip_started.connect(self.on_clip_started)
+            self.player.finished.connect(self.on_sound_finished)
+        else:
+            self.player = SoundPlayer()
+            self.player.playbackStateChanged.connect(self.on_mediapalyer_status_changed)
+        self.sound_queue: deque[PcmAudio] = deque()  # 等待播放的分句音频
+
+        # 初始化口型同步，嘴巴张合幅度等参数见 LipSyncConfig
+        self.lip_sync = LipSync()
+
+        # 动作调度，表情标记与动作的对应关系见 resources/emotions.json
+        self.emotions = load_emotions()
+        self.motion_scheduler = MotionScheduler(self.startMotion, self)
+        self.motion_info: dict[str, tuple[dict, dict]] = {}  # 模型路径 -> (动作组, 动作时长)
+
+        # 点击区域对应的动作见 resources/emotions.json；拖动产生的移动事件合并为每帧一次
+        self.input = InputCoalescer()
+        self.hit_router = HitAreaRouter(load_hit_areas())
+        self.hit_area_info: dict[str, set[str]] = {}  # 模型路径 -> 模型声明的点击区域
+
+        # 帧调度：动作、口型同步、拖动时满帧率，其余时间降低帧率
+        self.frame_scheduler = FrameScheduler(self, self.isAnimating, fps=fps,
+                                              idle_fps=idle_fps, vsync=vsync)
+
+        # 场景：self.model 为主角色，接收拖动、点击、对话的动作和语音；
+        # addModel 可以加入更多角色，共用 OpenGL 上下文、背景和帧循环
+        self.scene = Scene(idle_interval=1 / idle_fps)
+        self.primary = SceneModel("", lip_sync=self.lip_sync, position=self.player.position,
+                                  is_active=self.isPrimaryActive)
+
+        # 性能监视，按 F3 显示/隐藏
+        self.setFocusPolicy(Qt.FocusPolicy.ClickFocus)
+        self.profiler = FrameProfiler()
+        self.perf_overlay = PerfOverlay(self.profiler)
 
     def loadPicFile(self, picFile):
+        """更换背景图片，运行中也可以调用"""
         self.picFile = str(picFile)
-        self.img = QImage()
-        self.img.load(self.picFile)
+        self.background.setImage(self.picFile)
+        self.update()
 
     def initializeGL(self) -> None:
         # 将当前窗口作为 OpenGL 的上下文
         # 图形会被绘制到当前窗口
         self.makeCurrent()
         live2d.glewInit()
+        self.background.initialize()
+        # 窗口重建等情况下上下文会被销毁，之后再次调用 initializeGL
+        self.context().aboutToBeDestroyed.connect(self.releaseGL)
+
+        # 开始按帧调度绘图，模型加载完成前只绘制背景
+        self.frame_scheduler.start()
+        if self.model_path is not None:
+            self.setModel(self.model_path)
+
+    def setModel(self, path: os.PathLike | str) -> None:
+        """切换模型，已缓存的模型立即生效，否则在后台加载"""
+        key = model_key(path)
+        cached = self.model_cache.get(key)
+        if cached is not None:
+            self.loading_path = None
+            self.activateModel(key, cached)
+            return
+        if key == self.loading_path:
+            return
+        self.loading_path = key
+        self.asset_scheduler.submit(load_model_assets, key,
+                                    on_done=self.on_model_assets_loaded,
+                                    on_error=lambda e: print(f"模型加载失败: {e}"))
+
+    def addModel(self,
+                 path: os.PathLike | str,
+                 x: float = 0.0,
+                 y: float = 0.0,
+                 scale: float = 1.0,
+                 z: int = 0) -> SceneModel:
+        """在场景中加入一个角色并在后台加载，同一个模型可以加入多次
+
+        加入的角色不进入模型缓存；口型同步的声音来源通过返回值的 lip_sync 和 position 指定。
+        """
+        entry = SceneModel(model_key(path), x=x, y=y, scale=scale, z=z)
+        self.scene.add(entry)
+        self.asset_scheduler.submit(load_model_assets, entry.path,
+                                    on_done=lambda loaded: self.on_model_assets_loaded(loaded, entry),
+                                    on_error=lambda e: print(f"模型加载失败: {e}"))
+        return entry
+
+    def removeModel(self, entry: SceneModel) -> None:
+        """移除 addModel 加入的角色"""
+        if entry is self.primary:
+            raise ValueError("主角色不能移除，请使用 setModel 切换")
+        self.scene.remove(entry)
+        if entry.model is not None:
+            self.makeCurrent()
+            self.releaseModel(entry.model)
+            self.doneCurrent()
+            entry.model = None
+        self.update()
+
+    def placeModel(self,
+                   entry: SceneModel,
+                   x: float | None = None,
+                   y: float | None = None,
+                   scale: float | None = None,
+                   z: int | None = None) -> None:
+        """调整角色的位置、缩放和前后顺序"""
+        if x is not None:
+            entry.x = x
+        if y is not None:
+            entry.y = y
+        if scale is not None:
+            entry.scale = scale
+        entry.place()
+        if z is not None and z != entry.z:
+            entry.z = z
+            self.scene.sort()
+        entry.last_update = 0.0
+        self.update()
 
-        # 创建模型
-        self.model = live2d.LAppModel()
-        self.model.SetAutoBreathEnable(True)
-        self.model.SetAutoBlinkEnable(True)
+    def on_model_assets_loaded(self, loaded: LoadedModel, entry: SceneModel | None = None) -> None:
+        print(f"模型文件加载: {loaded.path} {loaded.bytes_read / 1024:.0f} KiB, "
+              f"{loaded.load_time * 1000:.0f} ms")
+        self.pending_models.append((loaded, entry))
+        self.update()
 
-        self.model.LoadModelJson(str(self.model_path))
+    def finishModel(self, loaded: LoadedModel, entry: SceneModel | None = None) -> None:
+        """在 OpenGL 上下文中创建模型的渲染资源（纹理、着色器）"""
+        start = time.perf_counter()
+        model = loaded.model
+        if SPLIT_RENDERER:
+            model.CreateRenderer()
+        else:
+            model = live2d.LAppModel()
+            model.LoadModelJson(loaded.path)
+        model.SetAutoBreathEnable(True)
+        model.SetAutoBlinkEnable(True)
+        print(f"模型纹理上传: {(time.perf_counter() - start) * 1000:.0f} ms")
+        self.motion_info[loaded.path] = (loaded.motion_groups, loaded.motion_durations)
+        self.hit_area_info[loaded.path] = loaded.hit_areas
+        if entry is not None:
+            if entry not in self.scene.models:
+                # 加载期间已被移除
+                self.releaseModel(model)
+                return
+            entry.model = model
+            model.Resize(self.width(), self.height())
+            entry.place()
+            self.frame_scheduler.poke()
+            return
+        for evicted in self.model_cache.put(loaded.path, model, pinned=self.model):
+            self.releaseModel(evicted)
+        if loaded.path == self.loading_path:
+            self.loading_path = None
+            self.activateModel(loaded.path, model)
+
+    def activateModel(self, path: str, model: live2d.LAppModel) -> None:
+        self.model = model
+        self.model_path = path
+        self.model.Resize(self.width(), self.height())
+        self.primary.path = path
+        self.primary.model = model
+        self.primary.place()
+        if self.primary not in self.scene.models:
+            self.scene.add(self.primary)
+        groups, durations = self.motion_info.get(path, ({}, {}))
+        self.motion_scheduler.setEmotions(validate_emotions(self.emotions, groups), durations)
+        self.hit_router.setModel(self.hit_area_info.get(path, set()), groups)
+        self.input.clear()
+        self.model_loaded.emit(path)
+        self.frame_scheduler.poke()
+
+    def releaseGL(self) -> None:
+        """上下文销毁前释放背景纹理"""
+        self.makeCurrent()
+        self.background.release()
+        self.doneCurrent()
 
-        # 以 fps = 30 的频率进行绘图
-        self.startTimer(int(1000 / 30))
+    def dispose(self) -> None:
+        """退出前释放背景的显存资源和缩放线程，需在 live2d.dispose() 之前调用"""
+        self.makeCurrent()
+        self.background.dispose()
+        self.doneCurrent()
+
+    @staticmethod
+    def releaseModel(model: live2d.LAppModel) -> None:
+        """释放模型的 OpenGL 资源，需在 OpenGL 上下文中调用"""
+        if SPLIT_RENDERER:
+            model.DestroyRenderer()
 
     def resizeGL(self, w: int, h: int) -> None:
         # 使模型的参数按窗口大小进行更新
-        if self.model:
-            self.model.Resize(w, h)
+        self.scene.resize(w, h)
+        ratio = self.devicePixelRatio()
+        self.background.resize(int(w * ratio), int(h * ratio))
 
     def paintGL(self) -> None:
+        profiler = self.profiler if self.profiler.enabled else None
+        if profiler:
+            profiler.beginFrame()
+
+        # 每帧最多为一个新模型创建 OpenGL 资源，避免一次卡顿太久
+        if self.pending_models:
+            self.finishModel(*self.pending_models.popleft())
+            if self.pending_models:
+                self.update()
+
         gl.glClearColor(0.0, 0.0, 0.0, 0.0)
         gl.glClear(gl.GL_COLOR_BUFFER_BIT)
         live2d.clearBuffer()
 
-        self.model.Update()
-        if self.img:
-            paint = QPainter()
-            paint.begin(self)
-            paint.drawImage(QPoint(0, 0), self.img)
-            paint.end()
-        #gl.texture
-
-        if self.wav_handler.Update():
-            rms = self.wav_handler.GetRms()
-            self.model.AddParameterValue(live2d.StandardParams.ParamMouthOpenY,
-                                         rms * self.lip_sync_factor)
-
-        self.model.Draw()
+        if self.model is not None:
+            # 只使用本帧最后一次指针位置
+            drag = self.input.take()
+            if drag is not None:
+                self.model.Drag(*drag)
+        self.scene.update(self.width(), self.height())
+        if profiler:
+            profiler.mark()
+        self.background.draw()
+        if profiler:
+            profiler.mark()
+
+        self.scene.applyLipSync()
+        if profiler:
+            profiler.mark()
+
+        self.scene.draw()
+        if profiler:
+            profiler.mark()
+            profiler.endFrame()
+
+        if self.perf_overlay.visible:
+            painter = QPainter(self)
+            self.perf_overlay.paint(painter)
+            painter.end()
+
+    def togglePerfOverlay(self) -> None:
+        self.perf_overlay.setVisible(not self.perf_overlay.visible)
+        self.update()
 
-    def timerEvent(self, a0: QTimerEvent | None) -> None:
-        if not self.isVisible():
+    def keyPressEvent(self, event: QKeyEvent) -> None:
+        if event.key() == Qt.Key.Key_F3:
+            self.togglePerfOverlay()
             return
-
-        self.update()
+        super().keyPressEvent(event)
+
+    def setLipSyncConfig(self, config: LipSyncConfig) -> None:
+        """调整口型同步参数，从下一段音频开始生效"""
+        self.lip_sync.config = config
+
+    def isAnimating(self) -> bool:
+        """是否需要满帧率绘制"""
+        return (self.motion_scheduler.isPlaying() or self.lip_sync.audio is not None
+                or self.scene.isActive())
+
+    def isPrimaryActive(self) -> bool:
+        """主角色在播放动作或被拖动时逐帧更新"""
+        return (self.motion_scheduler.isPlaying() or self.input.pending is not None
+                or time.monotonic() < self.frame_scheduler.active_until)
+
+    def mousePressEvent(self, event: QMouseEvent) -> None:
+        if event.button() == Qt.MouseButton.LeftButton and self.model is not None:
+            self.clickX, self.clickY = event.position().x(), event.position().y()
+            self.isInLA = self.hit_router.hit(self.model, self.clickX, self.clickY,
+                                              self.width(), self.height(),
+                                              self.primary.placement()) is not None
+            self.clickInLA = self.isInLA
+        super().mousePressEvent(event)
 
     def mouseMoveEvent(self, event: QMouseEvent) -> None:
+        if self.model is None:
+            return
         x, y = event.scenePosition().x(), event.scenePosition().y()
-        self.model.Drag(int(self.x() + x), int(self.y() + y))
+        # 在下一帧绘制前统一交给模型
+        self.input.move(int(self.x() + x), int(self.y() + y))
+        # 拖动结束后模型还会回正，多保持一会满帧率
+        self.frame_scheduler.poke(1.0)
+
+    def mouseReleaseEvent(self, event: QMouseEvent) -> None:
+        if event.button() == Qt.MouseButton.LeftButton and self.clickInLA and self.model is not None:
+            x, y = event.position().x(), event.position().y()
+            # 移动超过拖动距离的算作拖动，不触发点击动作
+            distance = abs(x - self.clickX) + abs(y - self.clickY)
+            if distance < QGuiApplication.styleHints().startDragDistance():
+                emotion = self.hit_router.click(self.model, x, y, self.width(), self.height(),
+                                                self.primary.placement())
+                if emotion is not None:
+                    self.motion_scheduler.push(emotion)
+        self.clickInLA = False
+        self.clickX = self.clickY = -1
+        super().mouseReleaseEvent(event)
 
     def on_mediapalyer_status_changed(self, status):
         if status == QMediaPlayer.PlaybackState.StoppedState:
             print(status)
-            self.wav_handler.pcmData = None # type: ignore
-            #if self.wav_file is not None:
-            #    Path(self.wav_file).unlink(True)
-            self.model.StartMotion("Idle", 0, 2)
-
-    def playSound(self, wav_file: str) -> None:
-        self.player.play_file(wav_file)
-        self.wav_handler.Start(wav_file)
-
-    def motion(self, emoji: str):
-        emoji_dict = {
-            "🙂": ["Idle", 1],
-            "😄": ["Idle", 2],
-            "🤯": ["Tap", 0],
-            "😟": ["Tap", 1],
-            "😳": ["Flick", 0],
-            "💃": ["Flick", 1],
-            "😕": ["FlickUp", 0],
-        }
-        self.model.StartMotion(*emoji_dict[emoji], priority=1)
+            if self.sound_queue:
+                # 直接衔接下一句，口型同步继续，不回到待机动作
+                self.playSound(self.sound_queue.popleft())
+                return
+            self.on_sound_finished()
+
+    def on_clip_started(self, audio: PcmAudio) -> None:
+        self.lip_sync.start(audio)
+        self.frame_scheduler.poke()
+        self.sound_started.emit()
+
+    def on_sound_finished(self) -> None:
+        self.lip_sync.stop()
+        self.motion_scheduler.playIdle()
+
+    def playSound(self, audio: PcmAudio) -> None:
+        self.player.play_audio(audio)
+        self.lip_sync.start(audio)
+        self.frame_scheduler.poke()
+        self.sound_started.emit()
+
+    def enqueueSound(self, audio: PcmAudio) -> None:
+        """按顺序排队播放，空闲时立即开始"""
+        if self.pcm_output:
+            # 口型同步在 clip_started 中按实际开始发声的时间切换
+            self.player.enqueue(audio)
+            return
+        if self.sound_queue or self.player.isPlaying():
+            self.sound_queue.append(audio)
+        else:
+            self.playSound(audio)
+
+    def stopSound(self) -> None:
+        self.sound_queue.clear()
+        self.player.stop()
+
+    def motion(self, emoji: str) -> bool:
+        """按表情标记排队播放动作，未知标记返回 False"""
+        return self.motion_scheduler.trigger(emoji)
+
+    def startMotion(self, group: str, index: int) -> None:
+        if self.model is None:
+            return
+        # 切换时机由 MotionScheduler 决定，这里总是以强制优先级启动，由 Cubism 淡入淡出
+        self.model.StartMotion(group, index, priority=3)
+        self.frame_scheduler.poke()
 
 
 if __name__ == "__main__":
@@ -149,4 +434,5 @@ if __name__ == "__main__":
     main_window.show()
     app.exec()
 
+    main_window.dispose()
     live2d.dispose()
@@ -0,0 +1,143 @@
+"""压力测试：并发运行多个对话，统计延迟分位数与吞吐量
+
+    python -m src.standin_server --port 8765 &
+    python -m src.loadgen --url http://127.0.0.1:8765 --conversations 100 --concurrency 20
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+
+from .backend import ChatBackend, ConnectionPool, HttpChatBackend, HttpTTSBackend, TTSBackend
+from .text import split_sentences
+
+PROMPTS = ["你好", "你是谁", "你喜欢唱歌吗", "给我讲个故事吧", "今天天气怎么样"]
+
+
+@dataclass
+class TurnResult:
+    first_token: float = 0.0  # 秒
+    reply: float = 0.0
+    tts: list[float] = field(default_factory=list)  # 每个分句的合成耗时
+    turn: float = 0.0
+    chars: int = 0
+    audio_bytes: int = 0
+    error: str = ""
+
+
+def run_conversation(chat: ChatBackend, tts: TTSBackend | None, turns: int,
+                     index: int) -> list[TurnResult]:
+    results = []
+    conversation_id = None
+    for turn in range(turns):
+        result = TurnResult()
+        start = time.perf_counter()
+        try:
+            # 创建失败计为这一轮出错，下一轮再试
+            if conversation_id is None:
+                conversation_id = chat.create_conversation()
+            answer = ""
+            for piece in chat.stream(conversation_id, PROMPTS[(index + turn) % len(PROMPTS)]):
+                if not answer:
+                    result.first_token = time.perf_counter() - start
+                answer += piece
+            result.reply = time.perf_counter() - start
+            result.chars = len(answer)
+            if tts is not None:
+                for sentence in split_sentences(answer):
+                    t = time.perf_counter()
+                    result.audio_bytes += len(tts.synthesize(sentence, 4144, "wav"))
+                    result.tts.append(time.perf_counter() - t)
+        except Exception as e:
+            result.error = repr(e)
+        result.turn = time.perf_counter() - start
+        results.append(result)
+    return results
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def pick(p: float) -> float:
+        return values[min(int(p / 100 * len(values)), len(values) - 1)] * 1000
+
+    return {
+        "p50_ms": pick(50),
+        "p90_ms": pick(90),
+        "p99_ms": pick(99),
+        "max_ms": values[-1] * 1000,
+    }
+
+
+def summarize(results: list[TurnResult], elapsed: float) -> dict:
+    ok = [r for r in results if not r.error]
+    return {
+        "turns": len(results),
+        "errors": len(results) - len(ok),
+        "elapsed_s": elapsed,
+        "throughput": {
+            "turns_per_s": len(ok) / elapsed if elapsed else 0.0,
+            "chars_per_s": sum(r.chars for r in ok) / elapsed if elapsed else 0.0,
+            "audio_bytes_per_s": sum(r.audio_bytes for r in ok) / elapsed if elapsed else 0.0,
+        },
+        "first_token": percentiles([r.first_token for r in ok]),
+        "reply": percentiles([r.reply for r in ok]),
+        "tts_chunk": percentiles([t for r in ok for t in r.tts]),
+        "turn": percentiles([r.turn for r in ok]),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=3, help="每个对话的回合数")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--no-tts", action="store_true", help="只测试对话接口")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    parser.add_argument("--raw", help="把每个回合的原始数据写入该文件")
+    args = parser.parse_args()
+
+    # 每个并发线程各占一条 keep-alive 连接
+    pool = ConnectionPool(args.url, size=args.concurrency * 2)
+    chat = HttpChatBackend(args.url, pool)
+    tts = None if args.no_tts else HttpTTSBackend(args.url, pool)
+
+    results: list[TurnResult] = []
+    lock = threading.Lock()
+
+    def worker(index: int) -> None:
+        turns = run_conversation(chat, tts, args.turns, index)
+        with lock:
+            results.extend(turns)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(worker, range(args.conversations)))
+    elapsed = time.perf_counter() - start
+    pool.close()
+
+    summary = summarize(results, elapsed)
+    if args.raw:
+        with open(args.raw, "w", encoding="utf-8") as f:
+            json.dump([asdict(r) for r in results], f)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    print(f"{summary['turns']} turns, {summary['errors']} errors, {elapsed:.2f}s")
+    for key, value in summary["throughput"].items():
+        print(f"  {key:<18} {value:,.1f}")
+    for name in ("first_token", "reply", "tts_chunk", "turn"):
+        stats = summary[name]
+        if stats:
+            print(f"  {name:<12} " + "  ".join(f"{k} {v:8.1f}" for k, v in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
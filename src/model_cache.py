@@ -0,0 +1,125 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+import live2d.v3 as live2d
+
+from .interaction import hit_area_names
+from .motion import motion_durations, motion_groups
+from .scheduler import Request
+
+# 较新的 live2d-py 把解析模型文件 (LoadModelJson) 与创建 OpenGL 资源 (CreateRenderer)
+# 分开，前者可以放到工作线程；旧版本只能在 OpenGL 线程中一次完成
+SPLIT_RENDERER = hasattr(live2d.LAppModel, "CreateRenderer")
+
+
+def model_key(path: os.PathLike | str) -> str:
+    return str(Path(path).resolve())
+
+
+def model_files(path: os.PathLike | str) -> list[Path]:
+    """model3.json 引用的全部文件"""
+    path = Path(path)
+    setting = json.loads(path.read_text("UTF-8"))
+    refs = setting.get("FileReferences", {})
+    files = [refs.get(name) for name in ("Moc", "Physics", "Pose", "DisplayInfo", "UserData")]
+    files += refs.get("Textures", [])
+    for group in refs.get("Motions", {}).values():
+        for motion in group:
+            files += [motion.get("File"), motion.get("Sound")]
+    files += [expression.get("File") for expression in refs.get("Expressions", [])]
+    return [path.parent / file for file in files if file]
+
+
+@dataclass
+class LoadedModel:
+    """工作线程加载的模型，OpenGL 资源还需在绘制线程中创建"""
+    path: str
+    model: live2d.LAppModel | None
+    bytes_read: int
+    load_time: float  # 秒
+    motion_groups: dict[str, int]  # {动作组: 动作数量}
+    motion_durations: dict[tuple[str, int], float]
+    hit_areas: set[str]  # model3.json 中声明的点击区域
+
+
+def load_model_assets(request: Request, path: str) -> LoadedModel:
+    """在工作线程中读取模型文件；支持时同时完成 moc3、物理和动作的解析"""
+    start = time.perf_counter()
+    bytes_read = 0
+    # 先把文件读进系统缓存，之后的解析和纹理加载不再等待磁盘
+    for file in model_files(path):
+        request.check()
+        try:
+            bytes_read += len(file.read_bytes())
+        except OSError as e:
+            print(f"模型文件读取失败: {e}")
+    groups = motion_groups(path)
+    durations = motion_durations(path)
+    hit_areas = hit_area_names(path)
+    model = None
+    if SPLIT_RENDERER:
+        request.check()
+        model = live2d.LAppModel()
+        model.LoadModelJson(path)
+    return LoadedModel(path, model, bytes_read, time.perf_counter() - start,
+                       groups, durations, hit_areas)
+
+
+class ModelCache:
+    """按模型路径缓存已加载的模型 (LRU)，切换角色时不必重新加载"""
+
+    def __init__(self, capacity: int = 2) -> None:
+        self.capacity = capacity
+        self._models: OrderedDict[str, live2d.LAppModel] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: os.PathLike | str) -> live2d.LAppModel | None:
+        key = model_key(path)
+        model = self._models.get(key)
+        if model is None:
+            self.misses += 1
+            return None
+        self._models.move_to_end(key)
+        self.hits += 1
+        return model
+
+    def put(self,
+            path: os.PathLike | str,
+            model: live2d.LAppModel,
+            pinned: live2d.LAppModel | None = None) -> list[live2d.LAppModel]:
+        """加入缓存，返回被淘汰的模型；pinned（正在显示的模型）不会被淘汰"""
+        self._models[model_key(path)] = model
+        self._models.move_to_end(model_key(path))
+        evicted = []
+        for key in list(self._models):
+            if len(self._models) <= self.capacity:
+                break
+            if self._models[key] is pinned or self._models[key] is model:
+                continue
+            evicted.append(self._models.pop(key))
+        return evicted
+
+    def __contains__(self, path: os.PathLike | str) -> bool:
+        return model_key(path) in self._models
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def clear(self) -> list[live2d.LAppModel]:
+        models = list(self._models.values())
+        self._models.clear()
+        return models
+
+    def stats(self) -> dict[str, int | float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "models": len(self._models),
+        }
@@ -0,0 +1,208 @@
+import heapq
+import itertools
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+EMOTIONS_FILE = Path(__file__).parent.parent / "resources" / "emotions.json"
+
+
+@dataclass(frozen=True)
+class Emotion:
+    marker: str  # 回复中的表情标记，例如 "😄"
+    group: str  # 动作组
+    index: int
+    priority: int = 1  # 越大越优先，可以打断正在播放的低优先级动作
+    duration: float | None = None  # 秒，None 表示使用动作文件中的时长
+
+
+@dataclass(frozen=True)
+class EmotionMap:
+    emotions: dict[str, Emotion]
+    idle: Emotion | None = None
+
+    @property
+    def markers(self) -> list[str]:
+        return list(self.emotions)
+
+
+def load_emotions(path: os.PathLike | str = EMOTIONS_FILE) -> EmotionMap:
+    """读取表情标记到动作的映射"""
+    data = json.loads(Path(path).read_text("UTF-8"))
+    emotions = {}
+    for marker, entry in data.get("emotions", {}).items():
+        emotions[marker] = Emotion(marker, entry["group"], int(entry.get("index", 0)),
+                                   int(entry.get("priority", 1)), entry.get("duration"))
+    idle = None
+    if "idle" in data:
+        idle = Emotion("", data["idle"]["group"], int(data["idle"].get("index", 0)), 0)
+    return EmotionMap(emotions, idle)
+
+
+def validate_emotions(emotion_map: EmotionMap, motion_groups: dict[str, int]) -> EmotionMap:
+    """去掉模型中不存在的动作，motion_groups 为 {动作组: 动作数量}"""
+
+    def valid(emotion: Emotion) -> bool:
+        count = motion_groups.get(emotion.group, 0)
+        if 0 <= emotion.index < count:
+            return True
+        print(f"表情 {emotion.marker or 'idle'} 对应的动作 {emotion.group}[{emotion.index}] "
+              f"不存在，已忽略")
+        return False
+
+    idle = emotion_map.idle if emotion_map.idle is not None and valid(emotion_map.idle) else None
+    return EmotionMap({marker: emotion for marker, emotion in emotion_map.emotions.items()
+                       if valid(emotion)}, idle)
+
+
+def motion_groups(model_json: os.PathLike | str) -> dict[str, int]:
+    """model3.json 中各动作组的动作数量"""
+    setting = json.loads(Path(model_json).read_text("UTF-8"))
+    motions = setting.get("FileReferences", {}).get("Motions", {})
+    return {group: len(entries) for group, entries in motions.items()}
+
+
+def motion_durations(model_json: os.PathLike | str) -> dict[tuple[str, int], float]:
+    """读取每个动作文件 Meta.Duration，单位秒"""
+    model_json = Path(model_json)
+    setting = json.loads(model_json.read_text("UTF-8"))
+    durations = {}
+    for group, entries in setting.get("FileReferences", {}).get("Motions", {}).items():
+        for index, entry in enumerate(entries):
+            try:
+                motion = json.loads((model_json.parent / entry["File"]).read_text("UTF-8"))
+                durations[(group, index)] = float(motion["Meta"]["Duration"])
+            except (OSError, KeyError, ValueError) as e:
+                print(f"读取动作时长失败: {group}[{index}] {e}")
+    return durations
+
+
+class EmotionParser:
+    """从逐渐变长的流式回复中找出新出现的表情标记"""
+
+    def __init__(self, markers: Iterable[str]) -> None:
+        self.markers = list(markers)
+        self.text = ""
+
+    def reset(self) -> None:
+        self.text = ""
+
+    def feed(self, text: str) -> list[str]:
+        """text 为目前为止的完整回复，返回此前未出现过的标记（按出现顺序）"""
+        if not text.startswith(self.text):
+            # 回复被替换（例如重新生成），从头开始
+            self.text = ""
+        start = len(self.text)
+        self.text = text
+        found = []
+        for marker in self.markers:
+            # 标记可能跨越两次输出，向前多看 len(marker) - 1 个字符
+            pos = text.find(marker, max(start - len(marker) + 1, 0))
+            while pos != -1:
+                if pos + len(marker) > start:
+                    found.append((pos, marker))
+                pos = text.find(marker, pos + len(marker))
+        return [marker for _, marker in sorted(found)]
+
+
+class MotionScheduler(QObject):
+    """动作调度
+
+    按优先级排队播放动作，高优先级的动作会立即打断低优先级的动作；
+    同级或更低的动作排队，在当前动作结束前 blend 秒开始播放，
+    由 Cubism 的淡入淡出完成过渡。
+    """
+    started = Signal(object)  # 开始播放的 Emotion，不包括待机动作
+
+    def __init__(self,
+                 start_motion: Callable[[str, int], None],
+                 parent: QObject | None = None,
+                 blend: float = 0.3,
+                 default_duration: float = 3.0,
+                 max_queue: int = 4) -> None:
+        super().__init__(parent)
+        self.start_motion = start_motion  # (动作组, 序号)，由调度器决定何时切换
+        self.blend = blend
+        self.default_duration = default_duration
+        self.max_queue = max_queue
+        self.emotion_map = EmotionMap({})
+        self.durations: dict[tuple[str, int], float] = {}
+        self.queue: list[tuple[int, int, Emotion]] = []  # (-优先级, 序号, 动作)
+        self._seq = itertools.count()
+        self.current: Emotion | None = None
+        self.current_until = 0.0
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.next)
+
+    def setEmotions(self, emotion_map: EmotionMap,
+                    durations: dict[tuple[str, int], float]) -> None:
+        self.emotion_map = emotion_map
+        self.durations = durations
+        self.clear()
+
+    def trigger(self, marker: str) -> bool:
+        """按表情标记播放动作，未知标记返回 False"""
+        emotion = self.emotion_map.emotions.get(marker)
+        if emotion is None:
+            return False
+        self.push(emotion)
+        return True
+
+    def push(self, emotion: Emotion) -> None:
+        if self.current is None or emotion.priority > self.current.priority:
+            self.play(emotion)
+            return
+        if len(self.queue) >= self.max_queue:
+            # 队列已满时丢弃优先级最低、最晚加入的动作
+            weakest = max(self.queue)
+            if -emotion.priority >= weakest[0]:
+                return
+            self.queue.remove(weakest)
+            heapq.heapify(self.queue)
+        heapq.heappush(self.queue, (-emotion.priority, next(self._seq), emotion))
+
+    def play(self, emotion: Emotion) -> None:
+        duration = emotion.duration
+        if duration is None:
+            duration = self.durations.get((emotion.group, emotion.index), self.default_duration)
+        self.current = emotion
+        self.current_until = time.monotonic() + duration
+        self.start_motion(emotion.group, emotion.index)
+        self.started.emit(emotion)
+        self.timer.start(max(int((duration - self.blend) * 1000), 0))
+
+    def next(self) -> None:
+        """当前动作即将结束，开始下一个；队列为空时回到待机"""
+        if self.queue:
+            _, _, emotion = heapq.heappop(self.queue)
+            self.play(emotion)
+            return
+        remaining = self.current_until - time.monotonic()
+        if remaining > 0:
+            # 没有后续动作，让当前动作播完再回到待机
+            self.timer.start(int(remaining * 1000) + 1)
+            return
+        self.current = None
+        self.playIdle()
+
+    def playIdle(self) -> None:
+        """没有排队的动作时回到待机动作"""
+        if self.current is None and not self.queue and self.emotion_map.idle is not None:
+            idle = self.emotion_map.idle
+            self.start_motion(idle.group, idle.index)
+
+    def clear(self) -> None:
+        self.queue.clear()
+        self.current = None
+        self.current_until = 0.0
+        self.timer.stop()
+
+    def isPlaying(self) -> bool:
+        return self.current is not None and time.monotonic() < self.current_until
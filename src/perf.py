@@ -0,0 +1,143 @@
+import csv
+import json
+import os
+import time
+
+import numpy as np
+from PySide6.QtCore import QPoint, QRect
+from PySide6.QtGui import QColor, QFont, QPainter
+
+STAGES = ("update", "background", "lip_sync", "draw")
+
+
+class FrameProfiler:
+    """逐帧分阶段计时，样本保存在固定大小的环形缓冲区中
+
+    默认一直记录 (每帧约 3 µs)，随时可以导出最近 capacity 帧；关闭时 paintGL
+    只多一次属性判断。注意 GL 调用是异步的，这里记录的是 CPU 端提交耗时，
+    GPU 执行时间会体现在帧间隔里。
+    """
+
+    def __init__(self, capacity: int = 1024, stages: tuple[str, ...] = STAGES) -> None:
+        self.enabled = True
+        self.stages = stages
+        self.capacity = capacity
+        # 每行：帧开始时间戳 (秒)，各阶段耗时 (毫秒)，整帧耗时 (毫秒)
+        self.samples = np.zeros((capacity, len(stages) + 2), dtype=np.float64)
+        self.count = 0
+        self.row = np.zeros(len(stages) + 2, dtype=np.float64)
+        self.frame_start = 0.0
+        self.stage_start = 0.0
+        self.stage = 0
+
+    def beginFrame(self) -> None:
+        self.frame_start = self.stage_start = time.perf_counter()
+        self.stage = 0
+
+    def mark(self) -> None:
+        """结束当前阶段，阶段顺序与 stages 一致"""
+        now = time.perf_counter()
+        self.row[self.stage + 1] = (now - self.stage_start) * 1000
+        self.stage_start = now
+        self.stage += 1
+
+    def endFrame(self) -> None:
+        now = time.perf_counter()
+        self.row[0] = self.frame_start
+        self.row[-1] = (now - self.frame_start) * 1000
+        self.samples[self.count % self.capacity] = self.row
+        self.count += 1
+
+    def reset(self) -> None:
+        self.count = 0
+
+    def data(self) -> np.ndarray:
+        """按时间顺序返回已记录的样本"""
+        if self.count <= self.capacity:
+            return self.samples[:self.count].copy()
+        start = self.count % self.capacity
+        return np.roll(self.samples, -start, axis=0)
+
+    def stats(self) -> dict[str, float]:
+        data = self.data()
+        if len(data) == 0:
+            return {}
+        stats = {}
+        if len(data) > 1:
+            span = data[-1, 0] - data[0, 0]
+            stats["fps"] = float((len(data) - 1) / span) if span > 0 else 0.0
+        frame = data[:, -1]
+        stats["p50"] = float(np.percentile(frame, 50))
+        stats["p99"] = float(np.percentile(frame, 99))
+        for i, stage in enumerate(self.stages):
+            stats[stage] = float(data[:, i + 1].mean())
+        return stats
+
+    def columns(self) -> list[str]:
+        return ["timestamp", *self.stages, "total"]
+
+    def exportCsv(self, path: os.PathLike | str) -> None:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns())
+            writer.writerows(self.data().tolist())
+
+    def exportJson(self, path: os.PathLike | str) -> None:
+        columns = self.columns()
+        samples = [dict(zip(columns, row)) for row in self.data().tolist()]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"stats": self.stats(), "samples": samples}, f, indent=2)
+
+    def export(self, path: os.PathLike | str) -> None:
+        """按扩展名导出 CSV 或 JSON"""
+        if str(path).lower().endswith(".json"):
+            self.exportJson(path)
+        else:
+            self.exportCsv(path)
+
+
+class PerfOverlay:
+    """在画面左上角显示帧率与各阶段耗时"""
+
+    def __init__(self, profiler: FrameProfiler, refresh_interval: float = 0.5) -> None:
+        self.profiler = profiler
+        self.visible = False
+        self.refresh_interval = refresh_interval
+        self.last_refresh = 0.0
+        self.lines: list[str] = []
+        self.font = QFont("monospace")
+        self.font.setStyleHint(QFont.StyleHint.Monospace)
+        self.font.setPixelSize(13)
+
+    def setVisible(self, visible: bool) -> None:
+        # 计时不随显示开关，隐藏期间记录的数据仍可导出
+        self.visible = visible
+        if visible:
+            self.last_refresh = 0.0
+
+    def _refresh(self) -> None:
+        # 统计结果按固定间隔刷新，避免每帧计算分位数
+        now = time.monotonic()
+        if now - self.last_refresh < self.refresh_interval:
+            return
+        self.last_refresh = now
+        stats = self.profiler.stats()
+        if not stats:
+            self.lines = ["collecting..."]
+            return
+        self.lines = [
+            f"FPS  {stats.get('fps', 0.0):6.1f}",
+            f"p50  {stats['p50']:6.2f} ms",
+            f"p99  {stats['p99']:6.2f} ms",
+        ] + [f"{stage:<10} {stats[stage]:6.2f} ms" for stage in self.profiler.stages]
+
+    def paint(self, painter: QPainter) -> None:
+        self._refresh()
+        line_height = 16
+        rect = QRect(8, 8, 190, line_height * len(self.lines) + 10)
+        painter.fillRect(rect, QColor(0, 0, 0, 160))
+        painter.setFont(self.font)
+        painter.setPen(QColor("#00FF88"))
+        for i, line in enumerate(self.lines):
+            painter.drawText(QPoint(rect.left() + 6, rect.top() + 5 + line_height * (i + 1) - 4),
+                             line)
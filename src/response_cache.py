@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable
+
+from .tts_cache import atomic_write, normalize_text
+
+# 比较问题时忽略的标点和语气符号
+IGNORED = re.compile(r"[\s,.!?~，。！？、～…]+")
+
+
+def normalize_prompt(text: str) -> str:
+    """统一全角/半角、大小写并去掉标点，使 “你好！” 与 “你好” 命中同一条缓存"""
+    return IGNORED.sub("", normalize_text(text).casefold())
+
+
+class ResponseCache:
+    """对话回复缓存
+
+    以 (规范化后的输入, 角色/服务指纹) 为键，按条数限制的 LRU，条目超过 ttl 秒失效；
+    指定 path 时持久化为 JSON 文件，写入合并到 save_delay 秒后在后台线程进行，
+    退出前需调用 flush。
+
+    只有新会话第一轮的回复会被缓存或复用：命中时消息不会发给服务，服务端的会话
+    不知道这一轮问答，之后的回复依赖上下文，总是请求服务。
+    """
+
+    def __init__(self,
+                 path: os.PathLike | str | None = None,
+                 max_entries: int = 256,
+                 ttl: float | None = 7 * 24 * 3600,
+                 bypass: Callable[[str], bool] | None = None,
+                 save_delay: float = 2.0) -> None:
+        self.path = Path(path) if path is not None else None
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.bypass = bypass  # 返回 True 的输入不使用缓存
+        self.save_delay = save_delay
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()  # 键 -> (回复, 写入时间)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # 保证依次写入文件
+        self._save_timer: threading.Timer | None = None
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.expired = 0
+        self.load()
+
+    @staticmethod
+    def make_key(text: str, fingerprint: str) -> str:
+        raw = f"{fingerprint}\0{normalize_prompt(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def accepts(self, text: str, turn: int) -> bool:
+        """turn 为这条输入在当前对话中的轮次，从 1 开始"""
+        if turn != 1 or not normalize_prompt(text):
+            return False
+        return self.bypass is None or not self.bypass(text)
+
+    def get(self, text: str, fingerprint: str, turn: int) -> str | None:
+        if not self.accepts(text, turn):
+            with self._lock:
+                self.bypassed += 1
+            return None
+        key = self.make_key(text, fingerprint)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_stale(entry[1]):
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, text: str, fingerprint: str, turn: int, answer: str) -> None:
+        if not answer or not self.accepts(text, turn):
+            return
+        key = self.make_key(text, fingerprint)
+        with self._lock:
+            self._entries[key] = (answer, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        self.schedule_save()
+
+    def answers(self) -> list[str]:
+        """缓存中的全部回复，可用于预热 TTS 缓存"""
+        with self._lock:
+            return [answer for answer, _ in self._entries.values()]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        self.schedule_save()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "bypassed": self.bypassed,
+                "expired": self.expired,
+                "entries": len(self._entries),
+            }
+
+    def load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text("UTF-8"))
+        except (OSError, ValueError) as e:
+            print(f"读取回复缓存失败: {e}")
+            return
+        with self._lock:
+            for key, answer, created in data.get("entries", []):
+                if not self._is_stale(created):
+                    self._entries[key] = (answer, created)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def schedule_save(self) -> None:
+        """save_delay 秒后在后台线程保存，其间的修改合并为一次写入"""
+        if self.path is None:
+            return
+        with self._lock:
+            self._dirty = True
+            if self._save_timer is not None:
+                return
+            self._save_timer = threading.Timer(self.save_delay, self._save_later)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _save_later(self) -> None:
+        with self._lock:
+            self._save_timer = None
+        self.save()
+
+    def flush(self) -> None:
+        """立即保存尚未写入的修改，退出前调用"""
+        with self._lock:
+            timer, self._save_timer = self._save_timer, None
+        if timer is not None:
+            timer.cancel()
+        self.save()
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                self._dirty = False
+                entries = [[key, answer, created]
+                           for key, (answer, created) in self._entries.items()]
+            data = json.dumps({"version": 1, "entries": entries}, ensure_ascii=False)
+            try:
+                atomic_write(self.path, data.encode("utf-8"))
+            except OSError as e:
+                print(f"保存回复缓存失败: {e}")
+
+    def _is_stale(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
@@ -0,0 +1,122 @@
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+import live2d.v3 as live2d
+
+from .audio import LipSync
+
+
+@dataclass(eq=False)
+class SceneModel:
+    """场景中的一个角色"""
+    path: str
+    model: live2d.LAppModel | None = None  # 加载完成前为 None，不参与绘制
+    x: float = 0.0  # 中心位置，与 SetOffset 相同的坐标，窗口范围约为 -1 ~ 1
+    y: float = 0.0
+    scale: float = 1.0
+    z: int = 0  # 越大越靠前
+    visible: bool = True
+    lip_sync: LipSync = field(default_factory=LipSync)
+    position: Callable[[], float] = lambda: 0.0  # 该角色声音的播放位置 (毫秒)
+    is_active: Callable[[], bool] = lambda: False  # 动作等需要逐帧更新的状态
+    last_update: float = 0.0
+
+    def place(self) -> None:
+        """把位置和缩放应用到模型"""
+        if self.model is not None:
+            self.model.SetOffset(self.x, self.y)
+            self.model.SetScale(self.scale)
+
+    def placement(self) -> tuple[float, float, float]:
+        return self.x, self.y, self.scale
+
+    def active(self) -> bool:
+        return self.lip_sync.audio is not None or self.is_active()
+
+    def onScreen(self, width: int, height: int) -> bool:
+        """按画布比例估计模型范围是否与窗口相交"""
+        if not self.visible or self.model is None or width <= 0 or height <= 0:
+            return False
+        canvas_w, canvas_h = self.model.GetCanvasSize()
+        # 模型按窗口高度缩放，纵向半高为 scale
+        half_h = self.scale
+        half_w = self.scale * (canvas_w / canvas_h if canvas_h else 1.0) * height / width
+        return abs(self.x) - half_w < 1.0 and abs(self.y) - half_h < 1.0
+
+
+class Scene:
+    """同一 OpenGL 上下文中的多个角色
+
+    所有角色共用一个帧循环和背景。每帧先更新、再统一按 z 顺序绘制；
+    不在窗口内的角色既不更新也不绘制，没有动作和口型同步的角色
+    按 idle_interval 降低更新频率，中间的帧直接绘制上次的结果。
+    """
+
+    def __init__(self, idle_interval: float = 0.1) -> None:
+        self.idle_interval = idle_interval
+        self.models: list[SceneModel] = []  # 按 z 排序
+        self.drawn: list[SceneModel] = []  # 本帧需要绘制的角色
+        self.updated = 0
+        self.skipped = 0
+        self.culled = 0
+
+    def add(self, entry: SceneModel) -> None:
+        self.models.append(entry)
+        self.sort()
+
+    def remove(self, entry: SceneModel) -> None:
+        if entry in self.models:
+            self.models.remove(entry)
+        if entry in self.drawn:
+            self.drawn.remove(entry)
+
+    def sort(self) -> None:
+        # 排序稳定，z 相同的角色保持加入顺序
+        self.models.sort(key=lambda entry: entry.z)
+
+    def __len__(self) -> int:
+        return len(self.models)
+
+    def loaded(self) -> list[SceneModel]:
+        return [entry for entry in self.models if entry.model is not None]
+
+    def resize(self, width: int, height: int) -> None:
+        for entry in self.loaded():
+            entry.model.Resize(width, height)
+
+    def isActive(self) -> bool:
+        return any(entry.active() for entry in self.loaded())
+
+    def update(self, width: int, height: int) -> None:
+        now = time.monotonic()
+        self.drawn = []
+        for entry in self.models:
+            if entry.model is None:
+                continue
+            if not entry.onScreen(width, height):
+                self.culled += 1
+                continue
+            self.drawn.append(entry)
+            # 帧定时器有抖动，留出余量，避免待机帧率下每隔一帧才更新一次
+            if entry.active() or now - entry.last_update >= self.idle_interval * 0.8:
+                entry.model.Update()
+                entry.last_update = now
+                self.updated += 1
+            else:
+                self.skipped += 1
+
+    def applyLipSync(self) -> None:
+        for entry in self.drawn:
+            if entry.lip_sync.audio is not None:
+                # 按实际播放位置查表，与声音保持一致
+                entry.model.AddParameterValue(live2d.StandardParams.ParamMouthOpenY,
+                                              entry.lip_sync.value_at(entry.position()))
+
+    def draw(self) -> None:
+        for entry in self.drawn:
+            entry.model.Draw()
+
+    def stats(self) -> dict[str, int]:
+        return {"models": len(self.loaded()), "updated": self.updated,
+                "skipped": self.skipped, "culled": self.culled}
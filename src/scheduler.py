@@ -0,0 +1,170 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+
+class RequestCancelled(Exception):
+    """请求已被取消"""
+
+
+class RequestTimeout(Exception):
+    """请求超时"""
+
+
+@dataclass
+class Request:
+    id: int
+    fn: Callable[..., Any]
+    args: tuple
+    timeout: float | None
+    retries: int
+    on_done: Callable[[Any], None] | None = None
+    on_error: Callable[[Exception], None] | None = None
+    on_progress: Callable[[Any], None] | None = None
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+    submitted_at: float = field(default_factory=time.monotonic)
+    attempts: int = 0
+    scheduler: "RequestScheduler | None" = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def check(self) -> None:
+        """供工作函数在循环中调用，已取消或超时时抛出异常"""
+        if self.cancelled:
+            raise RequestCancelled(self.id)
+
+    def report(self, value: Any) -> None:
+        """从工作线程发送中间结果，会按请求 ID 转发到主线程"""
+        if self.scheduler is not None and not self.cancelled:
+            self.scheduler._progress.emit(self.id, value)
+
+
+class RequestScheduler(QObject):
+    """请求调度器
+
+    请求在线程池中执行，失败时按指数退避重试；超时或取消的请求不再回调。
+    结果通过信号按请求 ID 转回 Qt 主线程，再调用提交时给出的回调。
+    """
+
+    _finished = Signal(int, object)
+    _failed = Signal(int, object)
+    _progress = Signal(int, object)
+
+    def __init__(self,
+                 parent: QObject | None = None,
+                 max_workers: int = 2,
+                 timeout: float | None = 30.0,
+                 retries: int = 2,
+                 backoff: float = 0.5,
+                 max_backoff: float = 8.0) -> None:
+        super().__init__(parent)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pending: dict[int, Request] = {}
+        self._ids = itertools.count(1)
+
+        self._finished.connect(self._on_finished)
+        self._failed.connect(self._on_failed)
+        self._progress.connect(self._on_progress)
+
+        # 超时检查只在有未完成请求时运行
+        self.watchdog = QTimer(self)
+        self.watchdog.setInterval(100)
+        self.watchdog.timeout.connect(self._check_timeouts)
+
+    def submit(self,
+               fn: Callable[..., Any],
+               *args: Any,
+               on_done: Callable[[Any], None] | None = None,
+               on_error: Callable[[Exception], None] | None = None,
+               on_progress: Callable[[Any], None] | None = None,
+               timeout: float | None = -1,
+               retries: int | None = None) -> int:
+        """提交请求，fn 会以 fn(request, *args) 的形式在工作线程中调用"""
+        request = Request(id=next(self._ids),
+                          fn=fn,
+                          args=args,
+                          timeout=self.timeout if timeout == -1 else timeout,
+                          retries=self.retries if retries is None else retries,
+                          on_done=on_done,
+                          on_error=on_error,
+                          on_progress=on_progress,
+                          scheduler=self)
+        self.pending[request.id] = request
+        if request.timeout is not None and not self.watchdog.isActive():
+            self.watchdog.start()
+        self.pool.submit(self._run, request)
+        return request.id
+
+    def cancel(self, request_id: int) -> None:
+        request = self.pending.pop(request_id, None)
+        if request is not None:
+            request.cancel_event.set()
+
+    def cancel_all(self) -> None:
+        for request_id in list(self.pending):
+            self.cancel(request_id)
+
+    def shutdown(self) -> None:
+        self.cancel_all()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, request: Request) -> None:
+        delay = self.backoff
+        while not request.cancelled:
+            request.attempts += 1
+            try:
+                result = request.fn(request, *request.args)
+            except RequestCancelled:
+                return
+            except Exception as e:
+                if request.attempts > request.retries or request.cancelled:
+                    self._failed.emit(request.id, e)
+                    return
+                print(f"请求 {request.id} 第 {request.attempts} 次失败，{delay:.1f}s 后重试: {e!r}")
+                # 退避期间可被取消或超时打断
+                if request.cancel_event.wait(delay):
+                    return
+                delay = min(delay * 2, self.max_backoff)
+            else:
+                self._finished.emit(request.id, result)
+                return
+
+    def _on_finished(self, request_id: int, result: Any) -> None:
+        request = self.pending.pop(request_id, None)
+        if request is not None and request.on_done is not None:
+            request.on_done(result)
+
+    def _on_failed(self, request_id: int, error: Exception) -> None:
+        request = self.pending.pop(request_id, None)
+        if request is None:
+            return
+        print(f"请求 {request_id} 失败: {error!r}")
+        if request.on_error is not None:
+            request.on_error(error)
+
+    def _on_progress(self, request_id: int, value: Any) -> None:
+        request = self.pending.get(request_id)
+        if request is not None and request.on_progress is not None:
+            request.on_progress(value)
+
+    def _check_timeouts(self) -> None:
+        now = time.monotonic()
+        for request in list(self.pending.values()):
+            if request.timeout is None or now - request.submitted_at < request.timeout:
+                continue
+            # 工作线程无法强制终止，这里只丢弃结果并通知调用方
+            request.cancel_event.set()
+            self._failed.emit(request.id, RequestTimeout(request.id))
+        if not any(r.timeout is not None for r in self.pending.values()):
+            self.watchdog.stop()
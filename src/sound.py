@@ -1,6 +1,18 @@
-from PySide6.QtCore import QObject
-from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
-from PySide6.QtCore import QUrl
+import time
+from collections import deque
+
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice, QObject, QTimer, QUrl, Signal
+from PySide6.QtMultimedia import (
+    QAudio,
+    QAudioFormat,
+    QAudioOutput,
+    QAudioSink,
+    QMediaDevices,
+    QMediaPlayer,
+)
+
+from .audio import PcmAudio
+
 
 class SoundPlayer(QMediaPlayer):
 
@@ -9,7 +21,198 @@ class SoundPlayer(QMediaPlayer):
         self.audioOutput_ = QAudioOutput()
         self.setAudioOutput(self.audioOutput_)
         self.audioOutput_.setVolume(50)
-    
+        self.buffer_: QBuffer | None = None
+
     def play_file(self, file: str):
         self.setSource(QUrl.fromLocalFile(file))
-        self.play()
\ No newline at end of file
+        self.play()
+
+    def play_audio(self, audio: PcmAudio):
+        """直接从内存播放，不经过文件系统"""
+        buffer = QBuffer(self)
+        buffer.setData(QByteArray(audio.wavData()))
+        buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+        # URL 只用于提示解码器音频格式
+        self.setSourceDevice(buffer, QUrl("audio.wav"))
+        if self.buffer_ is not None:
+            self.buffer_.deleteLater()
+        self.buffer_ = buffer
+        self.play()
+
+
+class PcmQueueDevice(QIODevice):
+    """按顺序拼接多段 PCM，供 QAudioSink 以拉取模式读取，段与段之间没有间隙"""
+
+    def __init__(self, parent: QObject | None = None) -> None:
+        super().__init__(parent)
+        self.chunks: deque[tuple[PcmAudio, bytes]] = deque()
+        self.offset = 0  # 当前段已读出的字节数
+        self.bytes_read = 0  # 自 reset 以来读出的总字节数
+        self.boundaries: list[tuple[int, PcmAudio, float | None]] = []  # (起始字节, 音频, 入队时间)
+
+    def append(self, audio: PcmAudio, enqueued_at: float | None) -> None:
+        start = self.bytes_read + self.pendingBytes()
+        self.chunks.append((audio, audio.pcmData()))
+        self.boundaries.append((start, audio, enqueued_at))
+        self.readyRead.emit()
+
+    def pendingBytes(self) -> int:
+        return sum(len(data) for _, data in self.chunks) - self.offset
+
+    def reset(self) -> bool:
+        self.chunks.clear()
+        self.offset = 0
+        self.bytes_read = 0
+        self.boundaries.clear()
+        return super().reset()
+
+    def isSequential(self) -> bool:
+        return True
+
+    def bytesAvailable(self) -> int:
+        return self.pendingBytes() + super().bytesAvailable()
+
+    def readData(self, maxlen: int) -> bytes:
+        out = bytearray()
+        while self.chunks and len(out) < maxlen:
+            _, data = self.chunks[0]
+            piece = data[self.offset:self.offset + maxlen - len(out)]
+            out += piece
+            self.offset += len(piece)
+            if self.offset >= len(data):
+                self.chunks.popleft()
+                self.offset = 0
+        self.bytes_read += len(out)
+        return bytes(out)
+
+    def writeData(self, data: bytes) -> int:
+        return -1
+
+
+class PcmPlayer(QObject):
+    """基于 QAudioSink 的 PCM 播放器
+
+    不经过解码器，音频设备打开后一直保持，后续音频直接接在队列末尾无缝播放。
+    播放位置按音频设备实际处理的时长计算，用于口型同步。
+    """
+    clip_started = Signal(object)  # 某段音频开始播放，参数为 PcmAudio
+    finished = Signal()  # 队列中的音频全部播放完毕
+
+    def __init__(self, parent: QObject | None = None, buffer_ms: int = 40) -> None:
+        super().__init__(parent)
+        self.buffer_ms = buffer_ms
+        self.sink: QAudioSink | None = None
+        self.format: QAudioFormat | None = None
+        self.device = PcmQueueDevice(self)
+        self.device.open(QIODevice.OpenModeFlag.ReadOnly)
+        self.waiting: deque[tuple[PcmAudio, float]] = deque()  # 格式不同，等当前格式播完再播
+        self.current: PcmAudio | None = None
+        self.current_start = 0  # 当前段在流中的起始字节
+        self.playing = False
+        self.latencies: deque[float] = deque(maxlen=200)  # 入队到开始发声，毫秒
+
+        # 播放期间检查段落切换和播放结束
+        self.timer = QTimer(self)
+        self.timer.setInterval(10)
+        self.timer.timeout.connect(self.poll)
+
+    def enqueue(self, audio: PcmAudio) -> None:
+        """加入播放队列，空闲时立即开始"""
+        now = time.perf_counter()
+        audio_format = self.formatFor(audio)
+        if self.sink is not None and self.format != audio_format:
+            if self.playing:
+                self.waiting.append((audio, now))
+                return
+            self.closeSink()
+        if self.sink is None:
+            self.openSink(audio_format)
+        # 只有空闲时入队的音频，入队到发声的时间才反映播放器本身的延迟
+        self.device.append(audio, None if self.playing else now)
+        self.playing = True
+        if self.sink.state() == QAudio.State.StoppedState:
+            self.sink.start(self.device)
+        self.timer.start()
+
+    def stop(self) -> None:
+        """清空队列并立即停止"""
+        self.waiting.clear()
+        was_playing = self.playing
+        self.closeSink()
+        if was_playing:
+            self.finished.emit()
+
+    def isPlaying(self) -> bool:
+        return self.playing
+
+    def position(self) -> int:
+        """当前段的播放位置，毫秒"""
+        if self.sink is None or self.current is None or self.format is None:
+            return 0
+        played = self.format.bytesForDuration(self.sink.processedUSecs())
+        return self.format.durationForBytes(max(played - self.current_start, 0)) // 1000
+
+    def latencyStats(self) -> dict[str, float]:
+        if not self.latencies:
+            return {"n": 0}
+        values = sorted(self.latencies)
+        return {
+            "n": len(values),
+            "p50_ms": values[len(values) // 2],
+            "p90_ms": values[min(int(len(values) * 0.9), len(values) - 1)],
+            "max_ms": values[-1],
+        }
+
+    @staticmethod
+    def formatFor(audio: PcmAudio) -> QAudioFormat:
+        audio_format = QAudioFormat()
+        audio_format.setSampleRate(audio.frame_rate)
+        audio_format.setChannelCount(audio.channels)
+        audio_format.setSampleFormat(QAudioFormat.SampleFormat.Int16)
+        return audio_format
+
+    def openSink(self, audio_format: QAudioFormat) -> None:
+        self.format = audio_format
+        self.sink = QAudioSink(QMediaDevices.defaultAudioOutput(), audio_format, self)
+        # 缓冲越小开始越快，但太小容易断音
+        self.sink.setBufferSize(audio_format.bytesForDuration(self.buffer_ms * 1000))
+
+    def closeSink(self) -> None:
+        self.timer.stop()
+        if self.sink is not None:
+            self.sink.stop()
+            self.sink.deleteLater()
+            self.sink = None
+        self.device.reset()
+        self.current = None
+        self.current_start = 0
+        self.playing = False
+
+    def poll(self) -> None:
+        if self.sink is None:
+            return
+        played = self.format.bytesForDuration(self.sink.processedUSecs())
+        boundaries = self.device.boundaries
+        # 已处理的数据越过某段的起点，说明该段的第一个采样已经送出
+        while boundaries and boundaries[0][0] < played:
+            start, audio, enqueued_at = boundaries.pop(0)
+            self.current = audio
+            self.current_start = start
+            if enqueued_at is not None:
+                self.latencies.append((time.perf_counter() - enqueued_at) * 1000)
+            self.clip_started.emit(audio)
+            played = self.format.bytesForDuration(self.sink.processedUSecs())
+        drained = not boundaries and self.device.pendingBytes() == 0
+        if drained and self.sink.state() == QAudio.State.IdleState:
+            self.playing = False
+            self.timer.stop()
+            if self.waiting:
+                # 格式变化，重新打开音频设备
+                waiting = list(self.waiting)
+                self.waiting.clear()
+                self.closeSink()
+                for audio, _ in waiting:
+                    self.enqueue(audio)
+                return
+            self.current = None
+            self.finished.emit()
@@ -0,0 +1,171 @@
+"""本地替身服务，模拟对话与 TTS 后端，用于离线运行和压力测试
+
+    python -m src.standin_server --port 8765 --latency 300 --token-rate 30
+    VCHAT_BACKEND_URL=http://127.0.0.1:8765 python app.py
+"""
+import argparse
+import io
+import itertools
+import json
+import math
+import random
+import struct
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+REPLIES = [
+    "你好呀！我是初音未来，很高兴认识你～今天想聊点什么呢？😄",
+    "嗯嗯，我明白了！这个问题很有意思，让我想一想。🙂",
+    "我最喜欢唱歌啦！要不要听我唱一首新歌呢？💃",
+]
+
+# 1 秒 220 Hz 正弦波，16 kHz 单声道 32 kbps，只含 MPEG 帧，可以直接首尾相接
+MP3_FIXTURE = Path(__file__).parent.parent / "resources" / "standin_tone.mp3"
+
+
+def make_wav(num_bytes: int, frame_rate: int = 16000) -> bytes:
+    """生成指定大小的 16 bit 单声道正弦波 wav"""
+    frames = max(num_bytes // 2, 1)
+    samples = (int(8000 * math.sin(2 * math.pi * 220 * i / frame_rate)) for i in range(frames))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(frame_rate)
+        wav_file.writeframes(struct.pack(f"<{frames}h", *samples))
+    return buffer.getvalue()
+
+
+def make_mp3(num_bytes: int) -> bytes:
+    """重复 MP3_FIXTURE，时长与同样大小的 16 kHz 16 bit wav 相近"""
+    seconds = num_bytes / (16000 * 2)
+    return MP3_FIXTURE.read_bytes() * max(round(seconds), 1)
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持 keep-alive
+    disable_nagle_algorithm = True  # 逐字输出时避免 Nagle 与延迟确认叠加
+    server: "StandinServer"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def send_json(self, data: dict) -> None:
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.read_json()
+        if self.path == "/v1/conversations":
+            self.send_json({"conversation_id": f"standin-{next(self.server.ids)}"})
+        elif self.path == "/v1/chat":
+            self.chat(body)
+        elif self.path == "/v1/tts":
+            self.tts(body)
+        else:
+            self.send_error(404)
+
+    def chat(self, body: dict) -> None:
+        reply = random.choice(REPLIES) * self.server.reply_repeat
+        time.sleep(self.server.latency)
+        if not body.get("stream", True):
+            self.send_json({"answer": reply})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        interval = 1 / self.server.token_rate if self.server.token_rate > 0 else 0
+        for char in reply:
+            self.write_chunk(json.dumps({"answer": char}, ensure_ascii=False).encode() + b"\n")
+            time.sleep(interval)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def tts(self, body: dict) -> None:
+        # 音频大小与文本长度成正比，模拟真实 TTS 的返回体积
+        text = body.get("text", "")
+        size = self.server.audio_bytes_per_char * max(len(text), 1)
+        time.sleep(self.server.tts_latency)
+        audio_type = body.get("audio_type", "wav")
+        if audio_type.startswith("mp3"):
+            # 不区分 mp3-16k、mp3-48k，解码器按帧头中的采样率输出
+            key, make, content_type = ("mp3", size), make_mp3, "audio/mpeg"
+        else:
+            key, make, content_type = ("wav", size), make_wav, "audio/wav"
+        audio = self.server.audio_cache.get(key)
+        if audio is None:
+            audio = self.server.audio_cache.setdefault(key, make(size))
+        if audio_type.startswith("pcm"):
+            # 裸 PCM 即去掉 44 字节的 wav 头
+            audio, content_type = audio[44:], "audio/L16"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(audio)))
+        self.end_headers()
+        self.wfile.write(audio)
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], latency: float = 0.3,
+                 token_rate: float = 30, reply_repeat: int = 1, tts_latency: float = 0.2,
+                 audio_bytes_per_char: int = 8000, verbose: bool = False) -> None:
+        super().__init__(address, StandinHandler)
+        self.latency = latency
+        self.token_rate = token_rate
+        self.reply_repeat = reply_repeat
+        self.tts_latency = tts_latency
+        self.audio_bytes_per_char = audio_bytes_per_char
+        self.verbose = verbose
+        self.ids = itertools.count(1)
+        self.audio_cache: dict[tuple[str, int], bytes] = {}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=300, help="首字延迟 (毫秒)")
+    parser.add_argument("--token-rate", type=float, default=30, help="每秒输出的字数，0 为不限")
+    parser.add_argument("--reply-repeat", type=int, default=1, help="回复文本重复次数，用于模拟长回复")
+    parser.add_argument("--tts-latency", type=float, default=200, help="TTS 延迟 (毫秒)")
+    parser.add_argument("--audio-bytes-per-char", type=int, default=8000,
+                        help="每个字对应的音频字节数 (16kHz 16bit 约 0.25 秒)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = StandinServer((args.host, args.port),
+                           latency=args.latency / 1000,
+                           token_rate=args.token_rate,
+                           reply_repeat=args.reply_repeat,
+                           tts_latency=args.tts_latency / 1000,
+                           audio_bytes_per_char=args.audio_bytes_per_char,
+                           verbose=args.verbose)
+    print(f"standin server listening on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
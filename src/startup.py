@@ -0,0 +1,52 @@
+import time
+from contextlib import contextmanager
+
+# 尽早记录起点，app.py 第一行导入本模块
+_start = time.perf_counter()
+
+
+class StartupTimer:
+    """记录启动各阶段的耗时"""
+
+    def __init__(self, start: float, target_first_paint: float = 1.0) -> None:
+        self.start = start
+        self.last = start
+        self.target_first_paint = target_first_paint
+        self.marks: list[tuple[str, float, float]] = []  # 阶段, 阶段耗时, 累计耗时
+        self.spans: list[tuple[str, float]] = []  # 阶段内部单独计时的步骤, 耗时
+
+    def mark(self, name: str) -> None:
+        now = time.perf_counter()
+        self.marks.append((name, now - self.last, now - self.start))
+        self.last = now
+
+    @contextmanager
+    def span(self, name: str):
+        """单独记录某一步骤的耗时，不影响阶段划分"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append((name, time.perf_counter() - start))
+
+    def elapsed(self, name: str) -> float | None:
+        for mark, _, total in self.marks:
+            if mark == name:
+                return total
+        return None
+
+    def report(self) -> str:
+        lines = ["启动耗时:"]
+        for name, duration, total in self.marks:
+            lines.append(f"  {name:<14} {duration * 1000:8.1f} ms  (累计 {total * 1000:8.1f} ms)")
+        for name, duration in self.spans:
+            lines.append(f"    其中 {name:<12} {duration * 1000:6.1f} ms")
+        first_paint = self.elapsed("first_paint")
+        if first_paint is not None:
+            status = "达标" if first_paint < self.target_first_paint else "未达标"
+            lines.append(f"  首次绘制 {first_paint * 1000:.1f} ms，目标 < "
+                         f"{self.target_first_paint * 1000:.0f} ms，{status}")
+        return "\n".join(lines)
+
+
+startup_timer = StartupTimer(_start)
@@ -0,0 +1,329 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    conversation_id TEXT NOT NULL,
+    is_me INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    meta TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_conversation ON messages (conversation_id, id);
+"""
+
+# 全文索引，trigram 分词对中文同样有效；写入消息时由触发器在同一事务中更新
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    text, content='messages', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, text) VALUES (new.id, new.text);
+END;
+"""
+# 短于 3 个字符的词无法使用 trigram 索引
+MIN_INDEXED_LENGTH = 3
+
+# 1~2 个字符的词（大部分中文词语）使用单独的索引：写入时把每条消息拆成全部单字和相邻两字，
+# 只记录是否出现，不保存原文和位置
+SHORT_SCHEMA = """
+CREATE VIRTUAL TABLE messages_short USING fts5(
+    tokens, content='', detail=none, columnsize=0, tokenize='unicode61 remove_diacritics 0'
+);
+"""
+
+
+@dataclass
+class StoredMessage:
+    id: int
+    conversation_id: str
+    is_me: bool
+    text: str
+    created_at: float
+    meta: dict | None = None
+
+
+class ConversationStore:
+    """只追加的对话记录（SQLite WAL）
+
+    写入先进入队列，由后台线程批量提交，不阻塞 UI 线程；消息 ID 在 append 时分配，
+    写入前就可以使用。读取使用独立连接，WAL 模式下不会被写入阻塞。
+    """
+
+    def __init__(self,
+                 path: os.PathLike | str,
+                 batch_size: int = 64,
+                 flush_interval: float = 0.2) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.reader = self._connect()
+        self.reader.executescript(SCHEMA)
+        self.fts = self._create_fts()
+        # 只有本进程写入，ID 在 append 时依次分配
+        self._next_id = (self.reader.execute("SELECT MAX(id) FROM messages").fetchone()[0]
+                         or 0) + 1
+        self._id_lock = threading.Lock()
+        # 由写线程建好短词索引后置为 True，之前短词逐条匹配
+        self.short_index = False
+        # 搜索在工作线程中进行，使用单独的连接
+        self._searcher: sqlite3.Connection | None = None
+        self._search_lock = threading.Lock()
+
+        self.queue: queue.Queue[tuple | str | threading.Event | None] = queue.Queue()
+        if self.fts == "rebuild":
+            # 旧版本的记录还没有索引，在写线程中补建
+            self.queue.put("rebuild")
+            self.fts = True
+        self.writer = threading.Thread(target=self._write_loop, name="ConversationStore",
+                                       daemon=True)
+        self.writer.start()
+
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=check_same_thread)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _create_fts(self) -> bool | str:
+        exists = self.reader.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'").fetchone() is not None
+        try:
+            self.reader.executescript(FTS_SCHEMA)
+        except sqlite3.OperationalError as e:
+            print(f"SQLite 不支持 FTS5 trigram，搜索将逐条匹配: {e}")
+            return False
+        if not exists and self.reader.execute("SELECT 1 FROM messages LIMIT 1").fetchone():
+            return "rebuild"
+        return True
+
+    def append(self, conversation_id: str, is_me: bool, text: str,
+               meta: dict | None = None, message_id: int | None = None,
+               created_at: float | None = None) -> int:
+        """记录一条消息，立即返回分配的 ID；message_id 可以是之前 reserve_id 得到的"""
+        if message_id is None:
+            message_id = self.reserve_id()
+        self.queue.put((message_id, conversation_id, int(is_me), text,
+                        time.time() if created_at is None else created_at,
+                        json.dumps(meta, ensure_ascii=False) if meta else None))
+        return message_id
+
+    def reserve_id(self) -> int:
+        """先分配 ID，稍后再用 append 写入（如会话 ID 还未知时）"""
+        with self._id_lock:
+            message_id = self._next_id
+            self._next_id += 1
+        return message_id
+
+    def last_id(self) -> int:
+        """已分配的最大 ID，没有消息时为 0"""
+        with self._id_lock:
+            return self._next_id - 1
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """等待已提交的消息全部写入"""
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def close(self) -> None:
+        self.queue.put(None)
+        self.writer.join()
+        self.reader.close()
+        with self._search_lock:
+            if self._searcher is not None:
+                self._searcher.close()
+
+    def _write_loop(self) -> None:
+        connection = self._connect()
+        if self.fts:
+            self._create_short_index(connection)
+        running = True
+        while running:
+            item = self.queue.get()
+            batch, events = [], []
+            deadline = time.monotonic() + self.flush_interval
+            # 攒够一批或等待超时后一次性提交
+            while True:
+                if item is None:
+                    running = False
+                elif isinstance(item, threading.Event):
+                    events.append(item)
+                elif item == "rebuild":
+                    self._rebuild_fts(connection)
+                else:
+                    batch.append(item)
+                if not running or events or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    with connection:
+                        short_rows = []
+                        for row in batch:
+                            cursor = connection.execute(
+                                "INSERT INTO messages (id, conversation_id, is_me, text,"
+                                " created_at, meta) VALUES (?, ?, ?, ?, ?, ?)", row)
+                            if self.short_index:
+                                short_rows.append((cursor.lastrowid, short_tokens(row[3])))
+                        if short_rows:
+                            connection.executemany(
+                                "INSERT INTO messages_short (rowid, tokens) VALUES (?, ?)",
+                                short_rows)
+                except sqlite3.Error as e:
+                    print(f"写入对话记录失败: {e}")
+            for event in events:
+                event.set()
+        connection.close()
+
+    @staticmethod
+    def _rebuild_fts(connection: sqlite3.Connection) -> None:
+        start = time.perf_counter()
+        try:
+            with connection:
+                connection.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+        except sqlite3.Error as e:
+            print(f"建立搜索索引失败: {e}")
+            return
+        print(f"建立搜索索引: {time.perf_counter() - start:.1f}s")
+
+    def _create_short_index(self, connection: sqlite3.Connection) -> None:
+        """在写线程中建立短词索引，已有记录在同一事务中补建，中途退出不会留下不完整的索引"""
+        exists = connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'messages_short'").fetchone() is not None
+        if not exists:
+            start = time.perf_counter()
+            try:
+                # 建表也放在事务中（sqlite3 模块不会为 DDL 自动开始事务）
+                connection.execute("BEGIN")
+                connection.execute(SHORT_SCHEMA)
+                cursor = connection.execute("SELECT id, text FROM messages")
+                while rows := cursor.fetchmany(10000):
+                    connection.executemany(
+                        "INSERT INTO messages_short (rowid, tokens) VALUES (?, ?)",
+                        [(id, short_tokens(text)) for id, text in rows])
+                connection.commit()
+            except sqlite3.Error as e:
+                connection.rollback()
+                print(f"建立短词索引失败，短词将逐条匹配: {e}")
+                return
+            print(f"建立短词索引: {time.perf_counter() - start:.1f}s")
+        self.short_index = True
+
+    def _rows(self, rows: list[tuple]) -> list[StoredMessage]:
+        return [
+            StoredMessage(id, conversation_id, bool(is_me), text, created_at,
+                          json.loads(meta) if meta else None)
+            for id, conversation_id, is_me, text, created_at, meta in reversed(rows)
+        ]
+
+    def latest(self, limit: int = 50) -> list[StoredMessage]:
+        """最新的一页消息，按时间顺序返回"""
+        rows = self.reader.execute(
+            "SELECT id, conversation_id, is_me, text, created_at, meta FROM messages"
+            " ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return self._rows(rows)
+
+    def before(self, message_id: int, limit: int = 50) -> list[StoredMessage]:
+        """message_id 之前的一页消息，按时间顺序返回"""
+        rows = self.reader.execute(
+            "SELECT id, conversation_id, is_me, text, created_at, meta FROM messages"
+            " WHERE id < ? ORDER BY id DESC LIMIT ?", (message_id, limit)).fetchall()
+        return self._rows(rows)
+
+    def after(self, message_id: int, limit: int = 50) -> list[StoredMessage]:
+        """message_id 之后的一页消息，按时间顺序返回"""
+        rows = self.reader.execute(
+            "SELECT id, conversation_id, is_me, text, created_at, meta FROM messages"
+            " WHERE id > ? ORDER BY id LIMIT ?", (message_id, limit)).fetchall()
+        return self._rows(rows[::-1])
+
+    def search(self, query: str, limit: int = 200,
+               before_id: int | None = None) -> list[StoredMessage]:
+        """按关键词搜索，空格分隔的多个词需同时出现，返回 before_id 之前最新的 limit 条，按时间顺序
+
+        3 个字符以上的词走 trigram 索引，由文字或数字组成的 1~2 个字符的词走短词索引，
+        其余的词在索引查出的结果中逐条匹配；都不能用索引时按 ID 从新到旧逐条匹配。
+        使用单独的连接，可以在工作线程中调用。
+        """
+        terms = query.split()
+        if not terms:
+            return []
+        long_terms = [t for t in terms if len(t) >= MIN_INDEXED_LENGTH] if self.fts else []
+        short_terms = ([t for t in terms if len(t) < MIN_INDEXED_LENGTH and t.isalnum()]
+                       if self.short_index else [])
+        # 由一个索引按 rowid 倒序驱动查询，其余的词在结果中过滤
+        plans = []
+        if long_terms:
+            plans.append(("messages_fts", long_terms,
+                          [t for t in terms if t not in long_terms]))
+        elif short_terms:
+            plans.append(("messages_short", [t.lower() for t in short_terms],
+                          [t for t in terms if t not in short_terms]))
+        plans.append((None, [], terms))
+        with self._search_lock:
+            if self._searcher is None:
+                self._searcher = self._connect(check_same_thread=False)
+            for table, indexed, others in plans:
+                try:
+                    rows = self._searcher.execute(
+                        *self._search_sql(table, indexed, others, limit, before_id)).fetchall()
+                except sqlite3.OperationalError as e:
+                    # 个别字符的分词与预期不同时退回逐条匹配
+                    print(f"搜索索引查询失败: {e}")
+                    continue
+                return self._rows(rows)
+        return []
+
+    @staticmethod
+    def _search_sql(table: str | None, indexed: list[str], others: list[str], limit: int,
+                    before_id: int | None) -> tuple[str, list]:
+        columns = "m.id, m.conversation_id, m.is_me, m.text, m.created_at, m.meta"
+        conditions = ["m.text LIKE ? ESCAPE '\\'"] * len(others)
+        params: list = [f"%{escape_like(t)}%" for t in others]
+        if table is not None:
+            # 全文索引按 rowid 倒序读取时无需对全部结果排序
+            key = f"{table}.rowid"
+            sql = (f"SELECT {columns} FROM {table} JOIN messages m ON m.id = {key}"
+                   f" WHERE {table} MATCH ?")
+            params.insert(0, " AND ".join('"' + t.replace('"', '""') + '"' for t in indexed))
+        else:
+            key = "m.id"
+            sql = f"SELECT {columns} FROM messages m WHERE 1"
+        if before_id is not None:
+            conditions.append(f"{key} < ?")
+            params.append(before_id)
+        for condition in conditions:
+            sql += " AND " + condition
+        return sql + f" ORDER BY {key} DESC LIMIT ?", [*params, limit]
+
+
+def short_tokens(text: str) -> str:
+    """短词索引的内容：连续的文字、数字中的每个单字和相邻两字，空格分隔、去重"""
+    tokens = set()
+    previous = ""
+    for char in text.lower():
+        if char.isalnum():
+            tokens.add(char)
+            if previous:
+                tokens.add(previous + char)
+            previous = char
+        else:
+            previous = ""
+    return " ".join(tokens)
+
+
+def escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
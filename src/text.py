@@ -0,0 +1,26 @@
+import re
+
+# 句末标点或 emoji 视为分句边界，其后紧跟的引号、括号、emoji 和空白归入同一句
+SENTENCE_END = r"。！？!?；;…~～\n\U0001F000-\U0001FAFF\u2600-\u27BF\uFE0F"
+SENTENCE_BOUNDARY = re.compile(rf"[{SENTENCE_END}][{SENTENCE_END}”’」』）)\s]*")
+# 只包含标点、空白或 emoji 的分句无需合成
+SPEAKABLE = re.compile(r"[\w]")
+
+
+def split_sentences(text: str, min_length: int = 6) -> list[str]:
+    """按句末标点和 emoji 切分文本，过短的分句会与下一句合并"""
+    # 记录各分句在原文中的范围，合并时延长范围，保留分句之间的空白
+    spans = []
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        if len(text[start:match.end()].strip()) >= min_length:
+            spans.append((start, match.end()))
+            start = match.end()
+    tail = text[start:].strip()
+    if tail:
+        if spans and len(tail) < min_length:
+            spans[-1] = (spans[-1][0], len(text))
+        else:
+            spans.append((start, len(text)))
+    chunks = [text[begin:end].strip() for begin, end in spans]
+    return [chunk for chunk in chunks if SPEAKABLE.search(chunk)]
@@ -0,0 +1,94 @@
+from dataclasses import dataclass
+
+from PySide6.QtCore import QObject, Qt, Signal
+from PySide6.QtGui import QColor, QGuiApplication, QPalette
+import darkdetect
+
+
+@dataclass(frozen=True)
+class Theme:
+    """界面配色，控件通过调色板取色，自绘部分（聊天气泡）直接读取这里的颜色"""
+    name: str
+    dark: bool
+    window: QColor
+    text: QColor
+    bubble_me: QColor
+    bubble_me_text: QColor
+    bubble_other: QColor
+    bubble_other_text: QColor
+    highlight: QColor  # 搜索结果的气泡边框
+
+    def palette(self) -> QPalette:
+        palette = QPalette()
+        for role in (QPalette.ColorRole.Window, QPalette.ColorRole.Base):
+            palette.setColor(role, self.window)
+        for role in (QPalette.ColorRole.WindowText, QPalette.ColorRole.Text,
+                     QPalette.ColorRole.ButtonText):
+            palette.setColor(role, self.text)
+        palette.setColor(QPalette.ColorRole.Button, self.bubble_other)
+        palette.setColor(QPalette.ColorRole.Highlight, self.bubble_me)
+        palette.setColor(QPalette.ColorRole.HighlightedText, self.bubble_me_text)
+        return palette
+
+
+LIGHT = Theme("light", False,
+              window=QColor("#FFFFFF"), text=QColor("#000000"),
+              bubble_me=QColor("#1E88E5"), bubble_me_text=QColor("#FFFFFF"),
+              bubble_other=QColor("#F5F5F5"), bubble_other_text=QColor("#000000"),
+              highlight=QColor("#FFB300"))
+DARK = Theme("dark", True,
+             window=QColor("#121212"), text=QColor("#FFFFFF"),
+             bubble_me=QColor("#1E88E5"), bubble_me_text=QColor("#FFFFFF"),
+             bubble_other=QColor("#2C2C2C"), bubble_other_text=QColor("#FFFFFF"),
+             highlight=QColor("#FFCA28"))
+
+
+class ThemeManager(QObject):
+    """全局主题
+
+    跟随系统深色模式切换时，通过 QApplication.setPalette 一次性更新所有控件，
+    自绘部分收到 changed 后只需重绘，开销与消息数量无关。
+    """
+    changed = Signal(object)  # Theme
+
+    _instance: "ThemeManager | None" = None
+
+    def __init__(self, parent: QObject | None = None, mode: str = "auto") -> None:
+        super().__init__(parent)
+        self.mode = mode  # "auto" 跟随系统，或 "light" / "dark"
+        self.theme = LIGHT
+        QGuiApplication.styleHints().colorSchemeChanged.connect(self.on_color_scheme_changed)
+        self.apply(self.resolve())
+
+    @classmethod
+    def instance(cls) -> "ThemeManager":
+        """应用内共享的主题，需在创建 QApplication 之后调用"""
+        if cls._instance is None:
+            cls._instance = ThemeManager(QGuiApplication.instance())
+        return cls._instance
+
+    def setMode(self, mode: str) -> None:
+        self.mode = mode
+        self.apply(self.resolve())
+
+    def resolve(self) -> Theme:
+        if self.mode == "dark":
+            return DARK
+        if self.mode == "light":
+            return LIGHT
+        scheme = QGuiApplication.styleHints().colorScheme()
+        if scheme == Qt.ColorScheme.Unknown:
+            # 部分 Linux 桌面上 Qt 无法获取系统设置
+            return DARK if darkdetect.isDark() else LIGHT
+        return DARK if scheme == Qt.ColorScheme.Dark else LIGHT
+
+    def apply(self, theme: Theme) -> None:
+        self.theme = theme
+        QGuiApplication.setPalette(theme.palette())
+        self.changed.emit(theme)
+
+    def on_color_scheme_changed(self, scheme: Qt.ColorScheme) -> None:
+        if self.mode == "auto":
+            theme = self.resolve()
+            if theme != self.theme:
+                self.apply(theme)
@@ -0,0 +1,153 @@
+import json
+import os
+import time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+# 一轮对话中依次经过的阶段，记录的是距离发送消息的时间
+STAGES = ("first_token", "reply", "tts_start", "tts_done", "first_audio", "motion")
+
+# Chrome trace 中每个阶段所在的行
+LANES = {1: "chat", 2: "tts", 3: "audio"}
+
+# (名称, 行, 开始阶段, 结束阶段)，"sent" 为发送消息的时刻
+SPANS = (
+    ("chat.first_token", 1, "sent", "first_token"),
+    ("chat.stream", 1, "first_token", "reply"),
+    ("tts", 2, "tts_start", "tts_done"),
+    ("tts.first_audio", 3, "tts_start", "first_audio"),
+)
+
+
+class TurnTracer:
+    """逐轮记录对话延迟
+
+    每轮从发送消息开始，各阶段第一次发生时调用 mark；一轮结束后按 Chrome trace 格式
+    (chrome://tracing、ui.perfetto.dev 可直接打开) 追加到 path，文件超过 max_bytes 时
+    像日志一样轮转，保留 backup_count 个旧文件。所有调用都在主线程中进行。
+
+    多次运行追加到同一文件，时间戳以墙上时间为基准，各进程的记录按实际时间先后排列；
+    进程与各行的名称每个进程写一次，轮转后的新文件再写一次。
+    """
+
+    def __init__(self,
+                 path: os.PathLike | str | None = None,
+                 max_bytes: int = 1 << 20,
+                 backup_count: int = 3,
+                 history: int = 500) -> None:
+        self.path = Path(path) if path is not None else None
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.turns: deque[dict[str, float]] = deque(maxlen=history)  # 已结束各轮的阶段耗时 (毫秒)
+        # 时间戳 = 构造时的墙上时间 + perf_counter 的增量，既不重叠又不受系统校时影响
+        self.epoch = time.perf_counter()
+        self.epoch_wall = time.time()
+        self.metadata_written = False
+        self.turn_id = 0
+        self.sent: float | None = None  # 当前一轮的发送时间，None 表示没有进行中的一轮
+        self.marks: dict[str, float] = {}
+
+    def beginTurn(self) -> int:
+        """发送消息时调用，未结束的上一轮随之结束"""
+        self.endTurn()
+        self.turn_id += 1
+        self.sent = time.perf_counter()
+        self.marks = {}
+        return self.turn_id
+
+    def mark(self, stage: str) -> None:
+        """记录阶段第一次发生的时间，没有进行中的一轮时忽略"""
+        if self.sent is None or stage in self.marks:
+            return
+        self.marks[stage] = (time.perf_counter() - self.sent) * 1000
+
+    def endTurn(self) -> None:
+        if self.sent is None:
+            return
+        self.turns.append(self.marks)
+        try:
+            self.write(self.events(self.turn_id, self.sent, self.marks))
+        except OSError as e:
+            print(f"写入延迟记录失败: {e}")
+        self.sent = None
+        self.marks = {}
+
+    def events(self, turn_id: int, sent: float, marks: dict[str, float]) -> list[dict]:
+        """一轮对话的 trace 事件，时间单位为微秒"""
+        base = (self.epoch_wall + sent - self.epoch) * 1e6
+        points = {"sent": 0.0, **marks}
+        pid = os.getpid()
+        args = {"turn": turn_id}
+        events = [{"name": "turn", "ph": "X", "pid": pid, "tid": 0, "ts": base,
+                   "dur": max(points.values()) * 1000, "args": {**args, **marks}}]
+        for name, lane, begin, end in SPANS:
+            if begin in points and end in points and points[end] >= points[begin]:
+                events.append({"name": name, "ph": "X", "pid": pid, "tid": lane,
+                               "ts": base + points[begin] * 1000,
+                               "dur": (points[end] - points[begin]) * 1000, "args": args})
+        if "motion" in marks:
+            events.append({"name": "motion", "ph": "i", "s": "t", "pid": pid, "tid": 3,
+                           "ts": base + marks["motion"] * 1000, "args": args})
+        return events
+
+    def write(self, events: list[dict]) -> None:
+        if self.path is None:
+            return
+        if self.path.exists() and self.path.stat().st_size >= self.max_bytes:
+            self.rotate()
+            self.metadata_written = False
+        new_file = not self.path.exists()
+        if new_file:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            if new_file:
+                # JSON 数组格式允许省略结尾的 ]，每轮直接追加
+                f.write("[\n")
+            if not self.metadata_written:
+                pid = os.getpid()
+                f.write(json.dumps({"name": "process_name", "ph": "M", "pid": pid,
+                                    "args": {"name": "vcharacter_chat"}}) + ",\n")
+                for tid, name in {0: "turn", **LANES}.items():
+                    f.write(json.dumps({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                                        "args": {"name": name}}) + ",\n")
+                self.metadata_written = True
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False) + ",\n")
+
+    def rotate(self) -> None:
+        """path -> path.1 -> path.2 ...，超出 backup_count 的删除"""
+        for i in range(self.backup_count, 0, -1):
+            source = self.path if i == 1 else self.path.with_name(f"{self.path.name}.{i - 1}")
+            target = self.path.with_name(f"{self.path.name}.{i}")
+            if source.exists():
+                os.replace(source, target)
+        if self.path.exists():
+            self.path.unlink()
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """各阶段距离发送消息的时间分位数 (毫秒)"""
+        stats = {}
+        for stage in STAGES:
+            data = np.array([marks[stage] for marks in self.turns if stage in marks])
+            if data.size == 0:
+                continue
+            stats[stage] = {
+                "n": int(data.size),
+                "p50_ms": float(np.percentile(data, 50)),
+                "p90_ms": float(np.percentile(data, 90)),
+                "p99_ms": float(np.percentile(data, 99)),
+            }
+        return stats
+
+    def report(self) -> str:
+        lines = [f"对话延迟 ({len(self.turns)} 轮，距发送消息):",
+                 f"  {'阶段':<12} {'次数':>3} {'p50':>9} {'p90':>9} {'p99':>9}"]
+        for stage, stats in self.summary().items():
+            lines.append(f"  {stage:<14} {stats['n']:>5} {stats['p50_ms']:7.0f}ms "
+                         f"{stats['p90_ms']:7.0f}ms {stats['p99_ms']:7.0f}ms")
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        self.endTurn()
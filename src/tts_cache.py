@@ -0,0 +1,202 @@
+import hashlib
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+
+def normalize_text(text: str) -> str:
+    """统一全角/半角并折叠空白，使等价文本命中同一缓存"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class TTSCache:
+    """TTS 音频缓存
+
+    内存层为按字节数限制的 LRU；磁盘层按音频内容哈希存储（objects/），
+    再由 refs/ 把 (文本, 音色, 音频格式) 的键指向对应内容，重启后仍然有效。
+    磁盘层超过 max_disk_bytes 时按修改时间 (命中时更新) 删除最久未用的内容，
+    直到降到上限的 90%，并删除指向已删除内容的 refs。
+    """
+
+    def __init__(self,
+                 cache_dir: os.PathLike | str | None = None,
+                 max_memory_bytes: int = 32 * 1024 * 1024,
+                 max_disk_bytes: int = 256 * 1024 * 1024) -> None:
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_bytes = 0
+        # 内容哈希 -> [字节数, 修改时间]，第一次写入磁盘时扫描 objects/ 建立
+        self._disk_index: dict[str, list[float]] | None = None
+        self._disk_lock = threading.Lock()
+        self.disk_bytes = 0
+        self.disk_evicted = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text: str, person: int, audio_type: str) -> str:
+        raw = f"{person}\0{audio_type}\0{normalize_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, text: str, person: int, audio_type: str) -> bytes | None:
+        key = self.make_key(text, person, audio_type)
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+        data = self._read_disk(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._put_memory(key, data)
+        return data
+
+    def put(self, text: str, person: int, audio_type: str, data: bytes) -> None:
+        key = self.make_key(text, person, audio_type)
+        with self._lock:
+            self._put_memory(key, data)
+        self._write_disk(key, data)
+
+    def __contains__(self, item: tuple[str, int, str]) -> bool:
+        key = self.make_key(*item)
+        with self._lock:
+            if key in self._memory:
+                return True
+        return self.cache_dir is not None and (self.cache_dir / "refs" / key).exists()
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self.memory_bytes,
+                "disk_bytes": self.disk_bytes,
+                "disk_evicted": self.disk_evicted,
+            }
+
+    def _put_memory(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self.memory_bytes -= len(old)
+        self._memory[key] = data
+        self.memory_bytes += len(data)
+        while self.memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+
+    def _object_path(self, digest: str) -> Path:
+        assert self.cache_dir is not None
+        return self.cache_dir / "objects" / digest[:2] / digest
+
+    def _read_disk(self, key: str) -> bytes | None:
+        if self.cache_dir is None:
+            return None
+        ref_path = self.cache_dir / "refs" / key
+        try:
+            digest = ref_path.read_text("ascii").strip()
+        except OSError:
+            return None
+        object_path = self._object_path(digest)
+        try:
+            data = object_path.read_bytes()
+        except OSError:
+            # 内容已被删除
+            ref_path.unlink(missing_ok=True)
+            return None
+        self._touch(digest, object_path)
+        return data
+
+    def _touch(self, digest: str, object_path: Path) -> None:
+        """命中时更新修改时间，淘汰时按它判断最近是否使用过"""
+        now = time.time()
+        try:
+            os.utime(object_path, (now, now))
+        except OSError:
+            return
+        with self._disk_lock:
+            if self._disk_index is not None and digest in self._disk_index:
+                self._disk_index[digest][1] = now
+
+    def _write_disk(self, key: str, data: bytes) -> None:
+        if self.cache_dir is None:
+            return
+        digest = hashlib.sha256(data).hexdigest()
+        try:
+            with self._disk_lock:
+                index = self._load_disk_index()
+                object_path = self._object_path(digest)
+                if digest not in index or not object_path.exists():
+                    atomic_write(object_path, data)
+                    if digest not in index:
+                        self.disk_bytes += len(data)
+                    index[digest] = [len(data), time.time()]
+                atomic_write(self.cache_dir / "refs" / key, digest.encode("ascii"))
+                if self.disk_bytes > self.max_disk_bytes:
+                    self._evict_disk(keep=digest)
+        except OSError as e:
+            print(f"写入 TTS 缓存失败: {e}")
+
+    def _load_disk_index(self) -> dict[str, list[float]]:
+        """扫描 objects/，在 _disk_lock 中调用"""
+        if self._disk_index is None:
+            index = {}
+            for path in (self.cache_dir / "objects").glob("*/*"):
+                if path.name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                index[path.name] = [stat.st_size, stat.st_mtime]
+            self._disk_index = index
+            self.disk_bytes = sum(size for size, _ in index.values())
+        return self._disk_index
+
+    def _evict_disk(self, keep: str) -> None:
+        """删除最久未用的内容直到降到上限的 90%，在 _disk_lock 中调用"""
+        index = self._disk_index
+        target = self.max_disk_bytes * 0.9
+        removed = set()
+        for digest, (size, _) in sorted(index.items(), key=lambda item: item[1][1]):
+            if self.disk_bytes <= target:
+                break
+            if digest == keep:
+                continue
+            self._object_path(digest).unlink(missing_ok=True)
+            del index[digest]
+            self.disk_bytes -= size
+            removed.add(digest)
+        if not removed:
+            return
+        self.disk_evicted += len(removed)
+        for ref_path in (self.cache_dir / "refs").iterdir():
+            try:
+                if ref_path.read_text("ascii").strip() in removed:
+                    ref_path.unlink()
+            except OSError:
+                continue
+
+
+def atomic_write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)